@@ -1,5 +1,14 @@
+import itertools
+import re
+import unicodedata
+import zlib
+
+import numpy as np
 import pandas as pd
 
+from config import FUZZY_MATCH
+from search_index import SearchIndex
+
 # 格式优先级（高到低）
 FORMAT_PRIORITY = {
     "flac": 5,
@@ -15,28 +24,90 @@ def get_format_priority(fmt):
     return FORMAT_PRIORITY.get(fmt.lower(), 0)
 
 
+def format_priorities(formats: pd.Series) -> pd.Series:
+    """
+    批量获取格式优先级
+
+    format 列为 category 类型时 apply 会返回按类别顺序排序的 category，
+    这里统一转成普通整数列，保证按优先级排序正确；格式种类很少，只对去重后的取值查表
+    """
+    codes, uniques = pd.factorize(formats)
+    priorities = np.array([get_format_priority(str(fmt)) for fmt in uniques] + [0], dtype=np.int64)
+    return pd.Series(priorities[codes], index=formats.index)
+
+
+# 同一首歌的多个版本中选出保留文件的排序依据（依次比较，均为越大越好）
+KEEP_ORDER = ["priority", "bitrate", "sample_rate", "file_size"]
+
+
+def _numeric_column(df: pd.DataFrame, col: str) -> np.ndarray:
+    """取数值列用于排序，缺失的列或值记为 -1（排在最后）"""
+    if col not in df.columns:
+        return np.full(len(df), -1.0)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=-1.0)
+
+
+class DeletionPlan:
+    """
+    重复歌曲的保留/删除计划
+
+    每个有重复的 song_key 保留一个文件（格式优先级最高，其次比特率、采样率、文件大小，
+    仍相同时保留文件路径按字符串排序靠前的，与行顺序无关），其余文件删除。
+    """
+
+    def __init__(self, df: pd.DataFrame, keep_positions: np.ndarray, delete_positions: np.ndarray):
+        self.df = df
+        self.keep_positions = keep_positions
+        self.delete_positions = delete_positions
+
+    def __len__(self):
+        return len(self.delete_positions)
+
+    @property
+    def to_keep(self) -> pd.DataFrame:
+        """每组保留的文件"""
+        return self.df.iloc[self.keep_positions]
+
+    @property
+    def to_delete(self) -> pd.DataFrame:
+        """应删除的文件"""
+        return self.df.iloc[self.delete_positions]
+
+    def delete_mask(self) -> np.ndarray:
+        """与 df 行对齐的布尔数组，True 表示应删除"""
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[self.delete_positions] = True
+        return mask
+
+    def summary(self) -> dict:
+        """计划概要：分组数、保留/删除文件数、可释放的字节数"""
+        freed = 0
+        if "file_size" in self.df.columns and len(self.delete_positions):
+            freed = int(pd.to_numeric(self.to_delete["file_size"], errors="coerce").fillna(0).sum())
+        return {
+            "groups": len(self.keep_positions),
+            "keep": len(self.keep_positions),
+            "delete": len(self.delete_positions),
+            "bytes_freed": freed,
+        }
+
+
+def plan_deletions(df: pd.DataFrame) -> DeletionPlan:
+    """
+    一次分组排序生成删除计划（见 LibraryAnalysis.deletion_plan）
+
+    已经构建了 LibraryAnalysis 时直接调用其 deletion_plan()，避免重复建立分组索引
+    """
+    return LibraryAnalysis(df).deletion_plan()
+
+
 def mark_files_to_delete(df: pd.DataFrame) -> pd.DataFrame:
     """
     标记重复文件中应该删除的文件
-    保留优先级最高的，删除其他
+    保留优先级最高的，删除其他（规则见 plan_deletions）
     """
     df = df.copy()
-    df["should_delete"] = False
-    
-    dup_df = df[df.duplicated("song_key", keep=False) & df["song_key"].notna()]
-    
-    for song_key in dup_df["song_key"].unique():
-        group = dup_df[dup_df["song_key"] == song_key].copy()
-        
-        # 按优先级排序（降序）
-        group["priority"] = group["format"].apply(get_format_priority)
-        group = group.sort_values("priority", ascending=False)
-        
-        # 第一个是优先级最高的，应该保留
-        # 其他都标记为删除
-        indices_to_delete = group.iloc[1:].index
-        df.loc[indices_to_delete, "should_delete"] = True
-    
+    df["should_delete"] = plan_deletions(df).delete_mask()
     return df
 
 
@@ -45,6 +116,8 @@ def get_duplicates_to_delete(df: pd.DataFrame) -> pd.DataFrame:
     返回标记为删除的重复文件
     （保留最高优先级的，删除其他）
     """
+    if "should_delete" not in df.columns:
+        return plan_deletions(df).to_delete
     return df[df.duplicated("song_key", keep=False) & df["should_delete"]]
 
 
@@ -54,22 +127,850 @@ def normalize_key(row):
     return f"{row['title'].lower()}|{row['artist'].lower()}|{round(row['duration'])}"
 
 
+def _lower_codes(series: pd.Series):
+    """
+    对列去重后转小写
+
+    只对去重后的取值调用 str.lower（艺术家、标题大量重复），
+    结果与逐行调用 Python 的 str.lower 完全相同
+
+    Returns:
+        (codes, lowered, present)：lowered[codes] 为每行的小写值，
+        present 为每行是否有值（非空且不是空字符串，与 normalize_key 中的 `not value` 一致）
+    """
+    codes, uniques = pd.factorize(series)
+    lowered = np.array([str(value).lower() for value in uniques] + [""], dtype=object)
+    nonempty = np.array([value != "" for value in uniques] + [False], dtype=bool)
+    # 缺失值的编码为 -1，正好取到末尾追加的占位项
+    return codes, lowered, nonempty[codes]
+
+
+def build_song_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    向量化计算 song_key，语义与逐行调用 normalize_key 相同：
+    "标题小写|艺术家小写|四舍五入的时长"，标题、艺术家或时长缺失（或为空/0）时为 None。
+    NaN（例如 category 列中的缺失值）同样视为缺失，而 normalize_key 遇到 NaN 会抛异常
+    """
+    title_codes, titles, has_title = _lower_codes(df["title"])
+    artist_codes, artists, has_artist = _lower_codes(df["artist"])
+    duration = pd.to_numeric(df["duration"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    valid = has_title & has_artist & ~np.isnan(duration) & (duration != 0)
+
+    keys = np.full(len(df), None, dtype=object)
+    if valid.any():
+        # np.rint 与 Python round() 一样是银行家舍入；不同的秒数很少，同样先去重再转字符串
+        second_codes, seconds = pd.factorize(np.rint(duration[valid]).astype(np.int64))
+        second_text = np.array([str(value) for value in seconds], dtype=object)
+        keys[valid] = (titles[title_codes[valid]] + "|" + artists[artist_codes[valid]]
+                       + "|" + second_text[second_codes])
+    return pd.Series(keys, index=df.index, dtype=object)
+
+
 def analyze(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    df["song_key"] = df.apply(normalize_key, axis=1)
+    df["song_key"] = build_song_keys(df)
     return df
 
 
+_library_versions = itertools.count(1)
+
+
+def next_library_version() -> int:
+    """新的音乐库版本号：每次建库或删除文件后更新，派生结果缓存（result_cache）据此失效"""
+    return next(_library_versions)
+
+
+class LibraryAnalysis:
+    """
+    基于 song_key 分组索引的一次性分析
+
+    构建时对 song_key 和 format 各做一次 factorize，得到每行的分组编号、每组的文件数和格式集合
+    （按格式编号的位掩码），之后的重复歌曲、仅 MP3、多版本和格式统计都只在分组数组上计算，
+    再用分组掩码一次取出对应的行，不再对整个数据框重复 groupby。
+
+    数据框发生变化（重新扫描）后需要重新构建；每次构建得到新的 version。
+
+    与 library_store.SqliteLibrary 提供相同的分析接口（duplicates / mp3_only / multi_version /
+    deletion_plan / identical / format_stats / summary / storage_caption / search_index / take）。
+    """
+
+    def __init__(self, df: pd.DataFrame, memory_report: dict = None, groups: tuple = None):
+        """
+        Args:
+            df: analyze 后的数据框
+            memory_report: library_frame.memory_report 的结果（压缩前后的内存占用），用于界面显示
+            groups: 已知的 song_key 分组 (group_codes, keys)，须与 pd.factorize(df["song_key"]) 相同；
+                None 表示现场计算（读取快照时直接使用快照中保存的分组编号）
+        """
+        self.df = df
+        self.memory_report = memory_report
+        self.version = next_library_version()
+        codes, keys = pd.factorize(df["song_key"]) if groups is None else groups
+        self.group_codes = codes  # 每行的分组编号，song_key 缺失为 -1
+        self.keys = np.asarray(keys, dtype=object)  # 分组编号 -> song_key
+        self.counts = np.bincount(codes[codes >= 0], minlength=len(self.keys))
+
+        # 每组包含的格式：第 i 位表示 self.formats[i]
+        format_codes, formats = pd.factorize(df["format"])
+        self.formats = [str(fmt) for fmt in formats]
+        keyed = codes >= 0
+        has_format = np.zeros((len(self.formats), len(self.keys)), dtype=bool)
+        for i in range(len(self.formats)):
+            has_format[i, codes[keyed & (format_codes == i)]] = True
+        self.format_codes = format_codes
+        self.has_format = has_format
+        self.format_masks = (has_format.astype(np.int64)
+                             << np.arange(len(self.formats), dtype=np.int64)[:, None]).sum(axis=0)
+        self.format_counts = has_format.sum(axis=0)
+        self._ranking = None
+
+    @property
+    def n_groups(self) -> int:
+        """唯一歌曲数（与 df["song_key"].nunique() 相同）"""
+        return len(self.keys)
+
+    def rows(self, group_mask: np.ndarray) -> pd.DataFrame:
+        """按分组掩码取出对应的行（保持原始顺序）"""
+        # 末尾追加 False，song_key 缺失的行（编号 -1）正好取到它
+        return self.df[np.append(group_mask, False)[self.group_codes]]
+
+    # ---------- 分组掩码 ----------
+
+    def duplicate_groups(self) -> np.ndarray:
+        """有多个文件的歌曲"""
+        return self.counts > 1
+
+    def mp3_only_groups(self) -> np.ndarray:
+        """所有版本都是 MP3 的歌曲"""
+        if "mp3" not in self.formats:
+            return np.zeros(self.n_groups, dtype=bool)
+        return self.format_masks == (1 << self.formats.index("mp3"))
+
+    def multi_version_groups(self) -> np.ndarray:
+        """同时有多种格式的歌曲"""
+        return self.format_counts > 1
+
+    # ---------- 报表 ----------
+
+    def duplicates(self) -> pd.DataFrame:
+        return self.rows(self.duplicate_groups())
+
+    def mp3_only(self) -> pd.DataFrame:
+        return self.rows(self.mp3_only_groups())
+
+    def multi_version(self) -> pd.DataFrame:
+        return self.rows(self.multi_version_groups())
+
+    def _rank(self):
+        """
+        对有重复的分组整体排序一次（分组, 优先级, 比特率, 采样率, 文件大小, 文件路径），
+        每组第一行为最佳版本。最后按路径而不是行号比较，增量更新（IncrementalAnalysis）的结果才能与行顺序无关
+        """
+        if self._ranking is None:
+            codes = self.group_codes
+            positions = np.flatnonzero((codes >= 0) & np.append(self.counts > 1, False)[codes])
+            if len(positions) == 0:
+                self._ranking = (positions, np.zeros(0, dtype=bool))
+                return self._ranking
+            dup = self.df.iloc[positions]
+            values = []
+            for col in KEEP_ORDER:
+                values.append(-(format_priorities(dup["format"]).to_numpy(dtype="float64") if col == "priority"
+                                else _numeric_column(dup, col)))
+            groups = codes[positions]
+            order = np.lexsort(values[::-1] + [groups])
+
+            sorted_groups = groups[order]
+            is_first = np.empty(len(order), dtype=bool)
+            is_first[0] = True
+            is_first[1:] = sorted_groups[1:] != sorted_groups[:-1]
+            order = self._break_ties(order, is_first, [v[order] for v in values], dup["file_path"])
+            self._ranking = (positions[order], is_first)
+        return self._ranking
+
+    @staticmethod
+    def _break_ties(order, is_first, sorted_values, paths):
+        """
+        组内排名第一的多个文件各项依据都相同时，改为保留路径最小的
+
+        只对这些并列的文件比较路径字符串，避免对全部重复文件做字符串排序
+        """
+        # 与前一行同组且各项依据都相同即为并列；每组开头的一段并列行里选路径最小的换到组首
+        tied = ~is_first[1:]
+        for values in sorted_values:
+            tied &= values[1:] == values[:-1]
+        run_start = np.concatenate([[True], ~tied])
+        run_ids = np.cumsum(run_start) - 1
+        run_lengths = np.bincount(run_ids)
+        heads = np.flatnonzero(is_first)
+        contested = heads[run_lengths[run_ids[heads]] > 1]
+        if len(contested) == 0:
+            return order
+        candidates = np.flatnonzero(np.isin(run_ids, run_ids[contested]))
+        candidate_paths = paths.iloc[order[candidates]].astype(str).to_numpy(dtype=object)
+        path_ranks, _ = pd.factorize(candidate_paths, sort=True)
+        by_run = candidates[np.lexsort((path_ranks, run_ids[candidates]))]
+        winners = by_run[np.concatenate([[True], run_ids[by_run][1:] != run_ids[by_run][:-1]])]
+        order = order.copy()
+        order[contested], order[winners] = order[winners], order[contested]
+        return order
+
+    def best_positions(self) -> np.ndarray:
+        """每组最佳版本在 df 中的位置（按分组编号排列）"""
+        best = np.empty(self.n_groups, dtype=np.int64)
+        keyed = np.flatnonzero(self.group_codes >= 0)
+        best[self.group_codes[keyed]] = keyed  # 单文件分组即其本身
+        ranked, is_first = self._rank()
+        best[self.group_codes[ranked[is_first]]] = ranked[is_first]
+        return best
+
+    def deletion_plan(self) -> DeletionPlan:
+        """
+        重复歌曲的删除计划：每组保留最佳版本，其余删除。
+        复杂度 O(n log n)，不再逐组扫描整个数据框
+        """
+        ranked, is_first = self._rank()
+        return DeletionPlan(self.df, np.sort(ranked[is_first]), np.sort(ranked[~is_first]))
+
+    def group_table(self, group_mask: np.ndarray = None) -> pd.DataFrame:
+        """
+        每首歌一行的汇总：song_key、文件数、格式列表（逗号分隔，按字母排序）、最佳版本的格式和位置
+
+        Args:
+            group_mask: 只汇总这些分组，None 表示全部
+        """
+        groups = np.arange(self.n_groups) if group_mask is None else np.flatnonzero(group_mask)
+        # 不同的格式组合很少，每种组合只拼接一次字符串
+        unique_masks, inverse = np.unique(self.format_masks[groups], return_inverse=True)
+        mask_text = np.array([", ".join(sorted(fmt for i, fmt in enumerate(self.formats) if mask >> i & 1))
+                              for mask in unique_masks] + [""], dtype=object)
+        best = self.best_positions()[groups]
+        best_format = (np.array(self.formats + [None], dtype=object)[self.format_codes[best]]
+                       if len(best) else np.array([], dtype=object))
+        return pd.DataFrame({
+            "song_key": self.keys[groups],
+            "version_count": self.counts[groups],
+            "formats": mask_text[inverse.reshape(-1)] if len(groups) else mask_text[:0],
+            "best_format": best_format,
+            "best_position": best,
+        })
+
+    def format_stats(self) -> pd.DataFrame:
+        """每种格式的文件数、歌曲数和总大小"""
+        valid = self.format_codes >= 0
+        files = np.bincount(self.format_codes[valid], minlength=len(self.formats))
+        sizes = np.zeros(len(self.formats))
+        if "file_size" in self.df.columns:
+            file_size = pd.to_numeric(self.df["file_size"], errors="coerce").to_numpy(dtype="float64", na_value=0.0)
+            sizes = np.bincount(self.format_codes[valid], weights=file_size[valid], minlength=len(self.formats))
+        return pd.DataFrame({
+            "format": self.formats,
+            "files": files,
+            "songs": self.has_format.sum(axis=1),
+            "total_size": sizes.astype(np.int64),
+        }).sort_values("files", ascending=False, ignore_index=True)
+
+    def identical_columns(self) -> list:
+        """有取值的哈希列（content_hash / audio_hash）"""
+        return [col for col in ("content_hash", "audio_hash") if col in self.df.columns and self.df[col].notna().any()]
+
+    def identical(self, by: str = "content_hash") -> pd.DataFrame:
+        return find_identical_files(self.df, by)
+
+    def identical_groups(self, by: str = "content_hash") -> int:
+        """完全相同文件的组数"""
+        if by not in self.df.columns:
+            return 0
+        counts = self.df[by].value_counts()
+        return int((counts > 1).sum())
+
+    def storage_caption(self) -> str:
+        if self.memory_report is None:
+            return f"💾 内存占用 {self.df.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB"
+        return (f"💾 内存占用 {self.memory_report['after'] / 1024 / 1024:.1f} MB"
+                f"（压缩前 {self.memory_report['before'] / 1024 / 1024:.1f} MB）")
+
+    def search_index(self) -> SearchIndex:
+        """全文和区间搜索索引（行号为数据框中的位置）"""
+        return SearchIndex(self.df)
+
+    def take(self, row_ids) -> pd.DataFrame:
+        """按 search_index 返回的行号取出行"""
+        return self.df.iloc[np.asarray(row_ids, dtype=np.int64)]
+
+    def remove_files(self, paths) -> "LibraryAnalysis":
+        """删除文件后的分析（在剩余的行上重新构建分组索引）"""
+        remaining = self.df[~self.df["file_path"].isin(list(paths))].reset_index(drop=True)
+        return LibraryAnalysis(remaining)
+
+    def summary(self) -> dict:
+        """侧栏和仪表板使用的计数"""
+        return {
+            "files": len(self.df),
+            "songs": self.n_groups,
+            "duplicate_songs": int(self.duplicate_groups().sum()),
+            "mp3_only_songs": int(self.mp3_only_groups().sum()),
+            "multi_version_songs": int(self.multi_version_groups().sum()),
+            "formats": int(self.df["format"].nunique()),
+        }
+
+
 def find_duplicates(df: pd.DataFrame) -> pd.DataFrame:
-    return df[df.duplicated("song_key", keep=False) & df["song_key"].notna()]
+    return LibraryAnalysis(df).duplicates()
 
 
 def find_mp3_only(df: pd.DataFrame) -> pd.DataFrame:
-    def only_mp3(group):
-        return set(group["format"]) == {"mp3"}
-
-    return (
-        df.groupby("song_key")
-        .filter(only_mp3)
-        .dropna(subset=["song_key"])
-    )
+    return LibraryAnalysis(df).mp3_only()
+
+
+def find_multi_version(df: pd.DataFrame) -> pd.DataFrame:
+    """同一首歌有多种格式的所有文件"""
+    return LibraryAnalysis(df).multi_version()
+
+
+def find_identical_files(df: pd.DataFrame, by: str = "content_hash") -> pd.DataFrame:
+    """
+    内容相同的文件
+
+    与基于标签的 song_key 不同，未打标签或标签错误的副本也能被识别
+
+    Args:
+        df: 完整数据框
+        by: "content_hash"（字节完全相同）或 "audio_hash"（音频数据相同，忽略标签）
+    """
+    if by not in df.columns:
+        return df.iloc[0:0]
+    return df[df[by].notna() & df.duplicated(by, keep=False)]
+
+
+def get_identical_to_delete(df: pd.DataFrame, by: str = "content_hash") -> pd.DataFrame:
+    """
+    返回内容相同文件中可以删除的副本
+    （每组保留第一个，删除其他）
+    """
+    identical = find_identical_files(df, by)
+    return identical[identical.duplicated(by, keep="first")]
+
+
+# ========== 分页索引 ==========
+
+class GroupIndex:
+    """
+    按分组键排序的行位置索引，界面翻页用
+
+    构建时做一次排序：所有行按（分组键, 格式优先级降序, 原始顺序）排好，分组 i 的行为
+    order[starts[i]:starts[i + 1]]。取一页只是两次数组切片，耗时只与页大小有关，与分组总数无关。
+    """
+
+    def __init__(self, df: pd.DataFrame, column: str, by_priority: bool = False):
+        """
+        Args:
+            df: 数据框（通常是 duplicates() / identical() 的结果）
+            column: 分组键列，缺失值的行不参与分组
+            by_priority: 组内是否按格式优先级从高到低排列（否则保持原始顺序）
+        """
+        codes, keys = pd.factorize(np.asarray(df[column], dtype=object), sort=True)
+        self.keys = np.asarray(keys, dtype=object)
+        sort_keys = [codes]
+        if by_priority:
+            sort_keys.insert(0, -format_priorities(df["format"]).to_numpy())
+        order = np.lexsort(sort_keys)  # lexsort 是稳定排序，相同优先级保持原始顺序
+        self.order = order[codes[order] >= 0]
+        self.starts = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(self.keys)))])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def pages(self, per_page: int) -> int:
+        return (len(self.keys) + per_page - 1) // per_page
+
+    def page(self, page: int, per_page: int):
+        """
+        第 page 页（从 0 开始）的分组
+
+        Returns:
+            (分组键数组, 每组在返回行位置中的起止偏移, 行位置数组)
+        """
+        first = page * per_page
+        last = min(first + per_page, len(self.keys))
+        bounds = self.starts[first:last + 1]
+        return self.keys[first:last], bounds - bounds[0], self.order[bounds[0]:bounds[-1]]
+
+
+# ========== 增量分析 ==========
+
+class ScanDelta:
+    """
+    两次扫描之间的变化
+
+    Attributes:
+        added: 新增文件的行（scan_music 的输出格式，不需要 song_key）
+        modified: 内容变化的文件的新行
+        removed: 已删除文件的路径
+    """
+
+    def __init__(self, added: pd.DataFrame = None, modified: pd.DataFrame = None, removed=()):
+        self.added = added if added is not None else pd.DataFrame()
+        self.modified = modified if modified is not None else pd.DataFrame()
+        self.removed = list(removed)
+
+    def __len__(self):
+        return len(self.added) + len(self.modified) + len(self.removed)
+
+    @classmethod
+    def between(cls, old: pd.DataFrame, new: pd.DataFrame) -> "ScanDelta":
+        """
+        按 file_path 对比两次扫描结果（扫描输出的列逐行比较，song_key 等分析列不参与）
+
+        Args:
+            old: 上一次的数据框
+            new: 本次扫描的数据框
+        """
+        columns = [col for col in new.columns if col in old.columns and col != "song_key"]
+        old_rows = old.set_index(old["file_path"].astype(str))[columns]
+        new_rows = new.set_index(new["file_path"].astype(str))[columns]
+        in_old = new_rows.index.isin(old_rows.index)
+        removed = old_rows.index[~old_rows.index.isin(new_rows.index)]
+
+        common = new_rows.index[in_old]
+        old_common, new_common = old_rows.loc[common], new_rows[in_old]
+        same = np.ones(len(common), dtype=bool)
+        for col in columns:
+            same &= _same_values(old_common[col], new_common[col])
+        changed = common[~same]
+        return cls(
+            added=new[~in_old].reset_index(drop=True),
+            modified=new[new_rows.index.isin(changed)].reset_index(drop=True),
+            removed=removed.tolist(),
+        )
+
+
+def _same_values(old: pd.Series, new: pd.Series) -> np.ndarray:
+    """
+    逐行比较两列，忽略列类型的差异（compact_frame 压缩过的 category / UInt / float32 与扫描得到的原始类型）；
+    两边都缺失视为相同
+    """
+    if pd.api.types.is_numeric_dtype(old) and pd.api.types.is_numeric_dtype(new):
+        # 任一边为浮点时按 float32 比较（compact_frame 把 duration 存为 float32）
+        dtype = "float32" if pd.api.types.is_float_dtype(old) or pd.api.types.is_float_dtype(new) else "float64"
+        a = old.to_numpy(dtype=dtype, na_value=np.nan)
+        b = new.to_numpy(dtype=dtype, na_value=np.nan)
+        return (a == b) | (np.isnan(a) & np.isnan(b))
+    a = old.astype(object).to_numpy()
+    b = new.astype(object).to_numpy()
+    return (a == b) | (pd.isna(a) & pd.isna(b))
+
+
+def _rank_tuples(df: pd.DataFrame) -> list:
+    """每行的保留排序依据（越小越优先），与 LibraryAnalysis._rank 使用相同的数值转换"""
+    columns = []
+    for col in KEEP_ORDER:
+        values = (format_priorities(df["format"]).to_numpy(dtype="float64") if col == "priority"
+                  else _numeric_column(df, col))
+        columns.append((-values).tolist())
+    return list(zip(*columns))
+
+
+class IncrementalAnalysis:
+    """
+    可增量更新的分组分析
+
+    按文件路径记录每个文件的 (song_key, 格式, 保留排序依据)，以及每个 song_key 的文件集合。
+    apply(delta) 只重新计算受影响的 song_key：重复歌曲、仅 MP3、多版本集合，以及删除计划中
+    该歌曲保留 / 删除的文件。结果与对更新后的完整数据框重新构建 LibraryAnalysis 相同（集合意义上）。
+
+    完整的数据框只在调用 frame / duplicates() 等需要整行数据的方法时才合并生成。
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Args:
+            df: analyze 后的数据框（file_path 唯一）
+        """
+        self._entries = {}  # file_path -> (song_key, format, rank)
+        self._groups = {}  # song_key -> {file_path}
+        self._format_files = {}  # format -> 文件数
+        self.duplicate_keys = set()
+        self.mp3_only_keys = set()
+        self.multi_version_keys = set()
+        self._plan = {}  # 有重复的 song_key -> (保留的路径, 删除的路径元组)
+        self.keep_paths = set()
+        self.delete_paths = set()
+        self._frame = df
+        self._pending_removed = set()
+        self._pending_frames = []
+        self._insert(df)
+        for key in self._groups:
+            self._refresh(key)
+
+    def _insert(self, df: pd.DataFrame) -> set:
+        """登记 analyze 后的行，返回涉及的 song_key"""
+        paths = df["file_path"].astype(str).tolist()
+        keys = df["song_key"].astype(object).where(df["song_key"].notna(), None).tolist()
+        formats = df["format"].astype(object).where(df["format"].notna(), None).tolist()
+        touched = set()
+        for path, key, fmt, rank in zip(paths, keys, formats, _rank_tuples(df)):
+            fmt = None if fmt is None else str(fmt)
+            self._entries[path] = (key, fmt, rank)
+            if fmt is not None:
+                self._format_files[fmt] = self._format_files.get(fmt, 0) + 1
+            if key is not None:
+                self._groups.setdefault(key, set()).add(path)
+                touched.add(key)
+        return touched
+
+    def _remove(self, path: str):
+        """注销一个文件，返回其 song_key（文件不存在时为 None）"""
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return None
+        key, fmt, _ = entry
+        if fmt is not None:
+            self._format_files[fmt] -= 1
+            if not self._format_files[fmt]:
+                del self._format_files[fmt]
+        if key is not None:
+            self._groups[key].discard(path)
+        return key
+
+    def _clear_plan(self, key: str):
+        """撤销一个 song_key 原来的删除计划"""
+        old = self._plan.pop(key, None)
+        if old is not None:
+            self.keep_paths.discard(old[0])
+            self.delete_paths.difference_update(old[1])
+
+    def _refresh(self, key: str):
+        """重新计算一个 song_key 的各项结果（调用前需已撤销其原来的删除计划）"""
+        members = self._groups.get(key)
+        if not members:
+            self._groups.pop(key, None)
+            for keys in (self.duplicate_keys, self.mp3_only_keys, self.multi_version_keys):
+                keys.discard(key)
+            return
+
+        formats = {self._entries[path][1] for path in members} - {None}
+        for keys, flag in ((self.duplicate_keys, len(members) > 1),
+                           (self.mp3_only_keys, formats == {"mp3"}),
+                           (self.multi_version_keys, len(formats) > 1)):
+            if flag:
+                keys.add(key)
+            else:
+                keys.discard(key)
+
+        if len(members) > 1:
+            ranked = sorted(members, key=lambda path: (self._entries[path][2], path))
+            self._plan[key] = (ranked[0], tuple(ranked[1:]))
+            self.keep_paths.add(ranked[0])
+            self.delete_paths.update(ranked[1:])
+
+    def apply(self, delta: ScanDelta) -> set:
+        """
+        应用扫描变化，只更新受影响的 song_key
+
+        Returns:
+            受影响的 song_key 集合
+        """
+        affected = set()
+        changed = [frame for frame in (delta.added, delta.modified) if len(frame)]
+        replaced = set(delta.removed) | {p for frame in changed for p in frame["file_path"].astype(str)}
+        for path in replaced:
+            key = self._remove(path)
+            if key is not None:
+                affected.add(key)
+        # 被删除或再次修改的文件也可能在之前尚未合并的变化中，以最后一次为准
+        self._pending_removed |= replaced
+        self._pending_frames = [frame[~frame["file_path"].astype(str).isin(replaced)]
+                                for frame in self._pending_frames]
+        for frame in changed:
+            analyzed = analyze(frame)
+            affected |= self._insert(analyzed)
+            self._pending_frames.append(analyzed)
+        # 文件可能从一个 song_key 移到另一个，先撤销全部受影响分组的旧计划再重新计算
+        for key in affected:
+            self._clear_plan(key)
+        for key in affected:
+            self._refresh(key)
+        return affected
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """当前的完整数据框（合并尚未写入的变化；被修改的文件排在末尾）"""
+        if self._pending_removed or self._pending_frames:
+            kept = self._frame[~self._frame["file_path"].astype(str).isin(self._pending_removed)]
+            # 全为空的列不参与类型推断（由 concat 补为缺失值），与 pandas 未来的行为保持一致
+            added = [frame.dropna(axis=1, how="all") for frame in self._pending_frames]
+            self._frame = pd.concat([kept] + added, ignore_index=True)
+            self._pending_removed = set()
+            self._pending_frames = []
+        return self._frame
+
+    def paths(self, keys: set) -> set:
+        """这些 song_key 下的所有文件路径"""
+        return {path for key in keys for path in self._groups[key]}
+
+    def _rows(self, keys: set) -> pd.DataFrame:
+        frame = self.frame
+        return frame[frame["file_path"].astype(str).isin(self.paths(keys))]
+
+    def duplicates(self) -> pd.DataFrame:
+        return self._rows(self.duplicate_keys)
+
+    def mp3_only(self) -> pd.DataFrame:
+        return self._rows(self.mp3_only_keys)
+
+    def multi_version(self) -> pd.DataFrame:
+        return self._rows(self.multi_version_keys)
+
+    def summary(self) -> dict:
+        """与 LibraryAnalysis.summary 相同的计数"""
+        return {
+            "files": len(self._entries),
+            "songs": len(self._groups),
+            "duplicate_songs": len(self.duplicate_keys),
+            "mp3_only_songs": len(self.mp3_only_keys),
+            "multi_version_songs": len(self.multi_version_keys),
+            "formats": len(self._format_files),
+        }
+
+
+# ========== 模糊重复匹配 ==========
+
+# 括号中的内容和 " - xxx" 后缀视为版本标记（Live、Remastered、伴奏等），不参与标题比较
+_VERSION_PATTERN = re.compile(r"[\(\[（【〔<《{]([^\)\]）】〕>》}]*)[\)\]）】〕>》}]|\s+-\s+(.*)$")
+_FEAT_PATTERN = re.compile(r"\s(?:feat|ft)\.?\s.*$")
+_ARTIST_SEPARATOR = re.compile(r"\s*(?:;|；|,|，|/|／|&|＆|、|\+|\s(?:feat|ft)\.?\s)\s*")
+_NON_WORD = re.compile(r"[\W_]+")
+
+# 64 位乘法哈希的奇数乘子，MinHash 的每个哈希函数为 (x ^ seed) * multiplier
+_MINHASH_SEEDS = np.random.default_rng(20240601).integers(1, 2 ** 63, size=(64, 2), dtype=np.uint64) | np.uint64(1)
+
+
+def normalize_title(title: str):
+    """
+    标题规范化
+
+    Returns:
+        (base, version)：base 为去掉版本标记和标点、转小写后的标题；
+        version 为排序后的版本标记元组，例如 "Song (Live)" -> ("song", ("live",))
+    """
+    text = unicodedata.normalize("NFKC", title).lower()
+    tags = []
+    for match in _VERSION_PATTERN.finditer(text):
+        tag = _NON_WORD.sub(" ", match.group(1) or match.group(2) or "").strip()
+        if tag and not tag.startswith(("feat ", "ft ")):
+            tags.append(tag)
+    base = _FEAT_PATTERN.sub("", _VERSION_PATTERN.sub(" ", text))
+    base = _NON_WORD.sub(" ", base).strip()
+    if not base:  # 整个标题都在括号里
+        base = _NON_WORD.sub(" ", text).strip()
+    return base, tuple(sorted(tags))
+
+
+def normalize_artists(artist: str) -> frozenset:
+    """艺术家拆分为规范化后的集合，例如 "Jay Chou; 周杰伦" -> {"jay chou", "周杰伦"}"""
+    text = unicodedata.normalize("NFKC", artist).lower()
+    names = (_NON_WORD.sub(" ", name).strip() for name in _ARTIST_SEPARATOR.split(text))
+    return frozenset(name for name in names if name)
+
+
+def title_ngrams(base: str, n: int) -> frozenset:
+    """去掉空格后的字符 n-gram（对中日韩文字同样适用），短于 n 的标题整体作为一个 n-gram"""
+    text = base.replace(" ", "")
+    if len(text) <= n:
+        return frozenset([text])
+    return frozenset([text[i:i + n] for i in range(len(text) - n + 1)])
+
+
+def _minhash_signatures(ngram_sets: list, num_perm: int) -> np.ndarray:
+    """
+    每个 n-gram 集合的 MinHash 签名，形状 (集合数, num_perm)
+
+    n-gram 先用 CRC32 映射为整数（跨进程稳定，Python 的字符串哈希每次启动都不同），
+    再对所有 (集合编号, n-gram 哈希) 一次性做向量化的最小值归约
+    """
+    owners = np.repeat(np.arange(len(ngram_sets)), [len(ngrams) for ngrams in ngram_sets])
+    values = np.fromiter((zlib.crc32(gram.encode("utf-8")) for ngrams in ngram_sets for gram in ngrams),
+                         dtype=np.uint64, count=len(owners))
+    starts = np.searchsorted(owners, np.arange(len(ngram_sets)))
+    signatures = np.empty((len(ngram_sets), num_perm), dtype=np.uint64)
+    for k in range(num_perm):
+        seed, multiplier = _MINHASH_SEEDS[k]
+        hashed = (values ^ seed) * multiplier  # uint64 溢出即取模 2^64
+        signatures[:, k] = np.minimum.reduceat(hashed, starts)
+    return signatures
+
+
+def _band_keys(signatures: np.ndarray, band: int, rows_per_band: int) -> np.ndarray:
+    """把一个 band 的 rows_per_band 个 MinHash 值合并为一个桶编号"""
+    key = np.zeros(len(signatures), dtype=np.uint64)
+    for value in signatures[:, band * rows_per_band:(band + 1) * rows_per_band].T:
+        key = (key * np.uint64(0x100000001B3)) ^ value
+    return key
+
+
+def _sweep_pairs(buckets: np.ndarray, durations: np.ndarray, window: float, max_neighbors: int):
+    """
+    桶内按时长排序后扫描：只与后面 window 秒内的文件配对，每个文件最多 max_neighbors 个
+
+    Returns:
+        (left, right) 行号数组，left < right
+    """
+    order = np.lexsort((durations, buckets))
+    sorted_buckets = buckets[order]
+    sorted_durations = durations[order]
+    lefts, rights = [], []
+    for shift in range(1, max_neighbors + 1):
+        valid = ((sorted_buckets[shift:] == sorted_buckets[:-shift])
+                 & (sorted_durations[shift:] - sorted_durations[:-shift] <= window))
+        if not valid.any():
+            break
+        hits = np.flatnonzero(valid)
+        lefts.append(order[hits])
+        rights.append(order[hits + shift])
+    if not lefts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    left, right = np.concatenate(lefts), np.concatenate(rights)
+    return np.minimum(left, right), np.maximum(left, right)
+
+
+def _pair_similarity(ids_a: np.ndarray, ids_b: np.ndarray, sets, similarity) -> np.ndarray:
+    """
+    按 (编号, 编号) 去重后计算集合相似度；编号相同为 1，任一为 -1（缺失）为 0
+
+    Args:
+        sets: 编号 -> 集合（列表或字典）
+    """
+    result = np.zeros(len(ids_a))
+    same = (ids_a == ids_b) & (ids_a >= 0)
+    result[same] = 1.0
+    todo = np.flatnonzero(~same & (ids_a >= 0) & (ids_b >= 0))
+    if len(todo):
+        # 两个编号合成一个整数再去重，比按行去重（np.unique(axis=0)）快得多
+        width = np.int64(max(ids_a.max(), ids_b.max()) + 1)
+        pairs, inverse = np.unique(ids_a[todo] * width + ids_b[todo], return_inverse=True)
+        firsts, seconds = np.divmod(pairs, width)
+        scores = np.array([similarity(sets[a], sets[b]) for a, b in zip(firsts.tolist(), seconds.tolist())])
+        result[todo] = scores[inverse.reshape(-1)]
+    return result
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b)
+
+
+def _overlap(a: frozenset, b: frozenset) -> float:
+    """重叠系数：合唱 / 多艺术家写法中只要一方被另一方包含即视为相同"""
+    return len(a & b) / min(len(a), len(b))
+
+
+def _connected_labels(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """由边求连通分量：每个节点的标签为所在分量的最小节点编号（向量化标签传播 + 指针跳跃）"""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, low)
+        np.minimum.at(updated, right, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def find_fuzzy_duplicates(df: pd.DataFrame, threshold: float = None, duration_window: float = None) -> pd.DataFrame:
+    """
+    模糊重复匹配
+
+    能识别精确 song_key 漏掉的情况："Song (Live)" 与 "Song"、"周杰伦" 与 "Jay Chou; 周杰伦"、
+    时长跨越取整边界（199.4 与 199.6）。
+
+    1. 分块：规范化标题的 n-gram 做 MinHash，分成若干 band，每个 band 的哈希值相同的文件进入同一个桶；
+       桶内按时长排序，只与 duration_window 秒内的后续文件组成候选对（不做全量两两比较）
+    2. 打分：只对候选对计算 0.5 × 标题 Jaccard + 0.3 × 艺术家重叠系数 + 0.2 × 时长接近度，
+       版本标记不同时按 version_penalty 扣分
+    3. 聚类：得分达到 threshold 的候选对连成组
+
+    Args:
+        df: analyze 后的数据框（需要 title / artist / duration 列）
+        threshold: 最低得分，默认 FUZZY_MATCH["threshold"]
+        duration_window: 时长窗口（秒），默认 FUZZY_MATCH["duration_window"]
+
+    Returns:
+        属于某个组的文件（按组排列），附加列：
+        fuzzy_cluster 组编号；fuzzy_score 该文件与组内其他文件的最高得分；
+        fuzzy_confidence 组置信度（组内各文件 fuzzy_score 的最小值）
+    """
+    threshold = FUZZY_MATCH["threshold"] if threshold is None else threshold
+    window = FUZZY_MATCH["duration_window"] if duration_window is None else duration_window
+    bands, rows_per_band = FUZZY_MATCH["bands"], FUZZY_MATCH["rows_per_band"]
+
+    # 标题、时长缺失的文件不参与
+    title_codes, titles = pd.factorize(df["title"])
+    duration = pd.to_numeric(df["duration"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    title_ok = np.array([bool(str(t).strip()) for t in titles] + [False], dtype=bool)
+    candidates = np.flatnonzero(title_ok[title_codes] & ~np.isnan(duration) & (duration > 0))
+    empty = df.iloc[0:0].assign(fuzzy_cluster=pd.Series(dtype="int64"), fuzzy_score=pd.Series(dtype="float64"),
+                                fuzzy_confidence=pd.Series(dtype="float64"))
+    if len(candidates) < 2:
+        return empty
+
+    # 规范化只对去重后的标题 / 艺术家做一次
+    normalized = [normalize_title(str(t)) for t in titles]
+    base_codes, bases = pd.factorize(np.array([base for base, _ in normalized] + [""], dtype=object))
+    version_codes, _ = pd.factorize(np.array([str(tags) for _, tags in normalized] + [""], dtype=object))
+    row_base = base_codes[title_codes[candidates]]
+    row_version = version_codes[title_codes[candidates]]
+    durations = duration[candidates]
+
+    artist_codes, artists = pd.factorize(df["artist"])
+    artist_sets = [normalize_artists(str(a)) for a in artists]
+    set_codes, unique_sets = pd.factorize(np.array(artist_sets + [frozenset()], dtype=object))
+    set_codes = np.where(np.array([bool(s) for s in unique_sets])[set_codes], set_codes, -1)
+    row_artist = set_codes[artist_codes[candidates]]
+
+    # 1. 分块
+    signatures = _minhash_signatures([title_ngrams(base, FUZZY_MATCH["block_ngram"]) for base in bases],
+                                     bands * rows_per_band)
+    lefts, rights = [], []
+    for band in range(bands):
+        left, right = _sweep_pairs(_band_keys(signatures, band, rows_per_band)[row_base], durations,
+                                   window, FUZZY_MATCH["max_neighbors"])
+        lefts.append(left)
+        rights.append(right)
+    width = np.int64(len(candidates))
+    pairs = np.unique(np.concatenate(lefts) * width + np.concatenate(rights))
+    if len(pairs) == 0:
+        return empty
+    left, right = np.divmod(pairs, width)
+
+    # 2. 打分
+    # 只有出现在候选对中的标题才需要计算打分用的 n-gram
+    ngram_sets = {i: title_ngrams(bases[i], FUZZY_MATCH["score_ngram"])
+                  for i in np.unique(np.concatenate([row_base[left], row_base[right]])).tolist()}
+    title_sim = _pair_similarity(row_base[left], row_base[right], ngram_sets, _jaccard)
+    artist_sim = _pair_similarity(row_artist[left], row_artist[right], list(unique_sets), _overlap)
+    duration_sim = np.clip(1 - np.abs(durations[left] - durations[right]) / window, 0, 1) if window else 1.0
+    score = 0.5 * title_sim + 0.3 * artist_sim + 0.2 * duration_sim
+    score = np.where(row_version[left] == row_version[right], score, score * (1 - FUZZY_MATCH["version_penalty"]))
+    accepted = score >= threshold
+    left, right, score = left[accepted], right[accepted], score[accepted]
+    if len(left) == 0:
+        return empty
+
+    # 3. 聚类
+    labels = _connected_labels(len(candidates), left, right)
+    best = np.zeros(len(candidates))
+    np.maximum.at(best, left, score)
+    np.maximum.at(best, right, score)
+    members = np.flatnonzero(best > 0)
+    cluster_codes, _ = pd.factorize(labels[members])
+    confidence = np.ones(cluster_codes.max() + 1)
+    np.minimum.at(confidence, cluster_codes, best[members])
+
+    order = np.lexsort((members, cluster_codes))
+    result = df.iloc[candidates[members[order]]].copy()
+    result["fuzzy_cluster"] = cluster_codes[order]
+    result["fuzzy_score"] = best[members[order]].round(3)
+    result["fuzzy_confidence"] = confidence[cluster_codes[order]].round(3)
+    return result
@@ -1,12 +1,14 @@
 import streamlit as st
 import pandas as pd
-import os
 from pathlib import Path
 
-from scanner import scan_music
-from analyzer import analyze, find_duplicates, find_mp3_only, mark_files_to_delete, get_duplicates_to_delete
-from config import PAGE_CONFIG, STYLE_CSS
-from views import show_duplicates_view, show_mp3_view, show_dashboard
+from deletion import delete_files as run_deletion
+from dir_tree import directory_tree
+from library_snapshot import auto_snapshot
+from scan_jobs import get_scan_job, latest_scan_job, start_scan_job
+from result_cache import cached_results
+from config import PAGE_CONFIG, STYLE_CSS, DELETION, DIR_TREE, HEADER_ONLY, SCAN_WALK, SCAN_WORKERS
+from views import show_duplicates_view, show_identical_view, show_mp3_view, show_search_view, show_dashboard
 
 # 页面配置
 st.set_page_config(**PAGE_CONFIG)
@@ -16,157 +18,217 @@ st.markdown(STYLE_CSS, unsafe_allow_html=True)
 
 # ========== 初始化会话状态 ==========
 if "current_path" not in st.session_state:
-    st.session_state.current_path = "G:\\music"
-if "df" not in st.session_state:
-    st.session_state.df = None
+    # 新打开的页面（刷新浏览器）回到最近一次扫描的目录，继续显示其进度或结果
+    last_job = latest_scan_job()
+    st.session_state.current_path = last_job.root_dir if last_job is not None else "G:\\music"
+if "path_input" not in st.session_state:
+    st.session_state.path_input = st.session_state.current_path  # 路径输入框（导航时由 change_path 同步）
+if "analysis" not in st.session_state:
+    st.session_state.analysis = None  # 扫描结果的分析接口（LibraryAnalysis 或 SqliteLibrary，见 config.ANALYSIS_BACKEND）
 if "dup_page" not in st.session_state:
     st.session_state.dup_page = 0
 if "mp3_page" not in st.session_state:
     st.session_state.mp3_page = 0
+if "identical_page" not in st.session_state:
+    st.session_state.identical_page = 0
 if "selected_function" not in st.session_state:
     st.session_state.selected_function = None
+if "results" not in st.session_state:
+    st.session_state.results = None  # 当前音乐库版本的派生结果缓存（见 result_cache）
+if "adopted_job" not in st.session_state:
+    st.session_state.adopted_job = None  # 已采用其结果的后台扫描任务（见 scan_jobs）
+if "scan_message" not in st.session_state:
+    st.session_state.scan_message = None
 
 # ========== 工具函数 ==========
 def delete_files(rows):
-    """删除文件列表中的文件，并记录操作日志"""
-    import datetime
-    import json
-    
-    deleted = []
-    failed = []
-    log_entries = []
-    
-    # 创建 logs 目录
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # 日志文件路径
-    log_file = log_dir / f"delete_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    
-    for file_path in rows["file_path"]:
-        try:
-            # 记录文件信息
-            file_info = {
-                "file_path": str(file_path),
-                "file_name": Path(file_path).name,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "status": "deleted",
-                "error": None
-            }
-            
-            # 执行删除
-            os.remove(file_path)
-            deleted.append(file_path)
-            
-            log_entries.append(file_info)
-            print(f"✓ 已删除: {file_path}")
-            
-        except Exception as e:
-            error_msg = str(e)
-            failed.append((file_path, error_msg))
-            
-            # 记录失败信息
-            file_info = {
-                "file_path": str(file_path),
-                "file_name": Path(file_path).name,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "status": "failed",
-                "error": error_msg
-            }
-            log_entries.append(file_info)
-            print(f"✗ 删除失败: {file_path} - {error_msg}")
-    
-    # 写入日志文件
-    if log_entries:
-        log_data = {
-            "operation": "delete_files",
-            "timestamp": datetime.datetime.now().isoformat(),
-            "summary": {
-                "total": len(log_entries),
-                "deleted": len(deleted),
-                "failed": len(failed)
-            },
-            "entries": log_entries
-        }
-        
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
-        print(f"\n📋 操作日志已保存: {log_file}")
+    """删除（或隔离）文件列表中的文件，操作日志见 deletion"""
+    mode = st.session_state.get("delete_mode", DELETION["mode"])
+    deleted, failed, journal = run_deletion(rows["file_path"], mode=mode,
+                                            root_dir=st.session_state.current_path)
+    if mode == "quarantine" and deleted:
+        st.info(f"♻️ 已移到回收目录 {DELETION['trash_dir']}，可恢复: `python deletion.py restore {journal}`")
+    
+    # 从分析结果中移除已删除的文件，版本号随之更新，派生结果缓存失效
+    if deleted and st.session_state.analysis is not None:
+        st.session_state.analysis = st.session_state.analysis.remove_files(deleted)
+        # 快照随之更新，下载清单不会再列出已删除的文件（中途停止的扫描结果不写快照）
+        job = st.session_state.adopted_job
+        if job is not None and not job.interrupted:
+            auto_snapshot(st.session_state.analysis, job.root_dir)
     
     return deleted, failed
 
-def get_subdirectories(path):
-    """获取路径下的子目录列表"""
-    try:
-        return sorted([d.name for d in Path(path).iterdir() if d.is_dir() and not d.name.startswith(".")])
-    except:
-        return []
+def change_path(new_path):
+    """切换当前路径（作为控件回调在下一次运行前执行，同时同步路径输入框）"""
+    st.session_state.current_path = new_path
+    st.session_state.path_input = new_path
+    st.session_state.analysis = None
+    st.session_state.selected_function = None
+
+def format_scan_progress(stats):
+    """格式化扫描进度文本"""
+    return (f"已发现 {stats['files_seen']} 个文件 · 解析 {stats['files_parsed']} · "
+            f"缓存命中 {stats['cache_hits']} · 读取 {stats['bytes_read'] / 1024 / 1024:.1f} MB · "
+            f"遍历 {stats['walk_time']:.1f}s / 解析 {stats['parse_time']:.1f}s")
+
+def adopt_scan_result(job):
+    """采用已完成的后台扫描结果（每个任务只采用一次）"""
+    st.session_state.adopted_job = job
+    st.session_state.selected_function = None
+    st.session_state.analysis = job.result
+    if job.result is None:
+        st.session_state.scan_message = ("error", "❌ 扫描已停止，尚未解析到音乐文件" if job.interrupted else "❌ 未找到音乐文件!")
+        return
+    
+    files = job.result.summary()["files"]
+    if job.interrupted:
+        st.session_state.scan_message = ("warning", f"⏹️ 扫描已停止，保留已解析的 {files} 个文件")
+    else:
+        stats = job.stats
+        st.session_state.scan_message = ("success", f"✅ 扫描完成! 找到 {files} 个文件"
+                                                    f"（缓存命中 {stats['cache_hits']}，重新解析 {stats['cache_misses']}）")
+
+@st.fragment(run_every=1.0)
+def show_scan_progress(job):
+    """后台扫描进度（每秒刷新这一部分，页面其余部分照常浏览）"""
+    if not job.active:
+        st.rerun()  # 扫描结束或已停止，刷新整个页面以采用结果
+    
+    if job.state == "analyzing":
+        st.info(f"🧮 扫描完成，正在分析 {job.rows} 个文件...")
+        return
+    
+    col_text, col_stop = st.columns([4, 1])
+    with col_text:
+        st.caption(f"⏳ 正在后台扫描，已解析 {job.rows} 个文件" + (
+            f"（其中 {job.restored_rows} 个从上次中断的断点恢复）" if job.restored_rows else "") + (
+            f" · {format_scan_progress(job.stats)}" if job.stats else ""))
+    with col_stop:
+        if st.button("⏹️ 停止扫描", use_container_width=True, key="scan_stop"):
+            job.cancel()
+    if job.preview:
+        with st.expander("最新一批", expanded=False):
+            st.dataframe(pd.DataFrame(job.preview)[["title", "artist", "album", "format", "duration"]],
+                         use_container_width=True, height=240)
+
+scan_job = get_scan_job(st.session_state.current_path)
+if scan_job is not None and scan_job.state == "finished" and st.session_state.adopted_job is not scan_job:
+    adopt_scan_result(scan_job)
 
 # ========== 标题和路径显示 ==========
 st.title("🎵 音乐库智能分析工具")
 st.markdown(f"<div class='path-display'>📂 当前路径: {st.session_state.current_path}</div>", unsafe_allow_html=True)
+if scan_job is not None and scan_job.active:
+    show_scan_progress(scan_job)
 
 # ========== 左侧侧栏 ==========
 with st.sidebar:
     st.markdown("### 🎛️ 扫描设置")
     
     # 路径输入
-    new_path = st.text_input("📁 输入路径:", value=st.session_state.current_path, key="path_input")
-    if new_path != st.session_state.current_path:
-        st.session_state.current_path = new_path
-        st.session_state.df = None
-        st.session_state.selected_function = None
-        st.rerun()
+    st.text_input("📁 输入路径:", key="path_input",
+                  on_change=lambda: change_path(st.session_state.path_input))
     
     st.divider()
     
     # 导航按钮
-    col_up = st.columns(1)
-    with col_up[0]:
-        if st.button("⬆️ 上一级", use_container_width=True):
-            parent = str(Path(st.session_state.current_path).parent)
-            if parent != st.session_state.current_path:
-                st.session_state.current_path = parent
-                st.session_state.df = None
-                st.session_state.selected_function = None
-                st.rerun()
+    parent = str(Path(st.session_state.current_path).parent)
+    st.button("⬆️ 上一级", use_container_width=True, disabled=parent == st.session_state.current_path,
+              on_click=change_path, args=(parent,))
     
-    # 子目录选择
-    subdirs = get_subdirectories(st.session_state.current_path)
+    # 子目录选择（目录列表有缓存，见 dir_tree）
+    subdirs = directory_tree.children(st.session_state.current_path)
     if subdirs:
-        st.markdown("**子目录快速跳转:**")
-        for subdir in subdirs[:10]:  # 只显示前10个
-            if st.button(f"📂 {subdir}", use_container_width=True, key=f"subdir_{subdir}"):
-                new_path = str(Path(st.session_state.current_path) / subdir)
-                st.session_state.current_path = new_path
-                st.session_state.df = None
-                st.session_state.selected_function = None
+        col_title, col_refresh = st.columns([4, 1])
+        with col_title:
+            st.markdown(f"**子目录快速跳转（{len(subdirs)}）:**")
+        with col_refresh:
+            if st.button("🔄", key="subdir_refresh", help="重新读取子目录列表"):
+                directory_tree.invalidate(st.session_state.current_path)
                 st.rerun()
+        # 下拉框在浏览器端边输入边过滤，适合有数百个艺术家目录的文件夹
+        current = Path(st.session_state.current_path)
+        search_key = f"subdir_search_{current}"
+        st.selectbox("🔎 搜索子目录", subdirs, index=None, placeholder="输入名称搜索...",
+                     key=search_key, label_visibility="collapsed",
+                     on_change=lambda: change_path(str(current / st.session_state[search_key])))
+        for subdir in subdirs[:DIR_TREE["max_buttons"]]:
+            st.button(f"📂 {subdir}", use_container_width=True, key=f"subdir_{subdir}",
+                      on_click=change_path, args=(str(current / subdir),))
+        if len(subdirs) > DIR_TREE["max_buttons"]:
+            st.caption(f"… 另有 {len(subdirs) - DIR_TREE['max_buttons']} 个子目录，可在上方搜索")
     
     st.divider()
     
-    # 扫描按钮
-    if st.button("🔍 开始扫描", use_container_width=True, type="primary"):
+    # 并行解析设置
+    scan_workers = st.number_input("⚙️ 并行解析进程数", min_value=1, max_value=64,
+                                   value=SCAN_WORKERS["workers"], step=1,
+                                   help="1 为串行扫描；多核机器上调大可显著加快 FLAC 等文件的解析")
+    
+    # 遍历设置
+    scan_exclude = st.text_input("🚫 排除目录/文件（通配符，逗号分隔）",
+                                 value=", ".join(SCAN_WALK["exclude"]),
+                                 help="匹配文件/目录名或相对路径，例如: Podcasts, @eaDir, */Live/*")
+    scan_max_depth = st.number_input("📏 最大子目录层数", min_value=0, max_value=64,
+                                     value=SCAN_WALK["max_depth"], step=1, placeholder="不限",
+                                     help="0 表示只扫描当前目录，留空表示不限")
+    
+    scan_header_only = st.checkbox("📡 仅读取文件头（网络磁盘）", value=HEADER_ONLY["enabled"],
+                                   help=f"每个文件最多读取 {HEADER_ONLY['max_read_kib']} KiB，"
+                                        "超出上限的文件" + ("回退为完整解析" if HEADER_ONLY["fallback"] else "元数据记为未知"))
+    
+    # 删除方式：隔离模式只在同一磁盘上重命名，可按日志恢复
+    st.radio("🗑️ 删除方式", ["delete", "quarantine"], key="delete_mode", horizontal=True,
+             index=["delete", "quarantine"].index(DELETION["mode"]),
+             format_func={"delete": "永久删除", "quarantine": "移到回收目录"}.get)
+    
+    # 扫描按钮：扫描在后台进行，期间可以继续浏览之前的结果
+    if scan_job is not None and scan_job.active:
+        st.button("⏳ 扫描中...", use_container_width=True, disabled=True)
+    elif st.button("🔍 开始扫描", use_container_width=True, type="primary"):
         if not Path(st.session_state.current_path).exists():
             st.error("❌ 路径不存在!")
         else:
-            with st.spinner("正在扫描音乐文件..."):
-                music_list = scan_music(st.session_state.current_path)
-                if music_list:
-                    st.session_state.df = pd.DataFrame(music_list)
-                    st.session_state.df = analyze(st.session_state.df)
-                    st.session_state.selected_function = None
-                    st.success(f"✅ 扫描完成! 找到 {len(st.session_state.df)} 个文件")
-                    st.rerun()
-                else:
-                    st.error("❌ 未找到音乐文件!")
+            st.session_state.scan_message = None
+            start_scan_job(
+                st.session_state.current_path,
+                workers=int(scan_workers),
+                exclude=[p.strip() for p in scan_exclude.split(",") if p.strip()],
+                max_depth=None if scan_max_depth is None else int(scan_max_depth),
+                header_only=scan_header_only,
+            )
+            st.rerun()
+    
+    # 已停止的扫描：从断点继续，或只用已解析的部分
+    if scan_job is not None and scan_job.state in ("cancelled", "failed"):
+        if scan_job.state == "failed":
+            st.error(f"❌ 扫描出错: {scan_job.error}")
+        else:
+            st.warning(f"⏹️ 扫描已停止，已解析 {scan_job.rows} 个文件")
+        col_resume, col_partial = st.columns(2)
+        with col_resume:
+            if st.button("▶️ 继续扫描", use_container_width=True):
+                scan_job.resume()
+                st.rerun()
+        with col_partial:
+            if st.button("✅ 使用已解析", use_container_width=True):
+                scan_job.finish_partial()
+                st.rerun()
+    
+    if st.session_state.scan_message:
+        level, message = st.session_state.scan_message
+        getattr(st, level)(message)
     
     st.divider()
     
     # 功能选择按钮
-    if st.session_state.df is not None:
-        dup_count = find_duplicates(st.session_state.df)["song_key"].nunique() if len(find_duplicates(st.session_state.df)) > 0 else 0
-        mp3_count = find_mp3_only(st.session_state.df)["song_key"].nunique() if len(find_mp3_only(st.session_state.df)) > 0 else 0
+    if st.session_state.analysis is not None:
+        results = cached_results(st.session_state, st.session_state.analysis)
+        summary = results.summary()
+        dup_count = summary["duplicate_songs"]
+        mp3_count = summary["mp3_only_songs"]
+        identical_count = results.identical_groups("content_hash")
         
         st.markdown("### 🎯 分析功能")
         
@@ -182,43 +244,64 @@ with st.sidebar:
             st.session_state.mp3_page = 0
             st.rerun()
         
+        if st.button(f"🧬 完全相同文件 ({identical_count})", use_container_width=True,
+                     type="primary" if st.session_state.selected_function == "identical" else "secondary"):
+            st.session_state.selected_function = "identical"
+            st.session_state.identical_page = 0
+            st.rerun()
+        
+        if st.button("🔎 搜索音乐库", use_container_width=True,
+                     type="primary" if st.session_state.selected_function == "search" else "secondary"):
+            st.session_state.selected_function = "search"
+            st.rerun()
+        
         st.divider()
         
         # 统计信息
         st.markdown("### 📊 库统计")
-        st.metric("总文件数", len(st.session_state.df))
-        st.metric("唯一歌曲", st.session_state.df["song_key"].nunique())
-        st.metric("格式类型", st.session_state.df["format"].nunique())
+        st.metric("总文件数", summary["files"])
+        st.metric("唯一歌曲", summary["songs"])
+        st.metric("格式类型", summary["formats"])
+        st.caption(results.storage_caption())
     
 if st.session_state.selected_function is None:
     st.subheader("🎯 清理建议", divider="blue")
     
-    if st.session_state.df is not None:
+    if st.session_state.analysis is not None:
+        summary = cached_results(st.session_state, st.session_state.analysis).summary()
         col1, col2, col3 = st.columns(3, gap="large")
         with col1:
-            st.metric("📦 文件总数", len(st.session_state.df))
+            st.metric("📦 文件总数", summary["files"])
         with col2:
-            st.metric("🎵 唯一歌曲", st.session_state.df["song_key"].nunique())
+            st.metric("🎵 唯一歌曲", summary["songs"])
         with col3:
-            mp3_df = find_mp3_only(st.session_state.df)
-            mp3_count = mp3_df["song_key"].nunique() if len(mp3_df) > 0 else 0
-            st.metric("🎧 仅 MP3 歌曲", mp3_count)
+            st.metric("🎧 仅 MP3 歌曲", summary["mp3_only_songs"])
         
         st.divider()
     st.info("👈 请在左侧选择分析功能查看详细结果")
     st.stop()
 
-df = st.session_state.df
+results = cached_results(st.session_state, st.session_state.analysis)
 
 # ========== 页面路由 ==========
 if st.session_state.selected_function is None:
-    show_dashboard(df, find_mp3_only)
+    show_dashboard(results)
 
 elif st.session_state.selected_function == "duplicates":
-    dup_df = find_duplicates(df)
-    show_duplicates_view(dup_df, df, delete_files)
+    show_duplicates_view(results, delete_files)
 
 # ========== 仅 MP3 歌曲视图 ==========
 elif st.session_state.selected_function == "mp3only":
-    mp3_df = find_mp3_only(df)
-    show_mp3_view(mp3_df, delete_files)
+    show_mp3_view(results.mp3_only(), delete_files)
+
+# ========== 字节相同文件视图 ==========
+elif st.session_state.selected_function == "identical":
+    by = "content_hash"
+    if "audio_hash" in results.identical_columns():
+        by = st.radio("比较方式", ["content_hash", "audio_hash"], horizontal=True,
+                      format_func=lambda x: "字节完全相同" if x == "content_hash" else "音频相同（忽略标签）")
+    show_identical_view(results, delete_files, by)
+
+# ========== 搜索视图 ==========
+elif st.session_state.selected_function == "search":
+    show_search_view(results)
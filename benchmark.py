@@ -0,0 +1,702 @@
+"""
+MusicAnalyzer 性能基准
+用法：
+    python benchmark.py reader <音乐目录> [--repeat N]
+    python benchmark.py frame [--rows N]
+    python benchmark.py songkey [--rows N [N ...]]
+    python benchmark.py plan [--rows N]
+    python benchmark.py analysis [--rows N]
+    python benchmark.py fuzzy [--rows N [N ...]]
+    python benchmark.py incremental [--rows N]
+    python benchmark.py backend [--rows N]
+    python benchmark.py rerun [--rows N] [--clicks N]
+    python benchmark.py pages [--rows N [N ...]] [--per-page N]
+    python benchmark.py mp3view [--rows N [N ...]]
+    python benchmark.py dirtree [--dirs N] [--reruns N]
+    python benchmark.py delete [--files N] [--kib N] [--dir 目录]
+    python benchmark.py search [--rows N] [--queries N]
+    python benchmark.py export [--rows N]
+    python benchmark.py lists [--rows N [N ...]] [--legacy-rows N]
+    python benchmark.py snapshot [--rows N] [--repeat N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analyzer import (GroupIndex, IncrementalAnalysis, LibraryAnalysis, ScanDelta, analyze, build_song_keys,
+                      find_duplicates, find_fuzzy_duplicates, normalize_key, plan_deletions)
+from config import ANALYSIS_BACKEND, CONTENT_HASH, RESULT_CACHE
+from deletion import delete_files, read_journal, restore_files
+from dir_tree import DirectoryTree
+from export_download_list import LIST_COLUMNS, mp3_upgrade_list, multi_version_list
+from exporters import export_lists
+from library_frame import compact_frame, memory_report
+from library_snapshot import load_snapshot, save_snapshot
+from library_store import create_library_builder
+from scanner import SUPPORTED_EXT, read_metadata, walk_music_files
+from search_index import RANGE_COLUMNS, TEXT_COLUMNS, SearchIndex, normalize_text
+
+# 模拟数据和旧实现与测试共用，放在 tests 目录下
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tests"))
+from library_samples import fuzzy_rows, search_queries, synthetic_rows, upgrade_lists
+from reference_impl import (legacy_export, legacy_mp3_upgrade_list, legacy_multi_version_list,
+                            legacy_page, legacy_read_metadata, legacy_subdirectories, scan_search)
+
+
+def _time_reader(reader, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            reader(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_reader(root_dir: str, repeat: int):
+    """对比双重解析与单次解析的每秒文件数（取多轮中最快的一轮，排除冷缓存的影响）"""
+    paths = [p for p in Path(root_dir).rglob("*") if p.suffix.lower() in SUPPORTED_EXT]
+    if not paths:
+        print("❌ 未找到音乐文件!")
+        return
+
+    formats = {}
+    for path in paths:
+        fmt = path.suffix.lower().lstrip(".")
+        formats[fmt] = formats.get(fmt, 0) + 1
+    print(f"📁 {len(paths)} 个文件: " + ", ".join(f"{k}={v}" for k, v in sorted(formats.items())))
+
+    legacy = _time_reader(legacy_read_metadata, paths, repeat)
+    single = _time_reader(read_metadata, paths, repeat)
+    print(f"  旧版（两次解析）: {len(paths) / legacy:10.1f} 文件/秒")
+    print(f"  新版（单次解析）: {len(paths) / single:10.1f} 文件/秒  (x{legacy / single:.2f})")
+
+
+def bench_frame(n_rows: int):
+    """对比 pd.DataFrame(rows) 与压缩后数据框的内存占用（分析结果的核对见 tests/test_library_frame.py）"""
+    rows = synthetic_rows(n_rows)
+    raw = analyze(pd.DataFrame(rows))
+    start = time.perf_counter()
+    compact = compact_frame(raw)
+    elapsed = time.perf_counter() - start
+
+    report = memory_report(raw, compact)
+    print(f"📦 {n_rows} 行，压缩耗时 {elapsed:.2f}s")
+    for col, (before, after) in report["columns"].items():
+        print(f"  {col:14s} {before / 1024 / 1024:9.1f} MB -> {after / 1024 / 1024:9.1f} MB")
+    print(f"  {'合计':12s} {report['before'] / 1024 / 1024:9.1f} MB -> {report['after'] / 1024 / 1024:9.1f} MB"
+          f"  ({report['ratio']:.0%})")
+
+
+def bench_songkey(sizes: list):
+    """逐行 apply(normalize_key) 与向量化 build_song_keys 的耗时对比（结果核对见 tests/test_song_keys.py）"""
+    for n_rows in sizes:
+        df = pd.DataFrame(synthetic_rows(n_rows))
+
+        start = time.perf_counter()
+        df.apply(normalize_key, axis=1)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_song_keys(df)
+        vectorized_time = time.perf_counter() - start
+
+        print(f"📦 {n_rows:>9} 行  apply: {legacy_time:7.2f}s  向量化: {vectorized_time:6.3f}s"
+              f"  (x{legacy_time / vectorized_time:.0f})")
+
+
+def bench_plan(n_rows: int):
+    """删除计划的耗时（保留文件的核对见 tests/test_deletion_plan.py）"""
+    df = compact_frame(analyze(pd.DataFrame(synthetic_rows(n_rows))))
+    start = time.perf_counter()
+    plan = plan_deletions(df)
+    elapsed = time.perf_counter() - start
+    summary = plan.summary()
+    print(f"📦 {n_rows} 行，{summary['groups']} 个重复分组，耗时 {elapsed:.3f}s")
+    print(f"  保留 {summary['keep']}，删除 {summary['delete']}，可释放 {summary['bytes_freed'] / 1024 ** 3:.1f} GB")
+
+
+def bench_analysis(n_rows: int):
+    """各报表独立 groupby（旧实现）与共享分组索引的耗时对比（结果核对见 tests/test_library_analysis.py）"""
+    df = compact_frame(analyze(pd.DataFrame(synthetic_rows(n_rows))))
+    keyed = df.dropna(subset=["song_key"])
+
+    start = time.perf_counter()
+    legacy = {
+        "duplicates": df[df.duplicated("song_key", keep=False) & df["song_key"].notna()],
+        "mp3_only": keyed.groupby("song_key", observed=True).filter(lambda g: set(g["format"]) == {"mp3"}),
+        "multi_version": keyed.groupby("song_key", observed=True).filter(lambda g: g["format"].nunique() > 1),
+    }
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analysis = LibraryAnalysis(df)
+    build_time = time.perf_counter() - start
+    engine = {
+        "duplicates": analysis.duplicates(),
+        "mp3_only": analysis.mp3_only(),
+        "multi_version": analysis.multi_version(),
+    }
+    analysis.format_stats()
+    engine_time = time.perf_counter() - start
+
+    print(f"📦 {n_rows} 行，{analysis.n_groups} 首歌曲")
+    print(f"  独立 groupby: {legacy_time:7.2f}s")
+    print(f"  分组索引:     {engine_time:7.2f}s（其中建索引 {build_time:.2f}s）  (x{legacy_time / engine_time:.0f})")
+    for name in legacy:
+        print(f"  {name}: {len(engine[name])} 行")
+
+
+def bench_fuzzy(sizes: list):
+    """模糊匹配的耗时随行数的变化（应接近线性），以及对同一首歌多个副本的召回率"""
+    for n_rows in sizes:
+        df = analyze(pd.DataFrame(fuzzy_rows(n_rows)))
+        start = time.perf_counter()
+        clusters = find_fuzzy_duplicates(df)
+        elapsed = time.perf_counter() - start
+
+        # 召回率：同一首歌的副本（有标签的）被分到同一组的比例
+        song = df["file_name"].str.split(" \\(").str[0]
+        tagged = df["title"].notna()
+        copies = song[tagged].duplicated(keep=False)
+        truth = song[tagged][copies]
+        found = clusters["fuzzy_cluster"].reindex(truth.index)
+        same_cluster = found.groupby(truth).transform(lambda c: c.notna().all() and c.nunique() == 1)
+        exact = find_duplicates(df)
+        print(f"📦 {n_rows:>9} 行  耗时 {elapsed:6.2f}s  ({elapsed / n_rows * 1e6:.1f} µs/行)  "
+              f"{clusters['fuzzy_cluster'].nunique()} 组  "
+              f"召回: 模糊 {same_cluster.mean():.1%} / 精确 song_key {truth.index.isin(exact.index).mean():.1%}")
+
+
+def _paths(df: pd.DataFrame) -> set:
+    return set(df["file_path"].astype(str))
+
+
+def bench_incremental(n_rows: int):
+    """新增一张专辑后增量更新与完整重算的耗时对比（等价性见 tests/test_incremental.py）"""
+    base = pd.DataFrame(synthetic_rows(n_rows))
+    start = time.perf_counter()
+    inc = IncrementalAnalysis(analyze(base))
+    print(f"📦 {n_rows} 行，初次建立增量索引 {time.perf_counter() - start:.2f}s")
+
+    # 一张 12 首歌的专辑：一半为已有 MP3 歌曲的 FLAC 版本，一半为新歌
+    mp3_rows = base[base["format"] == "mp3"].sample(6, random_state=1).to_dict("records")
+    album = []
+    for i, row in enumerate(mp3_rows + synthetic_rows(6, seed=99)):
+        row = dict(row, file_path=f"/music/New Album/{i:02d}.flac", format="flac", bitrate=900000)
+        album.append(row)
+    delta = ScanDelta(added=pd.DataFrame(album))
+
+    start = time.perf_counter()
+    affected = inc.apply(delta)
+    incremental_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full = LibraryAnalysis(analyze(pd.concat([base, delta.added], ignore_index=True)))
+    full.duplicates(), full.mp3_only(), full.deletion_plan()
+    full_time = time.perf_counter() - start
+    print(f"  新增 {len(delta.added)} 首，影响 {len(affected)} 个 song_key")
+    print(f"  增量更新: {incremental_time * 1000:8.1f} ms")
+    print(f"  完整重算: {full_time * 1000:8.1f} ms  (x{full_time / incremental_time:.0f})")
+
+
+def _build_backend(backend: str, rows: list, root_dir: str, batch_size: int = 500):
+    """模拟流式扫描分批建库，返回分析对象、耗时和 Python 堆内存峰值"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    builder = create_library_builder(root_dir, backend)
+    for i in range(0, len(rows), batch_size):
+        builder.add(rows[i:i + batch_size])
+    analysis = builder.finish()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return analysis, elapsed, peak
+
+
+def bench_backend(n_rows: int):
+    """内存数据框与 SQLite 磁盘表两种分析后端的建库耗时、内存峰值及报表查询耗时"""
+    rows = synthetic_rows(n_rows)
+    CONTENT_HASH["enabled"] = False  # 模拟数据的文件不存在
+    with tempfile.TemporaryDirectory() as tmp:
+        ANALYSIS_BACKEND["dir"] = tmp
+        memory, memory_time, memory_peak = _build_backend("memory", rows, tmp)
+        sqlite, sqlite_time, sqlite_peak = _build_backend("sqlite", rows, tmp)
+
+        print(f"📦 {n_rows} 行，每批 500 行")
+        print(f"  memory: 建库 {memory_time:6.2f}s，内存峰值 {memory_peak / 1024 / 1024:8.1f} MB")
+        print(f"  sqlite: 建库 {sqlite_time:6.2f}s，内存峰值 {sqlite_peak / 1024 / 1024:8.1f} MB"
+              f"  ({sqlite.storage_caption()})")
+
+        reports = {
+            "duplicates": lambda a: _paths(a.duplicates()),
+            "mp3_only": lambda a: _paths(a.mp3_only()),
+            "multi_version": lambda a: _paths(a.multi_version()),
+            "keep": lambda a: _paths(a.deletion_plan().to_keep),
+            "delete": lambda a: _paths(a.deletion_plan().to_delete),
+            "plan_summary": lambda a: a.deletion_plan().summary(),
+            "summary": lambda a: a.summary(),
+        }
+        for name, report in reports.items():
+            start = time.perf_counter()
+            report(memory)
+            memory_query = time.perf_counter() - start
+            tracemalloc.start()
+            start = time.perf_counter()
+            report(sqlite)
+            sqlite_query = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  {name:14s} memory {memory_query * 1000:8.1f} ms | sqlite {sqlite_query * 1000:8.1f} ms"
+                  f"（峰值 {peak / 1024 / 1024:6.1f} MB）")
+        sqlite.close()
+
+
+def _time_reruns(analysis, view: str, clicks: int, cache: bool) -> list:
+    """
+    在 AppTest 中打开视图后连续点击下一页，返回每次重新运行的耗时；
+    视图只有一页时没有翻页按钮，改为直接重新运行脚本（与勾选行等其他交互相同）
+    """
+    from streamlit.testing.v1 import AppTest
+
+    RESULT_CACHE["enabled"] = cache
+    app = AppTest.from_file(str(Path(__file__).with_name("app.py")), default_timeout=600)
+    app.session_state["analysis"] = analysis
+    app.session_state["selected_function"] = view
+    app.run()
+    times = []
+    for _ in range(clicks):
+        next_buttons = [b for b in app.button if b.label == "➡️"]
+        start = time.perf_counter()
+        if next_buttons:
+            next_buttons[0].click().run()
+        else:
+            app.run()
+        times.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return times
+
+
+def bench_rerun(n_rows: int, clicks: int):
+    """Streamlit 翻页时每次重新运行的耗时：不缓存（每次重算报表）vs 按音乐库版本缓存"""
+    analysis = LibraryAnalysis(compact_frame(analyze(pd.DataFrame(synthetic_rows(n_rows)))))
+    print(f"📦 {n_rows} 行，每个视图翻页 {clicks} 次（只有一页的视图为重新运行；中位数）")
+    for view in ["duplicates", "mp3only"]:
+        before = sorted(_time_reruns(analysis, view, clicks, cache=False))[clicks // 2]
+        after = sorted(_time_reruns(analysis, view, clicks, cache=True))[clicks // 2]
+        print(f"  {view:12s} 不缓存 {before * 1000:8.1f} ms | 缓存 {after * 1000:8.1f} ms  (x{before / after:.1f})")
+    RESULT_CACHE["enabled"] = True
+
+
+def bench_pages(sizes: list, per_page: int):
+    """重复歌曲视图取一页的耗时：逐组过滤 vs 分组索引切片（首页 / 中间页 / 末页）"""
+    for n_rows in sizes:
+        dup_df = LibraryAnalysis(compact_frame(analyze(pd.DataFrame(synthetic_rows(n_rows))))).duplicates()
+        start = time.perf_counter()
+        index = GroupIndex(dup_df, "song_key", by_priority=True)
+        build_time = time.perf_counter() - start
+        pages = [0, index.pages(per_page) // 2, index.pages(per_page) - 1]
+
+        legacy_time = indexed_time = 0.0
+        for page in pages:
+            start = time.perf_counter()
+            legacy_page(dup_df, page, per_page)
+            legacy_time += time.perf_counter() - start
+            start = time.perf_counter()
+            keys, offsets, positions = index.page(page, per_page)
+            page_df = dup_df.iloc[positions]
+            [page_df.iloc[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            indexed_time += time.perf_counter() - start
+
+        print(f"📦 {n_rows} 行，{len(dup_df)} 个重复文件 / {len(index)} 首歌曲，每页 {per_page} 首")
+        print(f"  逐组过滤: {legacy_time / len(pages) * 1000:9.2f} ms/页")
+        print(f"  索引切片: {indexed_time / len(pages) * 1000:9.2f} ms/页（建索引 {build_time * 1000:.0f} ms，"
+              f"每个音乐库版本一次）")
+
+
+def _legacy_mp3_grid():
+    """旧的仅 MP3 列表：每行 4 列、4 个 caption（在 AppTest 中作为脚本运行）"""
+    import streamlit as st
+
+    for _, row in st.session_state.page_df.iterrows():
+        cols = st.columns([3, 1, 1, 1])
+        with cols[0]:
+            st.caption(f"{row['title']} - {row['artist']}")
+        with cols[1]:
+            st.caption(f"{row['bitrate']}")
+        with cols[2]:
+            st.caption(f"{row['duration']:.0f}s")
+        with cols[3]:
+            st.caption(f"{row['file_name']}")
+
+
+def _mp3_table():
+    """新的仅 MP3 视图（在 AppTest 中作为脚本运行）"""
+    import streamlit as st
+    from views import show_mp3_view
+
+    st.session_state.setdefault("mp3_page", 0)
+    show_mp3_view(st.session_state.page_df, lambda rows: ([], []))
+
+
+def _time_script(script, page_df: pd.DataFrame, repeat: int = 3) -> float:
+    """AppTest 中运行脚本（含 Arrow 序列化和元素树构建）的最短耗时"""
+    from streamlit.testing.v1 import AppTest
+
+    best = float("inf")
+    for _ in range(repeat):
+        app = AppTest.from_function(script, default_timeout=600)
+        app.session_state["page_df"] = page_df
+        start = time.perf_counter()
+        app.run()
+        best = min(best, time.perf_counter() - start)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return best
+
+
+def bench_mp3view(sizes: list):
+    """仅 MP3 列表的服务端渲染耗时：逐行控件网格 vs 单个虚拟滚动表格"""
+    mp3_df = LibraryAnalysis(compact_frame(analyze(pd.DataFrame(synthetic_rows(max(sizes) * 8))))).mp3_only()
+    print(f"仅 MP3 文件 {len(mp3_df)} 个（服务端渲染耗时，浏览器端表格为虚拟滚动，只绘制可见行）")
+    for n_rows in sizes:
+        page_df = mp3_df.iloc[:n_rows]
+        grid = _time_script(_legacy_mp3_grid, page_df, repeat=1 if n_rows > 1000 else 3)
+        table = _time_script(_mp3_table, page_df)
+        print(f"  {len(page_df):6d} 行: 控件网格 {grid * 1000:9.1f} ms（{len(page_df) * 9} 个元素）| "
+              f"单表 {table * 1000:7.1f} ms  (x{grid / table:.0f})")
+
+
+def bench_dirtree(n_dirs: int, reruns: int):
+    """侧栏子目录列表：每次重新运行都列目录 vs 目录树缓存（TTL 内 / TTL 过期后按修改时间复用）"""
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(n_dirs):
+            (Path(root) / f"Artist {i:04d}" / "Album").mkdir(parents=True)
+            (Path(root) / f"Artist {i:04d}" / "cover.jpg").touch()
+
+        start = time.perf_counter()
+        for _ in range(reruns):
+            names = legacy_subdirectories(root)
+        legacy_time = (time.perf_counter() - start) / reruns
+
+        tree = DirectoryTree(ttl=3600)
+        tree.children(root)
+        start = time.perf_counter()
+        for _ in range(reruns):
+            tree.children(root)
+        cached_time = (time.perf_counter() - start) / reruns
+
+        expired = DirectoryTree(ttl=0)
+        expired.children(root)
+        start = time.perf_counter()
+        for _ in range(reruns):
+            expired.children(root)
+        revalidate_time = (time.perf_counter() - start) / reruns
+
+        listings = {}
+        for _ in walk_music_files(root, listings=listings):
+            pass
+        seeded = DirectoryTree(ttl=3600)
+        seeded.seed(listings)
+        start = time.perf_counter()
+        assert seeded.children(root) == names
+        seeded_time = time.perf_counter() - start
+
+        print(f"📂 {n_dirs} 个子目录，重新运行 {reruns} 次（本地磁盘；网络磁盘上每次列目录的代价成倍放大）")
+        print(f"  每次列目录:       {legacy_time * 1e6:9.1f} µs/次")
+        print(f"  缓存（TTL 内）:   {cached_time * 1e6:9.1f} µs/次")
+        print(f"  TTL 过期后 stat:  {revalidate_time * 1e6:9.1f} µs/次（修改时间未变，实际列目录 {expired.listings} 次）")
+        print(f"  扫描结果填充后首次访问: {seeded_time * 1e6:9.1f} µs（只 stat 一次，实际列目录 {seeded.listings} 次）")
+
+
+def _make_files(root: Path, n_files: int, kib: int) -> list:
+    data = b"\0" * (kib * 1024)
+    paths = []
+    for i in range(n_files):
+        path = root / f"Artist {i % 50:02d}" / f"{i:06d}.mp3"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        paths.append(str(path))
+    return paths
+
+
+def _legacy_delete(paths, log_dir: Path):
+    """旧版删除：逐个 os.remove，全部结束后一次写入 JSON 日志"""
+    import json
+    entries = []
+    for path in paths:
+        try:
+            Path(path).unlink()
+            entries.append({"file_path": path, "status": "deleted"})
+        except OSError as e:
+            entries.append({"file_path": path, "status": "failed", "error": str(e)})
+    with open(log_dir / "delete_log.json", "w", encoding="utf-8") as f:
+        json.dump({"entries": entries}, f, ensure_ascii=False, indent=2)
+
+
+def bench_delete(n_files: int, kib: int, directory: str = None):
+    """批量删除：串行删除 + 结束时写日志 vs 线程池删除 + 逐条日志 vs 隔离（同盘重命名）及恢复"""
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        tmp = Path(tmp)
+        log_dir = tmp / "logs"
+        log_dir.mkdir()
+        timings = {}
+
+        paths = _make_files(tmp / "legacy", n_files, kib)
+        start = time.perf_counter()
+        _legacy_delete(paths, log_dir)
+        timings["串行删除（结束时写日志）"] = time.perf_counter() - start
+
+        paths = _make_files(tmp / "pool", n_files, kib)
+        start = time.perf_counter()
+        done, failed, journal = delete_files(paths, mode="delete", log_dir=log_dir)
+        timings["线程池删除（逐条日志）"] = time.perf_counter() - start
+        journaled = len(read_journal(journal)) - 1
+
+        root = tmp / "quarantine"
+        paths = _make_files(root, n_files, kib)
+        start = time.perf_counter()
+        moved, _, journal = delete_files(paths, mode="quarantine", root_dir=str(root), log_dir=log_dir)
+        timings["隔离到回收目录"] = time.perf_counter() - start
+        start = time.perf_counter()
+        restored, _, _ = restore_files(journal, log_dir=log_dir)
+        timings["按日志恢复"] = time.perf_counter() - start
+        intact = all(Path(path).stat().st_size == kib * 1024 for path in paths)
+
+        print(f"🗑️ {n_files} 个文件，每个 {kib} KiB（{tmp}）")
+        for name, elapsed in timings.items():
+            print(f"  {name:<16} {elapsed * 1000:9.1f} ms  ({elapsed / n_files * 1e6:7.1f} µs/文件)")
+        print(f"  线程池删除 {len(done)} 个（失败 {len(failed)}），日志记录 {journaled} 条；"
+              f"隔离 {len(moved)} 个，恢复 {len(restored)} 个，文件{'完整' if intact else ' ⚠️ 不完整'}")
+
+
+def bench_search(n_rows: int, n_queries: int):
+    """音乐库搜索：每次查询 str.contains 全表扫描 vs n-gram 倒排索引 + 排序列索引"""
+    df = compact_frame(pd.DataFrame(fuzzy_rows(n_rows)))
+    queries = search_queries(df, n_queries)
+
+    tracemalloc.start()
+    index = SearchIndex(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # 旧做法每次查询都要对原始列做不区分大小写的匹配；这里先规范化一次，只计查询本身的时间
+    columns = {col: df[col].astype(object).map(normalize_text, na_action="ignore") for col in TEXT_COLUMNS}
+    scan_times, index_times = [], []
+    for text, formats, ranges in queries:
+        start = time.perf_counter()
+        scan_search(df, normalize_text(text), formats, ranges, columns)
+        scan_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.search(text, formats=formats, ranges=ranges)
+        index_times.append(time.perf_counter() - start)
+
+    def stats(times):
+        times = sorted(times)
+        return f"中位数 {times[len(times) // 2] * 1000:8.2f} ms，最慢 {times[-1] * 1000:8.2f} ms"
+
+    print(f"🔎 {n_rows} 行（约 1/5 中文标题），{n_queries} 次随机查询（文本 + 格式 / {'、'.join(RANGE_COLUMNS)} 区间）")
+    print(f"  建立索引: {index.build_time:.2f}s，峰值内存 {peak / 1024 / 1024:.1f} MB")
+    print(f"  str.contains 全表扫描: {stats(scan_times)}")
+    print(f"  倒排索引:              {stats(index_times)}")
+
+
+def bench_export(n_rows: int):
+    """下载清单导出：旧版三种格式分别整表处理 vs 分块流式管道（以及 gzip），对比耗时和峰值内存"""
+    data = upgrade_lists(n_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        runs = {}
+        for label, export in [
+            ("旧版（iterrows / to_dict + json.dump）", lambda d: legacy_export(data, d)),
+            ("流式管道 CSV + NDJSON + TXT", lambda d: export_lists(data, ["csv", "ndjson", "txt"], d, compress=False)),
+            ("流式管道 + gzip", lambda d: export_lists(data, ["csv", "ndjson", "txt"], d, compress=True)),
+        ]:
+            # 计时和峰值内存分两次运行（tracemalloc 会明显拖慢逐行的 Python 代码）
+            out = tmp / str(len(runs))
+            out.mkdir()
+            start = time.perf_counter()
+            export(out)
+            elapsed = time.perf_counter() - start
+            size = sum(p.stat().st_size for p in out.iterdir())
+            traced = tmp / f"traced{len(runs)}"
+            traced.mkdir()
+            tracemalloc.start()
+            export(traced)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            runs[label] = (elapsed, peak, size)
+
+        print(f"📤 导出 {n_rows} 条升级清单记录（CSV + JSON/NDJSON + TXT）")
+        for label, (elapsed, peak, size) in runs.items():
+            print(f"  {label:<34} {elapsed:6.2f}s  峰值内存 {peak / 1024 / 1024:7.1f} MB  文件 {size / 1024 / 1024:6.1f} MB")
+
+
+def bench_lists(sizes: list, legacy_rows: int):
+    """下载清单生成：逐首过滤（旧版）vs 一次分组聚合（旧版只在 legacy_rows 行以内运行）"""
+    for n_rows in sizes:
+        analysis = LibraryAnalysis(compact_frame(analyze(pd.DataFrame(synthetic_rows(n_rows)))))
+        mp3_df, mv_df = analysis.mp3_only(), analysis.multi_version()
+        print(f"📝 {n_rows} 行：仅 MP3 {mp3_df['song_key'].nunique()} 首，多版本 {mv_df['song_key'].nunique()} 首")
+        for name, new_fn, legacy_fn, df in [
+            ("仅 MP3 清单", mp3_upgrade_list, legacy_mp3_upgrade_list, mp3_df),
+            ("多版本清单", multi_version_list, legacy_multi_version_list, mv_df),
+        ]:
+            start = time.perf_counter()
+            new_fn(df)
+            new_time = time.perf_counter() - start
+            line = f"  {name}: 分组聚合 {new_time * 1000:8.1f} ms"
+            if n_rows <= legacy_rows:
+                start = time.perf_counter()
+                legacy_fn(df)
+                legacy_time = time.perf_counter() - start
+                line += f"，逐首过滤 {legacy_time * 1000:9.1f} ms (x{legacy_time / new_time:.0f})"
+            print(line)
+
+
+def bench_snapshot(n_rows: int, repeat: int):
+    """
+    下载清单的数据来源：建库（重新扫描中除遍历和解析标签以外的部分）vs 读取快照，
+    两种后端各测一次；内存后端另测只读取清单用到的列
+    """
+    rows = synthetic_rows(n_rows)
+    CONTENT_HASH["enabled"] = False  # 模拟数据的文件不存在
+    print(f"💾 {n_rows} 行")
+    with tempfile.TemporaryDirectory() as tmp:
+        ANALYSIS_BACKEND["dir"] = tmp
+        for backend in ("memory", "sqlite"):
+            analysis, build_time, _ = _build_backend(backend, rows, tmp)
+            start = time.perf_counter()
+            meta = save_snapshot(analysis, tmp, directory=tmp)
+            save_time = time.perf_counter() - start
+            size = (Path(tmp) / meta["file"]).stat().st_size
+            print(f"  {backend}: 建库 {build_time:6.2f}s | 写快照 {save_time:5.2f}s（{size / 1024 / 1024:.1f} MB）")
+
+            for label, columns in [("全部列", None), ("清单列", LIST_COLUMNS)]:
+                if backend == "sqlite" and columns is not None:
+                    continue
+                load_times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    loaded, _ = load_snapshot(tmp, directory=tmp, columns=columns)
+                    load_times.append(time.perf_counter() - start)
+                    if backend == "sqlite":
+                        loaded.close()
+                print(f"    读快照（{label}） 中位数 {np.median(load_times) * 1000:6.1f} ms，"
+                      f"最快 {min(load_times) * 1000:6.1f} ms (x{build_time / np.median(load_times):.0f})")
+            if backend == "sqlite":
+                analysis.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MusicAnalyzer 性能基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("reader", help="元数据读取：双重解析 vs 单次解析")
+    p.add_argument("root_dir")
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("frame", help="数据框内存：默认类型 vs 压缩类型")
+    p.add_argument("--rows", type=int, default=200_000)
+
+    p = sub.add_parser("songkey", help="song_key 构建：逐行 apply vs 向量化")
+    p.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+
+    p = sub.add_parser("plan", help="重复文件删除计划（分组排序）")
+    p.add_argument("--rows", type=int, default=1_000_000)
+
+    p = sub.add_parser("analysis", help="报表生成：独立 groupby vs 共享分组索引")
+    p.add_argument("--rows", type=int, default=100_000)
+
+    p = sub.add_parser("fuzzy", help="模糊重复匹配的扩展性")
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+
+    p = sub.add_parser("incremental", help="增量分析：新增一张专辑 vs 完整重算")
+    p.add_argument("--rows", type=int, default=500_000)
+
+    p = sub.add_parser("backend", help="分析后端：内存数据框 vs SQLite 磁盘表")
+    p.add_argument("--rows", type=int, default=100_000)
+
+    p = sub.add_parser("rerun", help="界面翻页延迟：不缓存 vs 派生结果缓存")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--clicks", type=int, default=5)
+
+    p = sub.add_parser("pages", help="重复歌曲翻页：逐组过滤 vs 分组索引切片")
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--per-page", type=int, default=20)
+
+    p = sub.add_parser("mp3view", help="仅 MP3 列表渲染：逐行控件网格 vs 单个表格")
+    p.add_argument("--rows", type=int, nargs="+", default=[20, 1_000, 10_000])
+
+    p = sub.add_parser("dirtree", help="侧栏子目录列表：每次列目录 vs 目录树缓存")
+    p.add_argument("--dirs", type=int, default=2_000)
+    p.add_argument("--reruns", type=int, default=200)
+
+    p = sub.add_parser("delete", help="批量删除：串行删除 vs 线程池 + 逐条日志 vs 隔离重命名")
+    p.add_argument("--files", type=int, default=2000)
+    p.add_argument("--kib", type=int, default=1024)
+    p.add_argument("--dir", default=None, help="临时文件所在目录（如网络磁盘上的目录），默认系统临时目录")
+
+    p = sub.add_parser("search", help="音乐库搜索：str.contains 全表扫描 vs 倒排索引")
+    p.add_argument("--rows", type=int, default=500_000)
+    p.add_argument("--queries", type=int, default=200)
+
+    p = sub.add_parser("export", help="下载清单导出：旧版逐行写出 vs 分块流式管道")
+    p.add_argument("--rows", type=int, default=100_000)
+
+    p = sub.add_parser("lists", help="下载清单生成：逐首过滤 vs 一次分组聚合")
+    p.add_argument("--rows", type=int, nargs="+", default=[20_000, 100_000, 1_000_000])
+    p.add_argument("--legacy-rows", type=int, default=20_000, help="超过该行数时不运行旧版（耗时随歌曲数平方增长）")
+
+    p = sub.add_parser("snapshot", help="下载清单数据来源：重新建库 vs 读取快照")
+    p.add_argument("--rows", type=int, default=500_000)
+    p.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "reader":
+        bench_reader(args.root_dir, args.repeat)
+    elif args.command == "frame":
+        bench_frame(args.rows)
+    elif args.command == "songkey":
+        bench_songkey(args.rows)
+    elif args.command == "plan":
+        bench_plan(args.rows)
+    elif args.command == "analysis":
+        bench_analysis(args.rows)
+    elif args.command == "fuzzy":
+        bench_fuzzy(args.rows)
+    elif args.command == "incremental":
+        bench_incremental(args.rows)
+    elif args.command == "backend":
+        bench_backend(args.rows)
+    elif args.command == "rerun":
+        bench_rerun(args.rows, args.clicks)
+    elif args.command == "pages":
+        bench_pages(args.rows, args.per_page)
+    elif args.command == "mp3view":
+        bench_mp3view(args.rows)
+    elif args.command == "dirtree":
+        bench_dirtree(args.dirs, args.reruns)
+    elif args.command == "delete":
+        bench_delete(args.files, args.kib, args.dir)
+    elif args.command == "search":
+        bench_search(args.rows, args.queries)
+    elif args.command == "export":
+        bench_export(args.rows)
+    elif args.command == "lists":
+        bench_lists(args.rows, args.legacy_rows)
+    elif args.command == "snapshot":
+        bench_snapshot(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
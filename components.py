@@ -104,6 +104,19 @@ def render_copy_icon_button(text: str, button_key: str):
     st.markdown(html, unsafe_allow_html=True)
 
 
+def render_copy_block(text: str, label: str = None):
+    """
+    渲染带复制按钮的文本块（多行文本一键复制）
+    
+    Args:
+        text: 要复制的文本
+        label: 文本块上方的说明
+    """
+    if label:
+        st.caption(label)
+    st.code(text, language=None)
+
+
 def metric_card(label: str, value, icon: str = ""):
     """
     渲染指标卡片
@@ -3,6 +3,8 @@ MusicAnalyzer 配置文件
 集中管理常量、样式和配置
 """
 
+import os
+
 # ========== 音乐格式配置 ==========
 SUPPORTED_EXT = {".mp3", ".flac", ".wav", ".m4a", ".ogg", ".aiff", ".alac"}
 
@@ -16,6 +18,105 @@ FORMAT_PRIORITY = {
     "mp3": 1,
 }
 
+# ========== 扫描配置 ==========
+# 元数据缓存：重复扫描时只解析新增或变化的文件
+SCAN_CACHE = {
+    "enabled": True,
+    "path": "cache/scan_cache.db",
+}
+
+# 并行解析：workers 为 1 时串行；mode 为 "process"（多核解析）或 "thread"（适合网络磁盘）
+SCAN_WORKERS = {
+    "workers": os.cpu_count() or 1,
+    "mode": "process",
+    "batch_size": 16,  # 每个任务解析的文件数
+}
+
+# 流式扫描：每批返回的行数（界面按批刷新进度）
+SCAN_PROGRESS = {
+    "batch_size": 500,
+}
+
+# 目录遍历：exclude 为排除通配符（匹配文件/目录名或相对路径），max_depth 为 None 表示不限深度
+SCAN_WALK = {
+    "exclude": [],
+    "max_depth": None,
+    "follow_symlinks": True,
+}
+
+# 字节级重复检测：先按大小分组，再比较首尾 partial_kib KiB，最后才完整读取
+CONTENT_HASH = {
+    "enabled": True,
+    "partial_kib": 64,
+}
+
+# 音频数据哈希：跳过 ID3/APE/FLAC 元数据块，只对音频帧（M4A 为 mdat）计算哈希，
+# 仅标签不同的文件得到相同的 audio_hash；需要完整读取文件，默认关闭
+AUDIO_HASH = {
+    "enabled": False,
+}
+
+# 仅读取文件头模式（适合网络磁盘）：每个文件最多读取 max_read_kib KiB，
+# 超出上限时 fallback 为 True 则回退为完整解析，否则元数据字段记为未知
+HEADER_ONLY = {
+    "enabled": False,
+    "max_read_kib": 256,
+    "fallback": True,
+}
+
+# 侧栏目录导航：目录列表缓存 ttl 秒，过期后目录修改时间没变就继续使用；max_buttons 为直接显示的子目录按钮数
+DIR_TREE = {
+    "ttl": 300,
+    "max_buttons": 10,
+}
+
+# ========== 删除配置 ==========
+# 批量删除：mode 为 "delete"（永久删除）或 "quarantine"（重命名到音乐库根目录下的 trash_dir，可按日志恢复）；
+# workers 为并发删除的线程数（网络磁盘上每次删除都要等一次往返）；每次操作的 NDJSON 日志写在 log_dir 下
+DELETION = {
+    "mode": "delete",
+    "workers": 8,
+    "trash_dir": ".music_trash",
+    "log_dir": "logs",
+}
+
+# ========== 分析配置 ==========
+# 分析后端："memory" 把整个音乐库放在一个压缩后的 pandas 数据框中；
+# "sqlite" 把扫描结果分批写入磁盘上的 SQLite 表，分组统计和删除计划都由 SQL 完成，
+# 内存占用与库大小无关（适合数百万文件的 NAS 音乐库）。每个音乐库根目录一个数据库文件，存放在 dir 下
+ANALYSIS_BACKEND = {
+    "backend": "memory",
+    "dir": "cache/libraries",
+    "cache_mib": 64,  # SQLite 页缓存上限
+}
+
+# 派生结果缓存：同一次扫描内翻页、切换视图时复用已计算的报表，重新扫描或删除文件后失效
+RESULT_CACHE = {
+    "enabled": True,
+}
+
+# 音乐库搜索：标题、艺术家、专辑、文件名按 ngram 个字符切分建立倒排索引（中日韩文本没有空格，
+# 二元组即可搜到任意两个字以上的词；更短的词在去重后的取值上直接查找）；界面最多显示 max_results 行
+SEARCH = {
+    "ngram": 2,
+    "max_results": 1000,
+}
+
+# 模糊重复匹配：标题 block_ngram 字符 n-gram 的 MinHash 分桶（bands 个桶，每桶 rows_per_band 个哈希），
+# 桶内按时长排序后只比较 duration_window 秒内的相邻文件（每个文件最多 max_neighbors 个），
+# 标题相似度按 score_ngram 字符 n-gram 计算，综合相似度达到 threshold 的文件归为一组。
+# 分桶的 n-gram 太短或 rows_per_band 太小时，无关标题也会大量落入同一个桶，候选对随库大小平方增长
+FUZZY_MATCH = {
+    "threshold": 0.8,
+    "duration_window": 2.0,
+    "block_ngram": 3,
+    "score_ngram": 2,
+    "bands": 6,
+    "rows_per_band": 4,
+    "max_neighbors": 50,
+    "version_penalty": 0.1,  # 版本标记不同（如 Live / Remastered）时的扣分比例
+}
+
 # ========== 页面配置 ==========
 PAGE_CONFIG = {
     "page_title": "🎵 音乐库分析",
@@ -112,7 +213,30 @@ STYLE_CSS = """
 # ========== 分页配置 ==========
 PAGINATION = {
     "duplicates_per_page": 5,
-    "mp3_per_page": 20,
+    "duplicates_page_sizes": [5, 10, 20, 50, 100],  # 重复歌曲视图可选的每页歌曲数
+    "identical_per_page": 10,
+    "mp3_per_page": 5000,  # 仅 MP3 视图为单个虚拟滚动表格，每页可以放下数千行
+}
+
+# ========== 快照配置 ==========
+# 音乐库快照：界面和下载清单生成器每次扫描完成（以及在界面中删除文件）后，把扫描结果和分析列写入 dir，
+# 之后生成下载清单可以直接读取快照而不必重新扫描整个音乐库。内存后端写成 Arrow（Feather）文件，
+# sqlite 后端复制建库数据库。每个根目录保留最近 keep 个自动快照（指定名称的快照不自动清理），
+# 从超过 max_age_hours 小时的快照导出时给出警告
+SNAPSHOT = {
+    "enabled": True,
+    "dir": "cache/snapshots",
+    "keep": 5,
+    "max_age_hours": 24,
+}
+
+# ========== 导出配置 ==========
+# 下载清单导出：每 chunk_rows 行为一块依次写出（CSV / NDJSON / TXT 在同一次遍历中生成），
+# gzip 为 True 时所有文件写成 .gz 压缩文件（gzip_level 为压缩级别，6 比默认的 9 快得多，体积相差很小）
+EXPORT = {
+    "chunk_rows": 5000,
+    "gzip": False,
+    "gzip_level": 6,
 }
 
 # ========== 应用信息 ==========
@@ -0,0 +1,205 @@
+"""
+MusicAnalyzer 批量删除
+删除操作在有界线程池中并发执行（网络磁盘上每次删除都是一次往返），每个文件的结果
+在完成时立即追加到 NDJSON 日志，中途崩溃也不会丢失已执行的记录。
+
+隔离模式不真正删除文件，而是重命名到同一磁盘上的回收目录（只修改目录项，耗时与文件大小无关），
+之后可以用日志恢复：
+    python deletion.py restore logs/delete_20260101_120000.ndjson
+"""
+
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from config import DELETION
+
+
+class DeletionJournal:
+    """
+    NDJSON 操作日志：第一行为操作信息，之后每个文件一行，写入后立即 flush
+    """
+
+    def __init__(self, operation: str, log_dir: str = None, **info):
+        log_dir = Path(log_dir or DELETION["log_dir"])
+        log_dir.mkdir(parents=True, exist_ok=True)
+        self.stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.path = log_dir / f"{operation}_{self.stamp}.ndjson"
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.write({"operation": operation, "timestamp": datetime.now().isoformat(), **info})
+
+    def write(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def read_journal(path) -> list:
+    """读取日志的全部条目（跳过末尾因崩溃而不完整的一行）"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return entries
+
+
+def quarantine_path(file_path: str, root_dir: str, batch: str, trash_dir: str = None) -> Path:
+    """
+    文件在回收目录中的位置：<根目录>/<回收目录>/<批次>/<相对路径>
+
+    不在根目录下的文件（例如经符号链接扫描到的）放到其所在目录的回收目录中，保证在同一磁盘上
+    """
+    trash_dir = trash_dir or DELETION["trash_dir"]
+    path = Path(file_path)
+    try:
+        return Path(root_dir) / trash_dir / batch / path.relative_to(root_dir)
+    except ValueError:
+        return path.parent / trash_dir / batch / path.name
+
+
+def _remove(file_path: str):
+    os.remove(file_path)
+    return None
+
+
+def _move(source: str, target: Path):
+    """重命名到 target（同一磁盘上为 O(1) 的目录项操作）；跨磁盘时失败而不复制"""
+    if target.exists():
+        raise FileExistsError(f"目标已存在: {target}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.rename(source, target)  # 跨磁盘时抛出 OSError（EXDEV），文件保持原样
+    return str(target)
+
+
+def _run(tasks, journal: DeletionJournal, workers: int, describe):
+    """
+    在有界线程池中执行 (file_path, fn, args) 任务，按完成顺序写日志
+
+    同时在途的任务不超过 workers * 4 个，崩溃时未记录的操作最多只有这么多
+
+    Returns:
+        (成功的路径列表, [(失败的路径, 错误信息)])
+    """
+    done = []
+    failed = []
+    window = deque()
+
+    def collect(entry):
+        file_path, future = entry
+        record = {"file_path": file_path, "timestamp": datetime.now().isoformat()}
+        try:
+            target = future.result()
+        except Exception as e:
+            record.update(status="failed", error=str(e))
+            failed.append((file_path, str(e)))
+            print(f"✗ {describe}失败: {file_path} - {e}")
+        else:
+            record.update(status="ok", target=target)
+            done.append(file_path)
+        journal.write(record)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for file_path, fn, args in tasks:
+            window.append((file_path, executor.submit(fn, *args)))
+            if len(window) >= workers * 4:
+                collect(window.popleft())
+        while window:
+            collect(window.popleft())
+    return done, failed
+
+
+def delete_files(paths, mode: str = None, root_dir: str = None, workers: int = None, log_dir: str = None):
+    """
+    批量删除或隔离文件
+
+    Args:
+        paths: 文件路径
+        mode: "delete"（永久删除）或 "quarantine"（移到回收目录），None 表示使用 config.DELETION
+        root_dir: 音乐库根目录，隔离模式下回收目录建在其中
+        workers: 并发数，None 表示使用 config.DELETION
+        log_dir: 日志目录，None 表示使用 config.DELETION
+
+    Returns:
+        (成功的路径列表, [(失败的路径, 错误信息)], 日志路径)
+    """
+    mode = mode or DELETION["mode"]
+    workers = workers or DELETION["workers"]
+    paths = [str(path) for path in paths]
+    if mode not in ("delete", "quarantine"):
+        raise ValueError(f"未知的删除方式: {mode}")
+    if mode == "quarantine" and root_dir is None:
+        raise ValueError("隔离模式需要 root_dir")
+
+    journal = DeletionJournal(mode, log_dir, total=len(paths), root_dir=root_dir)
+    if mode == "quarantine":
+        # 每次操作一个批次目录（与日志同名），同一文件多次隔离也不会冲突
+        batch = journal.stamp
+        tasks = ((path, _move, (path, quarantine_path(path, root_dir, batch))) for path in paths)
+        describe = "隔离"
+    else:
+        tasks = ((path, _remove, (path,)) for path in paths)
+        describe = "删除"
+    try:
+        done, failed = _run(tasks, journal, workers, describe)
+    finally:
+        journal.close()
+    print(f"📋 {describe} {len(done)} 个，失败 {len(failed)} 个，日志: {journal.path}")
+    return done, failed, journal.path
+
+
+def restore_files(journal_path, workers: int = None, log_dir: str = None):
+    """
+    按隔离日志把文件移回原位置（原位置已有文件时跳过）；恢复操作本身也写入新的日志
+
+    Returns:
+        (恢复的路径列表, [(失败的路径, 错误信息)], 恢复日志路径)
+    """
+    entries = read_journal(journal_path)
+    if not entries or entries[0].get("operation") != "quarantine":
+        raise ValueError(f"不是隔离操作的日志: {journal_path}")
+    moved = [entry for entry in entries[1:] if entry.get("status") == "ok"]
+    tasks = ((entry["file_path"], _move, (entry["target"], Path(entry["file_path"]))) for entry in moved)
+
+    journal = DeletionJournal("restore", log_dir, total=len(moved), source=str(journal_path))
+    try:
+        done, failed = _run(tasks, journal, workers or DELETION["workers"], "恢复")
+    finally:
+        journal.close()
+    print(f"📋 恢复 {len(done)} 个，失败 {len(failed)} 个，日志: {journal.path}")
+    return done, failed, journal.path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MusicAnalyzer 删除日志工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("restore", help="按隔离日志恢复文件")
+    p.add_argument("journal")
+    p.add_argument("--workers", type=int, default=None)
+
+    p = sub.add_parser("show", help="显示日志的统计")
+    p.add_argument("journal")
+
+    args = parser.parse_args()
+    if args.command == "restore":
+        restore_files(args.journal, workers=args.workers)
+    elif args.command == "show":
+        entries = read_journal(args.journal)
+        header, records = entries[0], entries[1:]
+        ok = sum(entry.get("status") == "ok" for entry in records)
+        print(f"{header['operation']} @ {header['timestamp']}：计划 {header.get('total')} 个，"
+              f"已记录 {len(records)} 个（成功 {ok}，失败 {len(records) - ok}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+MusicAnalyzer 目录树缓存
+侧栏导航用：每个目录只列出一次，之后在 TTL 内直接复用；TTL 过期后只 stat 一次目录，
+修改时间没变就继续复用（网络磁盘上列目录很慢，stat 只需一次往返）。
+扫描结束后可以用扫描遍历时记录的目录列表预先填充目录树，第一次访问时只 stat 一次，不必再逐级列目录
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+from config import DIR_TREE
+
+
+class _Node:
+    __slots__ = ("children", "mtime_ns", "checked_at")
+
+    def __init__(self, children: list, mtime_ns, checked_at: float):
+        self.children = children    # 子目录名（已排序）
+        self.mtime_ns = mtime_ns    # 列目录时的修改时间
+        self.checked_at = checked_at
+
+
+class DirectoryTree:
+    """
+    惰性目录树：只在第一次访问某个目录时列出其子目录
+
+    线程安全，可以在多个 Streamlit 会话之间共享
+    """
+
+    def __init__(self, ttl: float = None):
+        """
+        Args:
+            ttl: 缓存有效期（秒），过期后按目录修改时间判断是否需要重新列出；None 表示使用 config.DIR_TREE
+        """
+        self.ttl = DIR_TREE["ttl"] if ttl is None else ttl
+        self._nodes = {}
+        self._lock = threading.Lock()
+        self.listings = 0  # 实际列目录的次数（用于统计）
+
+    @staticmethod
+    def _key(path) -> str:
+        return str(Path(path))
+
+    def children(self, path) -> list:
+        """
+        path 下的子目录名（不含隐藏目录，已排序）；目录不存在或无法读取时返回空列表
+        """
+        key = self._key(path)
+        now = time.monotonic()
+        with self._lock:
+            node = self._nodes.get(key)
+        if node is not None and now - node.checked_at < self.ttl:
+            return node.children
+
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+            if node is not None and node.mtime_ns == mtime_ns:
+                node.checked_at = now
+                return node.children
+            children = self._list(key)
+        except OSError:
+            return []
+        with self._lock:
+            self._nodes[key] = _Node(children, mtime_ns, now)
+        return children
+
+    def _list(self, path: str) -> list:
+        self.listings += 1
+        with os.scandir(path) as it:
+            # DirEntry.is_dir 多数系统上直接使用列目录返回的类型，不需要逐个 stat
+            return sorted(entry.name for entry in it
+                          if not entry.name.startswith(".") and entry.is_dir())
+
+    def seed(self, listings: dict):
+        """
+        用扫描遍历时记录的目录列表填充目录树（见 scanner.walk_music_files 的 listings）
+
+        列表是完整的，并带有列目录时的修改时间；填充的节点视为已过期，第一次访问时 stat 一次，
+        修改时间没变就直接使用，不再列目录
+
+        Args:
+            listings: {目录路径: (修改时间, 子目录名)}
+        """
+        with self._lock:
+            for path, (mtime_ns, children) in listings.items():
+                self._nodes[self._key(path)] = _Node(children, mtime_ns, float("-inf"))
+
+    def invalidate(self, path=None):
+        """丢弃某个目录（None 表示全部）的缓存，下次访问时重新列出"""
+        with self._lock:
+            if path is None:
+                self._nodes.clear()
+            else:
+                self._nodes.pop(self._key(path), None)
+
+
+# 进程内共享的目录树（与 scan_jobs 的注册表一样在 Streamlit 重新运行之间保留）
+directory_tree = DirectoryTree()
@@ -1,147 +1,206 @@
 """
 音乐升级下载清单生成器
 用于导出需要升级的歌曲列表，便于在酷我音乐中批量搜索下载
+
+默认从最近一次扫描的快照导出（见 library_snapshot），不必重新扫描：
+    python export_download_list.py G:\\music                      # 最新快照（没有快照时扫描）
+    python export_download_list.py G:\\music --snapshot 整理前     # 指定名称的快照
+    python export_download_list.py G:\\music --rescan [--save-as 整理前]
+    python export_download_list.py G:\\music --list               # 列出快照
 """
 
+import argparse
+
+import numpy as np
 import pandas as pd
-import json
 from pathlib import Path
-from scanner import scan_music
-from analyzer import analyze, find_duplicates, find_multi_version, find_mp3_only, get_format_priority
-from datetime import datetime
+from scanner import iter_scan_batches
+from analyzer import format_priorities
+from config import SNAPSHOT
+from exporters import export_lists
+from library_snapshot import LATEST, auto_snapshot, find_snapshot, list_snapshots, load_snapshot, snapshot_age_hours
+from library_store import create_library_builder
+
+# 两份清单用到的列：从快照读取时只读取这些列
+LIST_COLUMNS = ["song_key", "format", "title", "artist", "duration", "bitrate", "file_name"]
+
+
+def _song_groups(df: pd.DataFrame):
+    """按 song_key 字典序编号：(每行的分组编号, 分组数)"""
+    codes, keys = pd.factorize(df["song_key"].astype(object), sort=True)
+    return codes, len(keys)
+
+
+def _first_rows(codes: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """
+    每组的第一行，按分组编号排列
+
+    Args:
+        codes: 每行的分组编号
+        order: 先按分组编号排序的行号（组内顺序决定哪一行是“第一行”）
+    """
+    sorted_codes = codes[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    return order[first]
+
+
+def mp3_upgrade_list(mp3_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    仅 MP3 歌曲的升级清单：每首歌一行（取该歌第一个文件的信息），按 song_key 排序
+    
+    一次分组编号 + 取首行，不再对每首歌过滤整个数据框
+    """
+    codes, n_groups = _song_groups(mp3_df)
+    first = mp3_df.iloc[_first_rows(codes, np.argsort(codes, kind="stable"))]
+    return pd.DataFrame({
+        "song_key": first["song_key"].to_numpy(dtype=object),
+        "title": first["title"].to_numpy(dtype=object),
+        "artist": first["artist"].to_numpy(dtype=object),
+        "duration": first["duration"].to_numpy(),
+        "current_bitrate": first["bitrate"].to_numpy(),
+        "file_name": first["file_name"].to_numpy(dtype=object),
+        "priority": "🔴 高优先级",
+    })
+
+
+def multi_version_list(mv_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    多版本歌曲清单：每首歌一行，包含格式集合、最佳格式（优先级最高的第一个文件）和版本数，按 song_key 排序
+    
+    格式优先级只对去重后的格式查表一次，各组的最佳文件由一次稳定排序得到
+    """
+    codes, n_groups = _song_groups(mv_df)
+    priority = format_priorities(mv_df["format"]).to_numpy()
+    # 先按分组、再按优先级从高到低；lexsort 是稳定排序，同优先级保持原始顺序
+    best = mv_df.iloc[_first_rows(codes, np.lexsort((-priority, codes)))]
+    
+    # 每组的格式集合：第 i 位表示 formats[i]；不同的组合很少，每种只拼接一次字符串
+    format_codes, formats = pd.factorize(mv_df["format"])
+    masks = np.zeros(n_groups, dtype=np.int64)
+    for i in range(len(formats)):
+        has = np.zeros(n_groups, dtype=bool)
+        has[codes[format_codes == i]] = True
+        masks |= has.astype(np.int64) << i
+    unique_masks, inverse = np.unique(masks, return_inverse=True)
+    mask_text = np.array([", ".join(sorted(str(fmt) for i, fmt in enumerate(formats) if mask >> i & 1))
+                          for mask in unique_masks], dtype=object)
+    
+    return pd.DataFrame({
+        "song_key": best["song_key"].to_numpy(dtype=object),
+        "title": best["title"].to_numpy(dtype=object),
+        "artist": best["artist"].to_numpy(dtype=object),
+        "formats": mask_text[inverse.reshape(-1)],
+        "best_format": best["format"].to_numpy(dtype=object),
+        "version_count": np.bincount(codes, minlength=n_groups),
+        "priority": "🟡 中优先级",
+    })
+
 
 class DownloadListGenerator:
-    def __init__(self, music_path="G:\\music"):
+    def __init__(self, music_path="G:\\music", workers=None):
         self.music_path = music_path
-        self.df = None
+        self.workers = workers  # 并行解析进程数，None 表示使用 config.SCAN_WORKERS
+        self.analysis = None  # LibraryAnalysis 或 SqliteLibrary（从内存后端快照读取时只含 LIST_COLUMNS）
         self.export_dir = Path("./exports")
         self.export_dir.mkdir(exist_ok=True)
         
-    def scan_and_analyze(self):
-        """扫描并分析音乐库"""
+    def scan_and_analyze(self, snapshot_name=None):
+        """
+        扫描并分析音乐库（分析后端见 config.ANALYSIS_BACKEND），完成后写入快照
+
+        Args:
+            snapshot_name: 快照名称，None 表示按时间命名的自动快照
+        """
         print(f"🔍 正在扫描: {self.music_path}")
-        music_list = scan_music(self.music_path)
-        if not music_list:
+        builder = create_library_builder(self.music_path)
+        stats = None
+        for batch in iter_scan_batches(self.music_path, workers=self.workers):
+            builder.add(batch)
+            stats = batch.stats
+        self.analysis = builder.finish()
+        if self.analysis is None:
             print("❌ 未找到音乐文件!")
             return False
         
-        self.df = pd.DataFrame(music_list)
-        self.df = analyze(self.df)
-        print(f"✅ 扫描完成，找到 {len(self.df)} 个文件")
+        print(f"✅ 扫描完成，找到 {self.analysis.summary()['files']} 个文件")
+        print(f"   缓存命中 {stats['cache_hits']}，重新解析 {stats['cache_misses']}，"
+              f"移除已删除文件 {stats['cache_removed']}")
+        meta = auto_snapshot(self.analysis, self.music_path, snapshot_name)
+        if meta is not None:
+            print(f"💾 已保存快照: {meta['name']}")
+        return True
+    
+    def load_snapshot(self, name=LATEST, max_age_hours=None):
+        """
+        从快照读取分析结果，不扫描
+        
+        Args:
+            name: 快照名称，LATEST 表示最新的一个
+            max_age_hours: 快照超过这么多小时时警告，None 表示使用 config.SNAPSHOT
+        """
+        try:
+            self.analysis, meta = load_snapshot(self.music_path, name, columns=LIST_COLUMNS)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ {e}")
+            return False
+        
+        age = snapshot_age_hours(meta)
+        print(f"📂 使用快照 {meta['name']}（{meta['created_at'][:19]}，{meta['rows']} 个文件）")
+        max_age_hours = SNAPSHOT["max_age_hours"] if max_age_hours is None else max_age_hours
+        if age > max_age_hours:
+            print(f"⚠️ 快照已有 {age:.1f} 小时（超过 {max_age_hours} 小时），之后的文件变动不会反映在清单中；"
+                  f"可使用 --rescan 重新扫描")
         return True
     
     def generate_mp3_upgrade_list(self):
         """生成仅MP3歌曲的升级清单"""
         print("\n📝 生成仅MP3歌曲升级清单...")
-        mp3_df = find_mp3_only(self.df)
+        mp3_df = self.analysis.mp3_only()
         
         if len(mp3_df) == 0:
             print("✅ 没有仅MP3的歌曲，无需升级")
             return None
         
-        # 按艺术家分组
-        result = []
-        for song_key in sorted(mp3_df['song_key'].unique()):
-            songs = mp3_df[mp3_df['song_key'] == song_key]
-            first = songs.iloc[0]
-            result.append({
-                "song_key": song_key,
-                "title": first.get("title", ""),
-                "artist": first.get("artist", ""),
-                "duration": first.get("duration", ""),
-                "current_bitrate": first.get("bitrate", ""),
-                "file_name": first.get("file_name", ""),
-                "priority": "🔴 高优先级"
-            })
-        
-        result_df = pd.DataFrame(result)
-        return result_df
+        return mp3_upgrade_list(mp3_df)
     
     def generate_multi_version_list(self):
         """生成多版本歌曲清单（可能的最优化选择）"""
         print("\n📝 生成多版本歌曲清单...")
-        mv_df = find_multi_version(self.df)
+        mv_df = self.analysis.multi_version()
         
         if len(mv_df) == 0:
             print("✅ 所有歌曲格式统一")
             return None
         
-        # 按歌曲统计信息
-        result = []
-        for song_key in sorted(mv_df['song_key'].unique()):
-            songs = mv_df[mv_df['song_key'] == song_key].copy()
-            songs["priority"] = songs["format"].apply(get_format_priority)
-            songs = songs.sort_values("priority", ascending=False)
-            
-            best = songs.iloc[0]
-            current = best.get("format", "")
-            
-            result.append({
-                "song_key": song_key,
-                "title": best.get("title", ""),
-                "artist": best.get("artist", ""),
-                "formats": ", ".join(sorted(songs["format"].unique())),
-                "best_format": current,
-                "version_count": len(songs),
-                "priority": "🟡 中优先级"
-            })
-        
-        result_df = pd.DataFrame(result)
-        return result_df
-    
-    def export_to_csv(self, data_dict):
-        """导出为CSV文件"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        for name, df in data_dict.items():
-            if df is not None:
-                filepath = self.export_dir / f"{name}_{timestamp}.csv"
-                df.to_csv(filepath, index=False, encoding='utf-8-sig')
-                print(f"✅ 导出 CSV: {filepath}")
-                print(f"   📊 共 {len(df)} 条记录\n")
+        return multi_version_list(mv_df)
     
-    def export_to_json(self, data_dict):
-        """导出为JSON文件"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        all_data = {}
-        for name, df in data_dict.items():
-            if df is not None:
-                all_data[name] = df.to_dict('records')
+    def export(self, data_dict, formats, compress=None):
+        """
+        一次遍历导出多种格式（见 exporters.export_lists）
         
-        filepath = self.export_dir / f"download_list_{timestamp}.json"
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(all_data, f, ensure_ascii=False, indent=2)
-        print(f"✅ 导出 JSON: {filepath}\n")
+        Args:
+            data_dict: {清单名: DataFrame}
+            formats: "csv" / "ndjson" / "txt"（"json" 视为 "ndjson"）
+            compress: 写成 gzip 文件，None 表示使用 config.EXPORT
+        """
+        formats = list(dict.fromkeys("ndjson" if fmt == "json" else fmt for fmt in formats))
+        return export_lists(data_dict, formats, self.export_dir, compress=compress)
+    
+    def export_to_csv(self, data_dict, compress=None):
+        """导出为CSV文件（每份清单一个文件）"""
+        return self.export(data_dict, ["csv"], compress)
+    
+    def export_to_ndjson(self, data_dict, compress=None):
+        """导出为NDJSON文件（每行一条记录，list 字段为清单名）"""
+        return self.export(data_dict, ["ndjson"], compress)
     
-    def export_to_txt(self, data_dict):
+    # 旧名称：JSON 导出已改为逐行写出的 NDJSON
+    export_to_json = export_to_ndjson
+    
+    def export_to_txt(self, data_dict, compress=None):
         """导出为易读的TXT文件（便于复制到模拟器）"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filepath = self.export_dir / f"download_list_{timestamp}.txt"
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("🎵 音乐升级下载清单\n")
-            f.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("="*60 + "\n\n")
-            
-            for name, df in data_dict.items():
-                if df is not None:
-                    f.write(f"\n{name.upper()}\n")
-                    f.write("-"*60 + "\n")
-                    
-                    for idx, row in df.iterrows():
-                        f.write(f"\n【{idx+1}】 {row.get('song_key', row.get('title', ''))}\n")
-                        for col in df.columns:
-                            if col != 'song_key':
-                                val = row[col]
-                                if pd.notna(val):
-                                    f.write(f"  {col}: {val}\n")
-                    
-                    f.write(f"\n小计: {len(df)} 首歌曲\n")
-                    f.write("="*60 + "\n")
-        
-        print(f"✅ 导出 TXT: {filepath}")
-        print(f"   📝 格式化清单，便于手动操作\n")
+        return self.export(data_dict, ["txt"], compress)
     
     def print_summary(self, data_dict):
         """打印总结信息"""
@@ -158,11 +217,25 @@ class DownloadListGenerator:
         print("-"*60)
         print(f"  总计: {total} 首歌曲需要升级\n")
     
-    def run(self, export_formats=['csv', 'txt', 'json']):
-        """运行完整流程"""
+    def run(self, export_formats=['csv', 'txt', 'ndjson'], compress=None, snapshot=None, max_age_hours=None,
+            snapshot_name=None):
+        """
+        运行完整流程
+        
+        Args:
+            snapshot: None 表示重新扫描；LATEST 表示最新快照（没有快照时扫描）；其他值为快照名称
+            max_age_hours: 快照过期警告的小时数，None 表示使用 config.SNAPSHOT
+            snapshot_name: 重新扫描时写入的快照名称，None 表示自动命名
+        """
         print("🎵 音乐库升级清单生成器\n")
         
-        if not self.scan_and_analyze():
+        if snapshot == LATEST and find_snapshot(self.music_path) is None:
+            print("ℹ️ 还没有该目录的快照，改为扫描\n")
+            snapshot = None
+        if snapshot is None:
+            if not self.scan_and_analyze(snapshot_name):
+                return
+        elif not self.load_snapshot(snapshot, max_age_hours):
             return
         
         # 生成清单
@@ -174,13 +247,8 @@ class DownloadListGenerator:
         # 打印统计
         self.print_summary(data)
         
-        # 导出
-        if 'csv' in export_formats:
-            self.export_to_csv(data)
-        if 'txt' in export_formats:
-            self.export_to_txt(data)
-        if 'json' in export_formats:
-            self.export_to_json(data)
+        # 导出（各格式在同一次遍历中写出）
+        self.export(data, export_formats, compress)
         
         print("✅ 所有清单已生成，保存在 ./exports 目录\n")
         print("💡 使用建议:")
@@ -190,7 +258,37 @@ class DownloadListGenerator:
         print("  4. 将下载的文件放到原歌曲目录")
         print("  5. 再次运行 MusicAnalyzer 验证升级效果\n")
 
+def main():
+    parser = argparse.ArgumentParser(description="音乐库升级清单生成器")
+    parser.add_argument("music_path", nargs="?", default="G:\\music", help="音乐目录")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--snapshot", default=LATEST, metavar="NAME",
+                        help=f"从指定名称的快照导出（默认 {LATEST}：最新快照）")
+    source.add_argument("--rescan", action="store_true", help="重新扫描，并写入新快照")
+    source.add_argument("--list", action="store_true", help="列出该目录的快照")
+    parser.add_argument("--save-as", default=None, metavar="NAME", help="重新扫描时快照的名称（不会被自动清理）")
+    parser.add_argument("--max-age", type=float, default=None, metavar="HOURS",
+                        help="快照超过这么多小时时警告（默认见 config.SNAPSHOT）")
+    parser.add_argument("--formats", nargs="+", default=["csv", "txt", "ndjson"], choices=["csv", "txt", "ndjson", "json"])
+    parser.add_argument("--gzip", action="store_true", default=None, help="导出为 gzip 压缩文件")
+    parser.add_argument("--workers", type=int, default=None, help="扫描时的并行解析进程数")
+    args = parser.parse_args()
+    
+    if args.list:
+        snapshots = list_snapshots(args.music_path)
+        if not snapshots:
+            print(f"还没有快照: {args.music_path}")
+        for meta in snapshots:
+            kind = "自动" if meta["auto"] else "命名"
+            print(f"{meta['name']:<28} {meta['created_at'][:19]}  {meta['rows']:>8} 个文件  "
+                  f"{meta['backend']:<6} {kind}  {snapshot_age_hours(meta):.1f} 小时前")
+        return
+    
+    generator = DownloadListGenerator(music_path=args.music_path, workers=args.workers)
+    generator.run(export_formats=args.formats, compress=args.gzip,
+                  snapshot=None if args.rescan else args.snapshot,
+                  max_age_hours=args.max_age, snapshot_name=args.save_as)
+
+
 if __name__ == "__main__":
-    # 修改路径为你的音乐目录
-    generator = DownloadListGenerator(music_path="G:\\music")
-    generator.run(export_formats=['csv', 'txt', 'json'])
+    main()
@@ -0,0 +1,205 @@
+"""
+MusicAnalyzer 清单导出
+各清单按块（默认 5000 行）依次流过同一条写出管道，CSV / NDJSON / TXT 在同一次遍历中生成：
+每块在各写出器中向量化格式化为一段文本后直接写入文件，内存中不会出现整份清单的字典列表或大字符串。
+所有格式都可以直接写成 gzip 压缩文件。
+"""
+
+import gzip
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import EXPORT
+
+
+def _open_text(path: Path, compress: bool, encoding: str = "utf-8", newline: str = None):
+    """打开文本文件写入；compress 时写 gzip，文件名追加 .gz"""
+    if compress:
+        return gzip.open(path.with_name(path.name + ".gz"), "wt", compresslevel=EXPORT["gzip_level"],
+                         encoding=encoding, newline=newline)
+    return open(path, "w", encoding=encoding, newline=newline)
+
+
+def iter_chunks(data, chunk_rows: int = None):
+    """
+    按块遍历清单
+
+    Args:
+        data: DataFrame，或按块产出 DataFrame 的可迭代对象（如 SqliteLibrary.iter_frames）
+        chunk_rows: DataFrame 每块的行数，None 表示使用 config.EXPORT
+    """
+    if isinstance(data, pd.DataFrame):
+        chunk_rows = chunk_rows or EXPORT["chunk_rows"]
+        for start in range(0, len(data), chunk_rows):
+            yield data.iloc[start:start + chunk_rows]
+    else:
+        yield from data
+
+
+class ExportWriter(ABC):
+    """
+    写出器接口：每份清单依次调用 begin → write（每块一次）→ end，全部清单结束后 close
+
+    Attributes:
+        paths: 写出的文件
+    """
+
+    def __init__(self, export_dir: Path, timestamp: str, compress: bool = False):
+        self.export_dir = Path(export_dir)
+        self.timestamp = timestamp
+        self.compress = compress
+        self.paths = []
+        self._file = None
+
+    def _open(self, name: str, encoding: str = "utf-8", newline: str = None):
+        path = self.export_dir / name
+        self.paths.append(path.with_name(path.name + ".gz") if self.compress else path)
+        return _open_text(path, self.compress, encoding, newline)
+
+    def begin(self, name: str):
+        pass
+
+    @abstractmethod
+    def write(self, chunk: pd.DataFrame, offset: int):
+        """写入一块；offset 为该块第一行在清单中的序号（从 0 开始）"""
+
+    def end(self, name: str, rows: int):
+        pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CsvWriter(ExportWriter):
+    """每份清单一个 CSV 文件（UTF-8 BOM，Excel 可直接打开）"""
+
+    def begin(self, name: str):
+        # 换行由 to_csv 自己处理
+        self._file = self._open(f"{name}_{self.timestamp}.csv", encoding="utf-8-sig", newline="")
+        self._header = True
+
+    def write(self, chunk: pd.DataFrame, offset: int):
+        chunk.to_csv(self._file, index=False, header=self._header)
+        self._header = False
+
+    def end(self, name: str, rows: int):
+        self.close()
+        print(f"✅ 导出 CSV: {self.paths[-1]}")
+        print(f"   📊 共 {rows} 条记录\n")
+
+
+class NdjsonWriter(ExportWriter):
+    """所有清单写入一个 NDJSON 文件，每行一条记录，list 字段为清单名"""
+
+    def begin(self, name: str):
+        if self._file is None:
+            self._file = self._open(f"download_list_{self.timestamp}.ndjson")
+        self._list = name
+
+    def write(self, chunk: pd.DataFrame, offset: int):
+        if chunk.empty:
+            return
+        records = chunk.copy()
+        records.insert(0, "list", self._list)
+        # float32 列（compact_frame 压缩后的时长等）按最短十进制表示转为 float64，与 CSV / TXT 写出的数字相同；
+        # 直接 to_json 会先转成 float64 再按 10 位小数输出，199.33 变成 199.3300018311
+        for col in records.columns[records.dtypes == np.float32]:
+            records[col] = records[col].astype(str).astype("float64")
+        # to_json 的 lines 输出每条记录一行，以换行结尾
+        self._file.write(records.to_json(orient="records", lines=True, force_ascii=False))
+
+    def close(self):
+        if self._file is not None:
+            super().close()
+            print(f"✅ 导出 NDJSON: {self.paths[-1]}\n")
+
+
+class TxtWriter(ExportWriter):
+    """易读的 TXT 清单（便于复制到模拟器），所有清单写入一个文件"""
+
+    def begin(self, name: str):
+        if self._file is None:
+            self._file = self._open(f"download_list_{self.timestamp}.txt")
+            self._file.write("🎵 音乐升级下载清单\n")
+            self._file.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            self._file.write("=" * 60 + "\n\n")
+        self._file.write(f"\n{name.upper()}\n")
+        self._file.write("-" * 60 + "\n")
+
+    def write(self, chunk: pd.DataFrame, offset: int):
+        if chunk.empty:
+            return
+        if "song_key" in chunk.columns:
+            heading = chunk["song_key"]
+        else:
+            heading = chunk.get("title", pd.Series("", index=chunk.index))
+        numbers = np.arange(offset + 1, offset + len(chunk) + 1).astype(str).astype(object)
+        text = "\n【" + numbers + "】 " + heading.astype(str).to_numpy(dtype=object) + "\n"
+        for col in chunk.columns:
+            if col == "song_key":
+                continue
+            values = chunk[col]
+            # 缺失值不输出该字段
+            field = f"  {col}: " + values.astype(str).to_numpy(dtype=object) + "\n"
+            text = text + np.where(values.notna().to_numpy(), field, "")
+        self._file.write("".join(text))
+
+    def end(self, name: str, rows: int):
+        self._file.write(f"\n小计: {rows} 首歌曲\n")
+        self._file.write("=" * 60 + "\n")
+
+    def close(self):
+        if self._file is not None:
+            super().close()
+            print(f"✅ 导出 TXT: {self.paths[-1]}")
+            print(f"   📝 格式化清单，便于手动操作\n")
+
+
+# 格式名 -> 写出器
+WRITERS = {
+    "csv": CsvWriter,
+    "ndjson": NdjsonWriter,
+    "txt": TxtWriter,
+}
+
+
+def export_lists(data_dict: dict, formats, export_dir, compress: bool = None, chunk_rows: int = None) -> list:
+    """
+    把多份清单一次遍历导出为多种格式
+
+    Args:
+        data_dict: {清单名: DataFrame 或按块产出 DataFrame 的可迭代对象}，值为 None 的清单跳过
+        formats: WRITERS 中的格式名
+        export_dir: 导出目录
+        compress: 写成 gzip 文件，None 表示使用 config.EXPORT
+        chunk_rows: 每块的行数，None 表示使用 config.EXPORT
+
+    Returns:
+        写出的文件路径
+    """
+    compress = EXPORT["gzip"] if compress is None else compress
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    writers = [WRITERS[fmt](export_dir, timestamp, compress) for fmt in formats]
+    try:
+        for name, data in data_dict.items():
+            if data is None:
+                continue
+            for writer in writers:
+                writer.begin(name)
+            rows = 0
+            for chunk in iter_chunks(data, chunk_rows):
+                for writer in writers:
+                    writer.write(chunk, rows)
+                rows += len(chunk)
+            for writer in writers:
+                writer.end(name, rows)
+    finally:
+        for writer in writers:
+            writer.close()
+    return [path for writer in writers for path in writer.paths]
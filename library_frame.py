@@ -0,0 +1,99 @@
+"""
+MusicAnalyzer 音乐库数据框
+把 scan_music 的结果构建为按列类型压缩的 DataFrame，减少多个会话同时打开时的内存占用
+"""
+
+import pandas as pd
+
+# 重复度高的列使用 category：每行只存整数编码，字符串只在类别表中保存一份
+CATEGORY_COLUMNS = ["format", "codec", "artist", "album", "read_mode"]
+
+# 数值列的目标类型（可空整数，缺失值为 <NA>）
+INTEGER_COLUMNS = {
+    "bitrate": "UInt32",
+    "sample_rate": "UInt32",
+    "bit_depth": "UInt8",
+    "channels": "UInt8",
+    "track_number": "UInt16",
+    "disc_number": "UInt16",
+    "file_size": "UInt64",
+    "parse_bytes": "UInt64",
+}
+
+# duration 在扫描时已保留两位小数，float32 足以精确表示到 0.01 秒，round() 结果不变
+FLOAT_COLUMNS = {
+    "duration": "float32",
+}
+
+
+def _to_integer(series: pd.Series, dtype: str) -> pd.Series:
+    """转换为可空整数；存在非整数或超出范围的值时保持原样"""
+    try:
+        return series.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return series
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    按列类型压缩数据框
+
+    - CATEGORY_COLUMNS 转为 category
+    - song_key 保持字符串：除重复歌曲外几乎每行都不相同，转为 category 后类别表与原列一样大，
+      并不节省内存。歌曲分组 ID 和 ID 到 song_key 的查找表由 analyzer.LibraryAnalysis 在构建时
+      一次 factorize 得到（group_codes / keys），不存放在数据框中
+    - 数值列向下转换为更窄的可空整数 / float32
+
+    Args:
+        df: scan_music 结果构建的数据框（可以已经过 analyze）
+
+    Returns:
+        新的数据框，列名和取值与输入一致
+    """
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            df[col] = _to_integer(df[col], dtype)
+    for col, dtype in FLOAT_COLUMNS.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def build_library_frame(data) -> pd.DataFrame:
+    """
+    由扫描结果构建压缩后的数据框
+
+    Args:
+        data: scan_music 返回的行列表，或多个分批 DataFrame 组成的列表
+
+    Returns:
+        compact_frame 处理后的数据框
+    """
+    if isinstance(data, list) and data and isinstance(data[0], pd.DataFrame):
+        df = pd.concat(data, ignore_index=True)
+    else:
+        df = pd.DataFrame(data)
+    return compact_frame(df)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> dict:
+    """
+    对比压缩前后的内存占用（memory_usage(deep=True)）
+
+    Returns:
+        {"before": 字节数, "after": 字节数, "ratio": after / before, "columns": {列名: (before, after)}}
+    """
+    before_cols = before.memory_usage(deep=True)
+    after_cols = after.memory_usage(deep=True)
+    total_before = int(before_cols.sum())
+    total_after = int(after_cols.sum())
+    return {
+        "before": total_before,
+        "after": total_after,
+        "ratio": total_after / total_before if total_before else 1.0,
+        "columns": {col: (int(before_cols[col]), int(after_cols.get(col, 0))) for col in before_cols.index},
+    }
@@ -0,0 +1,224 @@
+"""
+MusicAnalyzer 音乐库快照
+每次扫描完成后把分析结果（扫描行以及内容哈希、song_key 等分析列）写入磁盘，
+生成下载清单时可以直接读取最新或指定名称的快照，不必重新扫描整个音乐库：
+    python export_download_list.py G:\\music                    # 最新快照
+    python export_download_list.py G:\\music --snapshot 整理前   # 指定名称的快照
+    python export_download_list.py G:\\music --rescan           # 重新扫描（并写入新快照）
+
+每个快照由数据文件和同名的 .json 元数据组成，元数据最后写入，只写了一半的快照不会被列出：
+- 内存后端：压缩后的数据框写成 Arrow（Feather）文件，分类列和可空整数列原样保留；
+  song_key 按分组编号写成字典列，读取时直接得到 LibraryAnalysis 的分组，不必重新 factorize。
+  读取时内存映射文件，可以只读取需要的列（下载清单只用到 7 列），50 万行约 0.2 秒
+- sqlite 后端：用 SQLite 在线备份复制建库数据库（含分组统计表），读取时直接打开，不重建
+元数据中的 format 是快照格式版本，与当前版本不同的快照不会被读取（需要重新扫描）。
+"""
+
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from analyzer import LibraryAnalysis
+from config import SNAPSHOT
+from library_store import SqliteLibrary, library_digest
+
+# 快照格式版本：数据文件的列或存储方式变化时递增
+SNAPSHOT_FORMAT = 2
+
+# 表示“最新快照”的名称，不能用作快照名称
+LATEST = "latest"
+
+_NAME_PATTERN = re.compile(r"^[\w.-]+$")
+
+
+def _meta_path(root_dir: str, name: str, directory: str = None) -> Path:
+    return Path(directory or SNAPSHOT["dir"]) / f"snapshot_{library_digest(root_dir)}_{name}.json"
+
+
+def _data_path(meta: dict, directory: str = None) -> Path:
+    return Path(directory or SNAPSHOT["dir"]) / meta["file"]
+
+
+def _write_json(path: Path, data: dict):
+    """先写临时文件再替换，读取方不会看到写了一半的元数据"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _write_frame(analysis, path: Path):
+    """内存后端的数据框写成 Feather 文件，song_key 写成以分组编号为索引的字典列"""
+    df = analysis.df
+    table = pa.Table.from_pandas(df.drop(columns="song_key"), preserve_index=False)
+    codes = analysis.group_codes
+    song_keys = pa.DictionaryArray.from_arrays(
+        pa.array(codes, type=pa.int32(), mask=codes < 0),
+        pa.array(analysis.keys, type=pa.string()),
+    )
+    table = table.add_column(df.columns.get_loc("song_key"), "song_key", song_keys)
+    feather.write_feather(table, path)
+
+
+def _read_frame(path: Path, columns: list = None) -> LibraryAnalysis:
+    """读取 _write_frame 写出的文件，用字典列的索引和取值直接构建分组"""
+    if columns is not None:
+        columns = ["song_key", "format"] + [col for col in columns if col not in ("song_key", "format")]
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    song_keys = table.column("song_key")
+    # 每行的字符串都不相同，pyarrow 默认的对象去重只会多花一倍时间
+    df = table.drop_columns("song_key").to_pandas(deduplicate_objects=False)
+    if song_keys.num_chunks:
+        codes = np.concatenate([chunk.indices.fill_null(-1).to_numpy() for chunk in song_keys.chunks])
+        keys = song_keys.chunk(0).dictionary.to_numpy(zero_copy_only=False)
+    else:
+        codes, keys = np.empty(0, dtype=np.int32), np.empty(0, dtype=object)
+    codes = codes.astype(np.intp)
+    # 分组编号 -1（song_key 缺失）取到末尾的 None
+    df.insert(table.column_names.index("song_key"), "song_key", np.append(keys, None)[codes])
+    return LibraryAnalysis(df, groups=(codes, keys))
+
+
+def list_snapshots(root_dir: str, directory: str = None) -> list:
+    """音乐库根目录的全部快照元数据，最新的在前"""
+    pattern = _meta_path(root_dir, "*", directory).name
+    snapshots = []
+    for path in Path(directory or SNAPSHOT["dir"]).glob(pattern):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return sorted(snapshots, key=lambda meta: meta["created_at"], reverse=True)
+
+
+def delete_snapshot(meta: dict, directory: str = None):
+    """删除快照的元数据和数据文件（元数据先删，删到一半也不会留下可读取的坏快照）"""
+    for path in (_meta_path(meta["root_dir"], meta["name"], directory), _data_path(meta, directory)):
+        for stale in path.parent.glob(path.name + "*"):  # 含 SQLite 的 WAL 文件
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+
+def save_snapshot(analysis, root_dir: str, name: str = None, directory: str = None) -> dict:
+    """
+    把分析结果写成快照，并清理该根目录多余的自动快照
+
+    Args:
+        analysis: LibraryAnalysis 或 SqliteLibrary
+        root_dir: 音乐库根目录
+        name: 快照名称（字母、数字、下划线、点、连字符），同名快照被替换；
+            None 表示按当前时间命名的自动快照
+        directory: 快照目录，None 表示使用 config.SNAPSHOT
+
+    Returns:
+        快照元数据
+    """
+    created = datetime.now()
+    auto = name is None
+    if auto:
+        name = created.strftime("%Y%m%d_%H%M%S_%f")
+    if name == LATEST or not _NAME_PATTERN.match(name):
+        raise ValueError(f"无效的快照名称: {name}")
+    meta_path = _meta_path(root_dir, name, directory)
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+
+    backend = "sqlite" if isinstance(analysis, SqliteLibrary) else "memory"
+    data_path = meta_path.with_suffix(".db" if backend == "sqlite" else ".feather")
+    tmp = data_path.with_name(data_path.name + ".tmp")
+    if backend == "sqlite":
+        target = sqlite3.connect(str(tmp))
+        try:
+            analysis.conn.backup(target)
+        finally:
+            target.close()
+    else:
+        _write_frame(analysis, tmp)
+
+    if meta_path.exists():
+        with open(meta_path, encoding="utf-8") as f:
+            delete_snapshot(json.load(f), directory)
+    os.replace(tmp, data_path)
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "name": name,
+        "auto": auto,
+        "root_dir": str(root_dir),
+        "backend": backend,
+        "file": data_path.name,
+        "rows": int(analysis.summary()["files"]),
+        "created_at": created.isoformat(),
+    }
+    _write_json(meta_path, meta)
+
+    if auto:
+        autos = [snapshot for snapshot in list_snapshots(root_dir, directory) if snapshot["auto"]]
+        for old in autos[SNAPSHOT["keep"]:]:
+            delete_snapshot(old, directory)
+    return meta
+
+
+def auto_snapshot(analysis, root_dir: str, name: str = None) -> dict:
+    """
+    扫描完成或删除文件后写入快照（config.SNAPSHOT 关闭时跳过）
+
+    写入失败只打印错误并返回 None，不影响扫描结果的使用
+    """
+    if not SNAPSHOT["enabled"] or analysis is None:
+        return None
+    try:
+        return save_snapshot(analysis, root_dir, name)
+    except Exception as e:
+        print(f"保存快照失败: {root_dir} -> {e}")
+        return None
+
+
+def find_snapshot(root_dir: str, name: str = LATEST, directory: str = None) -> dict:
+    """按名称查找快照元数据（LATEST 表示最新的一个），找不到时返回 None"""
+    for meta in list_snapshots(root_dir, directory):
+        if name in (LATEST, meta["name"]):
+            return meta
+    return None
+
+
+def load_snapshot(root_dir: str, name: str = LATEST, directory: str = None, columns: list = None):
+    """
+    读取快照
+
+    Args:
+        root_dir: 音乐库根目录
+        name: 快照名称，LATEST 表示最新的一个
+        directory: 快照目录，None 表示使用 config.SNAPSHOT
+        columns: 内存后端只读取这些列（song_key 和 format 总会读取），None 表示全部；sqlite 后端忽略
+
+    Returns:
+        (分析对象, 快照元数据)；分析对象为 LibraryAnalysis 或 SqliteLibrary，取决于写入快照时的后端
+
+    Raises:
+        FileNotFoundError: 没有该快照
+        ValueError: 快照格式版本与当前版本不同
+    """
+    meta = find_snapshot(root_dir, name, directory)
+    if meta is None:
+        raise FileNotFoundError(f"没有快照: {root_dir} ({name})")
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"快照 {meta['name']} 的格式版本 {meta.get('format')} 与当前版本 {SNAPSHOT_FORMAT} 不同，"
+                         f"请重新扫描")
+    path = _data_path(meta, directory)
+    if meta["backend"] == "sqlite":
+        return SqliteLibrary.open(path), meta
+    return _read_frame(path, columns), meta
+
+
+def snapshot_age_hours(meta: dict) -> float:
+    """快照距今的小时数"""
+    return (datetime.now() - datetime.fromisoformat(meta["created_at"])).total_seconds() / 3600
@@ -0,0 +1,458 @@
+"""
+MusicAnalyzer 音乐库存储后端
+扫描结果可以放在内存数据框中（LibraryAnalysis），也可以分批写入磁盘上的 SQLite 表（SqliteLibrary），
+由 config.ANALYSIS_BACKEND 选择；两者提供相同的分析接口，界面和下载清单生成器不区分后端
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import weakref
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from analyzer import FORMAT_PRIORITY, KEEP_ORDER, LibraryAnalysis, analyze, build_song_keys, next_library_version
+from config import ANALYSIS_BACKEND, CONTENT_HASH
+from library_frame import compact_frame, memory_report
+from scanner import compute_content_hashes
+from search_index import RANGE_COLUMNS, TEXT_COLUMNS, SearchIndex
+
+# 磁盘表的列（scan_music 的输出、内容哈希和 song_key）
+LIBRARY_COLUMNS = {
+    "file_path": "TEXT PRIMARY KEY",
+    "file_name": "TEXT",
+    "format": "TEXT",
+    "title": "TEXT",
+    "artist": "TEXT",
+    "album": "TEXT",
+    "duration": "REAL",
+    "bitrate": "INTEGER",
+    "sample_rate": "INTEGER",
+    "bit_depth": "INTEGER",
+    "codec": "TEXT",
+    "channels": "INTEGER",
+    "track_number": "INTEGER",
+    "disc_number": "INTEGER",
+    "file_size": "INTEGER",
+    "read_mode": "TEXT",
+    "parse_bytes": "INTEGER",
+    "audio_hash": "TEXT",
+    "content_hash": "TEXT",
+    "song_key": "TEXT",
+}
+
+# 可用于“完全相同文件”的哈希列
+HASH_COLUMNS = ("content_hash", "audio_hash")
+
+
+def _priority_sql(column: str) -> str:
+    """与 analyzer.get_format_priority 相同的格式优先级 SQL 表达式"""
+    cases = " ".join(f"WHEN '{fmt}' THEN {priority}" for fmt, priority in FORMAT_PRIORITY.items())
+    return f"CASE lower({column}) {cases} ELSE 0 END"
+
+
+def _keep_order_sql(alias: str) -> str:
+    """与 LibraryAnalysis._rank 相同的保留顺序：KEEP_ORDER 各项降序（缺失记为 -1），最后按文件路径"""
+    terms = [f"{_priority_sql(alias + '.format')} DESC" if col == "priority"
+             else f"COALESCE({alias}.{col}, -1) DESC" for col in KEEP_ORDER]
+    return ", ".join(terms + [f"{alias}.file_path"])
+
+
+def library_digest(root_dir: str) -> str:
+    """音乐库根目录的短摘要，用于按根目录命名磁盘文件（建库文件、快照）"""
+    return hashlib.blake2b(str(Path(root_dir)).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _library_prefix(root_dir: str) -> str:
+    return f"library_{library_digest(root_dir)}_"
+
+
+def library_db_path(root_dir: str, directory: str = None, build: str = None) -> Path:
+    """
+    音乐库根目录的一次建库对应一个数据库文件
+
+    重新扫描写入新文件，扫描期间旧的分析结果仍可继续查询；新库建成后旧文件才被清理
+
+    Args:
+        build: 建库标识，None 表示按当前时间生成
+    """
+    build = build or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return Path(directory or ANALYSIS_BACKEND["dir"]) / f"{_library_prefix(root_dir)}{build}.db"
+
+
+# 仍打开着的库对象（会话状态、扫描任务、派生结果缓存都可能持有）；被回收的对象自动移出
+_open_libraries = weakref.WeakSet()
+# 已被新建库取代、但删除时仍有库对象打开的数据库文件，最后一个对象 close 时删除
+_superseded = set()
+_libraries_lock = threading.Lock()
+
+
+def _unlink_library(db_path: Path):
+    """删除数据库文件及其 WAL 文件；仍被其他进程占用而删除失败的文件留到下次清理"""
+    for path in db_path.parent.glob(db_path.name + "*"):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _remove_old_libraries(root_dir: str, keep: Path):
+    """
+    删除同一音乐库根目录之前的建库文件（含 WAL 文件）
+
+    仍有库对象打开的文件不删除（其他会话或派生结果缓存可能还在查询），记录下来在其 close 时删除
+    """
+    with _libraries_lock:
+        in_use = {library.db_path for library in list(_open_libraries)}
+        old = {path.with_name(path.name.split(".db")[0] + ".db")
+               for path in keep.parent.glob(_library_prefix(root_dir) + "*")} - {keep}
+        _superseded.update(old & in_use)
+    for db_path in old - in_use:
+        _unlink_library(db_path)
+
+
+def _connect(db_path) -> sqlite3.Connection:
+    # Streamlit 每次重新运行脚本可能在不同线程中，连接需要允许跨线程使用
+    conn = sqlite3.connect(str(db_path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=FILE")  # 分组排序的中间结果放在磁盘上
+    conn.execute(f"PRAGMA cache_size=-{ANALYSIS_BACKEND['cache_mib'] * 1024}")
+    return conn
+
+
+class SqliteLibrary:
+    """
+    磁盘上的音乐库表及其分析结果
+
+    分组统计在建库结束时用 SQL 物化为两张表：
+    - song_groups：每个 song_key 的文件数、格式数、是否含 MP3
+    - keep_rank：有重复的分组内按保留顺序的名次（窗口函数），名次 1 为保留的文件
+    查询只把结果集读入内存（并经 compact_frame 压缩），整张表不会整体载入。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = _connect(self.db_path)
+        self.version = None  # 每次 finalize 后更新
+        self._summary = None
+        with _libraries_lock:
+            _open_libraries.add(self)
+
+    # ---------- 建库 ----------
+
+    def reset(self):
+        """清空并重建表"""
+        for table in ("library", "song_groups", "keep_rank"):
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        columns = ", ".join(f"{name} {sqltype}" for name, sqltype in LIBRARY_COLUMNS.items())
+        self.conn.execute(f"CREATE TABLE library ({columns})")
+        self.conn.commit()
+        self._summary = None
+
+    def append(self, rows) -> int:
+        """
+        写入一批扫描结果（同时计算 song_key）
+
+        Args:
+            rows: scan_music 的行列表或数据框
+
+        Returns:
+            写入的行数
+        """
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        if len(df) == 0:
+            return 0
+        df = df.reindex(columns=list(LIBRARY_COLUMNS))
+        df["song_key"] = build_song_keys(df)
+        # 转为 Python 对象，缺失值为 None（sqlite3 不接受 numpy 标量和 NaN）
+        values = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        placeholders = ", ".join("?" * len(LIBRARY_COLUMNS))
+        self.conn.executemany(f"INSERT OR REPLACE INTO library VALUES ({placeholders})", values)
+        self.conn.commit()
+        return len(df)
+
+    def update_content_hashes(self) -> dict:
+        """
+        计算字节级内容哈希：只把大小与其他文件相同的文件交给 compute_content_hashes
+
+        Returns:
+            compute_content_hashes 的统计
+        """
+        candidates = self.conn.execute(
+            "SELECT file_path, file_size FROM library WHERE file_size IN "
+            "(SELECT file_size FROM library WHERE file_size IS NOT NULL GROUP BY file_size HAVING COUNT(*) > 1)"
+        )
+        hashes, stats = compute_content_hashes(candidates)
+        self.conn.executemany("UPDATE library SET content_hash = ? WHERE file_path = ?",
+                              ((full, path) for path, full in hashes.items()))
+        self.conn.commit()
+        return stats
+
+    def finalize(self):
+        """建立索引并物化分组统计和保留名次"""
+        conn = self.conn
+        for column in ("song_key", "content_hash", "audio_hash", "format"):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_library_{column} ON library ({column})")
+        conn.execute("DROP TABLE IF EXISTS song_groups")
+        conn.execute(
+            "CREATE TABLE song_groups AS "
+            "SELECT song_key, COUNT(*) AS n, COUNT(DISTINCT format) AS n_formats, "
+            "SUM(format = 'mp3') AS n_mp3 "
+            "FROM library WHERE song_key IS NOT NULL GROUP BY song_key"
+        )
+        conn.execute("CREATE UNIQUE INDEX idx_song_groups ON song_groups (song_key)")
+        conn.execute("DROP TABLE IF EXISTS keep_rank")
+        conn.execute(
+            "CREATE TABLE keep_rank AS "
+            f"SELECT l.rowid AS row_id, ROW_NUMBER() OVER (PARTITION BY l.song_key ORDER BY {_keep_order_sql('l')}) "
+            "AS rank FROM library l JOIN song_groups g ON g.song_key = l.song_key WHERE g.n > 1"
+        )
+        conn.execute("CREATE INDEX idx_keep_rank ON keep_rank (rank, row_id)")
+        conn.commit()
+        self.version = next_library_version()
+        self._summary = None
+
+    @classmethod
+    def open(cls, db_path) -> "SqliteLibrary":
+        """打开已建好的库（例如快照），不重建分组统计"""
+        library = cls(db_path)
+        library.version = next_library_version()
+        return library
+
+    def remove_files(self, paths) -> "SqliteLibrary":
+        """
+        从表中移除已删除的文件并重新物化分组统计（原地更新，返回自身）
+
+        finalize 会更新 version：持有同一对象的其他会话和 ResultCache 据此丢弃删除前的结果
+        """
+        self.conn.executemany("DELETE FROM library WHERE file_path = ?", ((str(path),) for path in paths))
+        self.conn.commit()
+        self.finalize()
+        return self
+
+    # ---------- 查询 ----------
+
+    def _read(self, sql: str, params=()) -> pd.DataFrame:
+        df = pd.read_sql_query(sql, self.conn, params=params)
+        return compact_frame(df)
+
+    def _group_rows(self, condition: str) -> pd.DataFrame:
+        """song_groups 满足条件的分组的全部文件（按扫描顺序）"""
+        return self._read(
+            "SELECT l.* FROM library l JOIN song_groups g ON g.song_key = l.song_key "
+            f"WHERE {condition} ORDER BY l.rowid"
+        )
+
+    def duplicates(self) -> pd.DataFrame:
+        return self._group_rows("g.n > 1")
+
+    def mp3_only(self) -> pd.DataFrame:
+        # 非空格式只有 mp3 一种
+        return self._group_rows("g.n_formats = 1 AND g.n_mp3 > 0")
+
+    def multi_version(self) -> pd.DataFrame:
+        return self._group_rows("g.n_formats > 1")
+
+    def deletion_plan(self) -> "SqliteDeletionPlan":
+        return SqliteDeletionPlan(self)
+
+    def identical_columns(self) -> list:
+        """有取值的哈希列"""
+        return [col for col in HASH_COLUMNS
+                if self.conn.execute(f"SELECT 1 FROM library WHERE {col} IS NOT NULL LIMIT 1").fetchone()]
+
+    def identical(self, by: str = "content_hash") -> pd.DataFrame:
+        """同 analyzer.find_identical_files"""
+        if by not in HASH_COLUMNS:
+            raise ValueError(f"不支持的哈希列: {by}")
+        return self._read(
+            f"SELECT * FROM library WHERE {by} IN "
+            f"(SELECT {by} FROM library WHERE {by} IS NOT NULL GROUP BY {by} HAVING COUNT(*) > 1) ORDER BY rowid"
+        )
+
+    def identical_groups(self, by: str = "content_hash") -> int:
+        """完全相同文件的组数"""
+        if by not in HASH_COLUMNS:
+            raise ValueError(f"不支持的哈希列: {by}")
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM library WHERE {by} IS NOT NULL GROUP BY {by} HAVING COUNT(*) > 1)"
+        ).fetchone()[0]
+
+    def format_stats(self) -> pd.DataFrame:
+        """同 LibraryAnalysis.format_stats"""
+        return pd.read_sql_query(
+            "SELECT format, COUNT(*) AS files, COUNT(DISTINCT song_key) AS songs, "
+            "COALESCE(SUM(file_size), 0) AS total_size "
+            "FROM library WHERE format IS NOT NULL GROUP BY format ORDER BY files DESC", self.conn)
+
+    def summary(self) -> dict:
+        """同 LibraryAnalysis.summary（结果缓存到下一次 finalize）"""
+        if self._summary is None:
+            files, formats = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT format) FROM library").fetchone()
+            songs, duplicate, mp3_only, multi = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(n > 1), 0), COALESCE(SUM(n_formats = 1 AND n_mp3 > 0), 0), "
+                "COALESCE(SUM(n_formats > 1), 0) FROM song_groups").fetchone()
+            self._summary = {
+                "files": files,
+                "songs": songs,
+                "duplicate_songs": duplicate,
+                "mp3_only_songs": mp3_only,
+                "multi_version_songs": multi,
+                "formats": formats,
+            }
+        return self._summary
+
+    def iter_frames(self, chunk_rows: int = 50_000):
+        """按扫描顺序分块读取整张表"""
+        for chunk in pd.read_sql_query("SELECT * FROM library ORDER BY rowid", self.conn, chunksize=chunk_rows):
+            yield compact_frame(chunk)
+
+    def search_index(self, chunk_rows: int = 50_000) -> SearchIndex:
+        """
+        同 LibraryAnalysis.search_index（行号为 rowid）
+
+        只读入索引用到的列并分块建立，内存中只保留每列的去重取值和每行的编号，不持有整张表的文本
+        """
+        columns = ", ".join((*TEXT_COLUMNS, *RANGE_COLUMNS, "format"))
+        chunks = pd.read_sql_query(f"SELECT rowid AS row_id, {columns} FROM library ORDER BY rowid",
+                                   self.conn, chunksize=chunk_rows)
+        return SearchIndex.from_chunks(chunks)
+
+    def take(self, row_ids) -> pd.DataFrame:
+        """按 search_index 返回的 rowid 取出行（按扫描顺序）"""
+        return self._read("SELECT * FROM library WHERE rowid IN (SELECT value FROM json_each(?)) ORDER BY rowid",
+                          (json.dumps([int(row_id) for row_id in row_ids]),))
+
+    def storage_caption(self) -> str:
+        size = sum(p.stat().st_size for p in self.db_path.parent.glob(self.db_path.name + "*"))
+        return f"🗄️ 磁盘表 {self.db_path.name}（{size / 1024 / 1024:.1f} MB）"
+
+    def close(self):
+        """关闭连接；该文件已被新建库取代且没有其他对象打开时随之删除"""
+        self.conn.close()
+        with _libraries_lock:
+            _open_libraries.discard(self)
+            remove = (self.db_path in _superseded
+                      and not any(library.db_path == self.db_path for library in list(_open_libraries)))
+            if remove:
+                _superseded.discard(self.db_path)
+        if remove:
+            _unlink_library(self.db_path)
+
+
+class SqliteDeletionPlan:
+    """与 analyzer.DeletionPlan 相同接口的删除计划，按需从 keep_rank 表查询"""
+
+    def __init__(self, library: SqliteLibrary):
+        self.library = library
+
+    def _rows(self, condition: str) -> pd.DataFrame:
+        return self.library._read(
+            "SELECT l.* FROM library l JOIN keep_rank k ON k.row_id = l.rowid "
+            f"WHERE {condition} ORDER BY l.rowid"
+        )
+
+    @property
+    def to_keep(self) -> pd.DataFrame:
+        return self._rows("k.rank = 1")
+
+    @property
+    def to_delete(self) -> pd.DataFrame:
+        return self._rows("k.rank > 1")
+
+    def __len__(self):
+        return self.library.conn.execute("SELECT COUNT(*) FROM keep_rank WHERE rank > 1").fetchone()[0]
+
+    def summary(self) -> dict:
+        keep, delete, freed = self.library.conn.execute(
+            "SELECT COALESCE(SUM(k.rank = 1), 0), COALESCE(SUM(k.rank > 1), 0), "
+            "COALESCE(SUM(CASE WHEN k.rank > 1 THEN l.file_size END), 0) "
+            "FROM keep_rank k JOIN library l ON l.rowid = k.row_id").fetchone()
+        return {"groups": keep, "keep": keep, "delete": delete, "bytes_freed": freed}
+
+
+# ========== 建库 ==========
+
+class MemoryLibraryBuilder:
+    """把分批扫描结果收集为内存数据框，finish 时得到 LibraryAnalysis"""
+
+    def __init__(self):
+        self.frames = []
+        self.rows = 0
+
+    def add(self, batch):
+        if len(batch) > 0:
+            self.frames.append(batch if isinstance(batch, pd.DataFrame) else pd.DataFrame(batch))
+            self.rows += len(batch)
+
+    def finish(self):
+        """
+        合并并分析；没有任何行时返回 None
+
+        字节级重复检测需要完整的文件大小分布，因此在全部分批结果合并后进行
+        """
+        if not self.frames:
+            return None
+        # 中断后继续的扫描可能重复产出断点所在目录的文件，与 SQLite 的 INSERT OR REPLACE 一致保留最后一次
+        df = pd.concat(self.frames, ignore_index=True).drop_duplicates("file_path", keep="last", ignore_index=True)
+        self.frames = []
+        if CONTENT_HASH["enabled"]:
+            hashes, _ = compute_content_hashes(zip(df["file_path"], df["file_size"]))
+            df["content_hash"] = df["file_path"].map(hashes)
+        analyzed = analyze(df)
+        del df
+        compact = compact_frame(analyzed)
+        return LibraryAnalysis(compact, memory_report=memory_report(analyzed, compact))
+
+
+class SqliteLibraryBuilder:
+    """把分批扫描结果直接写入磁盘表，内存中只保留当前一批"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self.library = SqliteLibrary(library_db_path(root_dir))
+        self.library.reset()
+        self.rows = 0
+
+    def add(self, batch):
+        self.rows += self.library.append(batch)
+
+    def finish(self):
+        """计算内容哈希并物化分组统计；没有任何行时返回 None"""
+        if not self.rows:
+            self.library.close()
+            _unlink_library(self.library.db_path)
+            return None
+        if CONTENT_HASH["enabled"]:
+            self.library.update_content_hashes()
+        self.library.finalize()
+        _remove_old_libraries(self.root_dir, keep=self.library.db_path)
+        return self.library
+
+
+def create_library_builder(root_dir: str, backend: str = None):
+    """
+    按 config.ANALYSIS_BACKEND 创建建库器
+
+    用法：
+        builder = create_library_builder(root_dir)
+        for batch in iter_scan_batches(root_dir):
+            builder.add(batch)
+        analysis = builder.finish()  # LibraryAnalysis 或 SqliteLibrary
+
+    Args:
+        root_dir: 音乐库根目录（sqlite 后端据此确定数据库文件）
+        backend: "memory" 或 "sqlite"，None 表示使用配置
+    """
+    backend = backend or ANALYSIS_BACKEND["backend"]
+    if backend == "sqlite":
+        return SqliteLibraryBuilder(root_dir)
+    if backend == "memory":
+        return MemoryLibraryBuilder()
+    raise ValueError(f"未知的分析后端: {backend}")
@@ -0,0 +1,88 @@
+"""
+MusicAnalyzer 派生结果缓存
+Streamlit 每次交互（翻页、切换视图）都会从头重新运行脚本；分析结果按音乐库版本号缓存，
+同一次扫描内每个报表只计算一次，重新扫描或删除文件后版本号变化，缓存随之失效
+"""
+
+import time
+
+from config import RESULT_CACHE
+
+
+class ResultCache:
+    """
+    按音乐库版本号缓存的分析结果
+
+    提供与分析对象（LibraryAnalysis / SqliteLibrary）相同的报表方法，第一次调用时计算并保存，
+    之后直接返回同一个对象；derive 用于缓存视图自己的派生结果（如排序后的分组键）。
+    返回的数据框在多次运行之间共享，调用方不应原地修改。
+    """
+
+    # 结果只取决于音乐库内容的方法
+    CACHED_METHODS = {
+        "duplicates", "mp3_only", "multi_version", "deletion_plan", "identical", "identical_columns",
+        "identical_groups", "format_stats", "summary", "storage_caption", "search_index",
+    }
+
+    def __init__(self, analysis, enabled: bool = None):
+        """
+        Args:
+            analysis: LibraryAnalysis 或 SqliteLibrary
+            enabled: False 时每次都重新计算（用于对比），None 表示使用 config.RESULT_CACHE
+        """
+        self.analysis = analysis
+        self.version = analysis.version
+        self.enabled = RESULT_CACHE["enabled"] if enabled is None else enabled
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+        self.compute_time = 0.0
+
+    def derive(self, name: str, fn, *args):
+        """
+        取出或计算一个派生结果
+
+        Args:
+            name: 结果名称（与 args 一起作为缓存键）
+            fn: 计算函数，以 args 调用
+        """
+        if self.analysis.version != self.version:
+            # 分析对象被原地更新（SqliteLibrary.remove_files），之前的结果全部作废
+            self._results.clear()
+            self.version = self.analysis.version
+        key = (name, args)
+        if self.enabled and key in self._results:
+            self.hits += 1
+            return self._results[key]
+        start = time.perf_counter()
+        value = fn(*args)
+        self.compute_time += time.perf_counter() - start
+        self.misses += 1
+        if self.enabled:
+            self._results[key] = value
+        return value
+
+    def __getattr__(self, name):
+        # 只在实例属性中找不到时调用：报表方法走缓存，其余转发给分析对象
+        analysis = self.__dict__.get("analysis")
+        if analysis is None:
+            raise AttributeError(name)
+        attr = getattr(analysis, name)
+        if name not in self.CACHED_METHODS:
+            return attr
+        return lambda *args: self.derive(name, attr, *args)
+
+
+def cached_results(state, analysis) -> ResultCache:
+    """
+    取出 state.results 中当前音乐库版本的缓存，版本不一致（重新扫描、删除文件）时重建
+
+    Args:
+        state: 保存缓存的对象（st.session_state）
+        analysis: 当前的分析对象
+    """
+    results = getattr(state, "results", None)
+    if results is None or results.analysis is not analysis or results.version != analysis.version:
+        results = ResultCache(analysis)
+        state.results = results
+    return results
@@ -0,0 +1,206 @@
+"""
+MusicAnalyzer 扫描缓存
+用 SQLite 持久化 scan_music 的每一行结果，按 (路径, 文件大小, 修改时间) 判断文件是否需要重新解析
+"""
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+# 扫描结果的字段发生变化时递增，旧缓存会被整体丢弃
+CACHE_SCHEMA_VERSION = 5
+
+
+class ScanCache:
+    """
+    元数据索引
+
+    每个文件一行：file_path 为主键，记录 size / mtime_ns 以及 scan_music 产出的整行（JSON）。
+    同一个数据库还保存内容哈希（hashes）和后台扫描的断点（checkpoints / checkpoint_dirs）。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self._pending = []
+
+    def _init_schema(self):
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is None or int(row[0]) != CACHE_SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS files")
+            self.conn.execute("DROP TABLE IF EXISTS hashes")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                (str(CACHE_SCHEMA_VERSION),),
+            )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                file_path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                row TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hashes (
+                file_path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                partial_kib INTEGER,
+                partial_hash TEXT,
+                full_hash TEXT
+            )
+            """
+        )
+        # 后台扫描的断点（见 scan_jobs）：每个根目录记录扫描参数和已完整扫描的目录，程序重启后可以继续
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                root_dir TEXT PRIMARY KEY,
+                options TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoint_dirs (
+                root_dir TEXT NOT NULL,
+                dir_path TEXT NOT NULL,
+                PRIMARY KEY (root_dir, dir_path)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, file_path: str, size: int, mtime_ns: int):
+        """
+        查询缓存
+
+        Returns:
+            大小和修改时间都一致时返回缓存的行，否则返回 None
+        """
+        hit = self.conn.execute(
+            "SELECT size, mtime_ns, row FROM files WHERE file_path = ?", (file_path,)
+        ).fetchone()
+        if hit is None or hit[0] != size or hit[1] != mtime_ns:
+            return None
+        return json.loads(hit[2])
+
+    def put(self, file_path: str, size: int, mtime_ns: int, row: dict):
+        """写入（批量提交，调用 flush 落盘）"""
+        self._pending.append((file_path, size, mtime_ns, json.dumps(row, ensure_ascii=False)))
+        if len(self._pending) >= 1000:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (file_path, size, mtime_ns, row) VALUES (?, ?, ?, ?)",
+                self._pending,
+            )
+            self._pending = []
+        self.conn.commit()
+
+    def get_hashes(self, file_path: str, size: int, mtime_ns: int, partial_kib: int):
+        """
+        查询内容哈希缓存
+
+        Args:
+            partial_kib: 本次部分哈希首尾读取的 KiB 数；与缓存时不同则部分哈希不可用（全文哈希与之无关）
+
+        Returns:
+            (partial_hash, full_hash)，未缓存或文件已变化时均为 None
+        """
+        hit = self.conn.execute(
+            "SELECT size, mtime_ns, partial_kib, partial_hash, full_hash FROM hashes WHERE file_path = ?",
+            (file_path,),
+        ).fetchone()
+        if hit is None or hit[0] != size or hit[1] != mtime_ns:
+            return None, None
+        return (hit[3] if hit[2] == partial_kib else None), hit[4]
+
+    def put_hashes(self, file_path: str, size: int, mtime_ns: int, partial_kib: int,
+                   partial_hash: str, full_hash: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO hashes (file_path, size, mtime_ns, partial_kib, partial_hash, full_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (file_path, size, mtime_ns, partial_kib, partial_hash, full_hash),
+        )
+
+    def prune(self, root_dir: str, seen_paths: set) -> int:
+        """
+        删除 root_dir 下本次扫描未见到的缓存行（文件已被删除或移走）
+
+        Returns:
+            删除的行数
+        """
+        self.flush()
+        prefix = os.path.join(str(Path(root_dir)), "")
+        # 按主键做前缀范围查询，避免 LIKE 的转义问题
+        cached = self.conn.execute(
+            "SELECT file_path FROM files WHERE file_path >= ? AND file_path < ?",
+            (prefix, prefix + "\U0010ffff"),
+        )
+        stale = [(p,) for (p,) in cached if p not in seen_paths]
+        if stale:
+            self.conn.executemany("DELETE FROM files WHERE file_path = ?", stale)
+            self.conn.executemany("DELETE FROM hashes WHERE file_path = ?", stale)
+            self.conn.commit()
+        return len(stale)
+
+    def get_checkpoint(self, root_dir: str, options: str) -> set:
+        """
+        读取断点
+
+        Args:
+            root_dir: 音乐库根目录
+            options: 扫描参数（JSON 字符串），与写入断点时不同则视为没有断点
+
+        Returns:
+            已完整扫描的目录集合
+        """
+        row = self.conn.execute("SELECT options FROM checkpoints WHERE root_dir = ?", (root_dir,)).fetchone()
+        if row is None or row[0] != options:
+            return set()
+        dirs = self.conn.execute("SELECT dir_path FROM checkpoint_dirs WHERE root_dir = ?", (root_dir,))
+        return {dir_path for (dir_path,) in dirs}
+
+    def add_checkpoint(self, root_dir: str, options: str, dirs):
+        """把目录加入断点（扫描参数变化时先清空旧断点）"""
+        row = self.conn.execute("SELECT options FROM checkpoints WHERE root_dir = ?", (root_dir,)).fetchone()
+        if row is None or row[0] != options:
+            self.clear_checkpoint(root_dir)
+            self.conn.execute("INSERT INTO checkpoints (root_dir, options) VALUES (?, ?)", (root_dir, options))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO checkpoint_dirs (root_dir, dir_path) VALUES (?, ?)",
+            [(root_dir, dir_path) for dir_path in dirs],
+        )
+        self.conn.commit()
+
+    def clear_checkpoint(self, root_dir: str):
+        self.conn.execute("DELETE FROM checkpoints WHERE root_dir = ?", (root_dir,))
+        self.conn.execute("DELETE FROM checkpoint_dirs WHERE root_dir = ?", (root_dir,))
+        self.conn.commit()
+
+    def rows_in_dirs(self, root_dir: str, dirs: set) -> list:
+        """root_dir 下直接位于 dirs 中某个目录的缓存行（从断点恢复已扫描的部分，不访问磁盘上的文件）"""
+        self.flush()
+        prefix = os.path.join(str(Path(root_dir)), "")
+        cached = self.conn.execute(
+            "SELECT file_path, row FROM files WHERE file_path >= ? AND file_path < ?",
+            (prefix, prefix + "\U0010ffff"),
+        )
+        return [json.loads(row) for file_path, row in cached if os.path.dirname(file_path) in dirs]
+
+    def close(self):
+        self.flush()
+        self.conn.close()
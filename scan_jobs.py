@@ -0,0 +1,207 @@
+"""
+MusicAnalyzer 后台扫描任务
+扫描在后台线程中运行，界面只轮询进度；任务登记在模块级注册表中，
+Streamlit 重新运行脚本、刷新浏览器或关闭后重新打开标签页都不会中断扫描
+"""
+
+import json
+import os
+import threading
+import time
+
+from config import SCAN_CACHE
+from dir_tree import directory_tree
+from library_snapshot import auto_snapshot
+from library_store import create_library_builder
+from scan_cache import ScanCache
+from scanner import iter_scan_batches
+
+# 音乐库根目录 -> ScanJob；模块只导入一次，注册表在同一个 Streamlit 服务进程内一直存在
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class ScanJob:
+    """
+    一个音乐库根目录的后台扫描
+
+    状态：running（扫描中）→ analyzing（计算内容哈希、建立分组）→ finished；
+    cancel 后为 cancelled，resume 从断点继续；出错为 failed（也可以 resume）。
+
+    断点是已完整写入建库器的目录集合：扫描按目录顺序产出文件，某个目录的文件之后
+    出现其他目录的文件时，该目录即已完整。继续扫描时这些目录的文件不再读取，
+    中断时正在扫描的目录会重新扫描（建库器按 file_path 去重）。
+    启用扫描缓存时断点同时写入缓存数据库（按根目录和扫描参数区分），程序重启后对同一根目录
+    开始扫描会从断点继续：已完整的目录直接用缓存中的行填入建库器，不再遍历和读取。
+    """
+
+    def __init__(self, root_dir: str, options: dict = None):
+        """
+        Args:
+            root_dir: 音乐库根目录
+            options: 传给 iter_scan_batches 的参数（workers / exclude / max_depth / header_only 等）
+        """
+        self.root_dir = root_dir
+        self.options = options or {}
+        self.builder = create_library_builder(root_dir)
+        self.completed_dirs = set()  # 断点
+        self.restored_rows = 0       # 从持久化断点恢复的行数
+        self.dir_listings = {}       # 遍历时记录的目录列表，扫描结束后用于填充侧栏目录树
+        self.state = "running"
+        self.stats = None       # 本轮扫描的 iter_scan_batches 统计
+        self.preview = []       # 最新一批的行
+        self.result = None      # 扫描完成后的分析对象
+        self.interrupted = False  # 结果只包含停止前已解析的部分
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._thread = None
+
+    @property
+    def rows(self) -> int:
+        """已写入建库器的行数"""
+        return self.builder.rows
+
+    @property
+    def active(self) -> bool:
+        return self.state in ("running", "analyzing")
+
+    def _checkpoint_key(self) -> str:
+        """写入断点的扫描参数（不影响结果的并行参数除外）"""
+        options = {k: v for k, v in self.options.items() if k not in ("workers", "mode", "batch_size")}
+        return json.dumps(options, sort_keys=True, ensure_ascii=False)
+
+    def _open_checkpoint(self):
+        """断点所在的缓存数据库；不使用扫描缓存时返回 None（断点只保存在内存中）"""
+        use_cache = self.options.get("use_cache")
+        if not (SCAN_CACHE["enabled"] if use_cache is None else use_cache):
+            return None
+        return ScanCache(self.options.get("cache_path") or SCAN_CACHE["path"])
+
+    def _restore_checkpoint(self, cache):
+        """程序重启前中断的扫描：把持久化断点中目录的缓存行填入建库器"""
+        dirs = cache.get_checkpoint(self.root_dir, self._checkpoint_key())
+        if not dirs:
+            return
+        rows = cache.rows_in_dirs(self.root_dir, dirs)
+        for row in rows:
+            row["parse_bytes"] = 0  # 本次扫描没有读取该文件
+        self.builder.add(rows)
+        self.completed_dirs |= dirs
+        self.restored_rows = len(rows)
+        print(f"从断点继续扫描: {self.root_dir}，跳过 {len(dirs)} 个已完成的目录（{len(rows)} 个文件）")
+
+    def start(self):
+        self._cancel.clear()
+        self.state = "running"
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name=f"scan:{self.root_dir}", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """请求停止；当前一批处理完后生效"""
+        self._cancel.set()
+
+    def resume(self):
+        """从断点继续已停止或出错的扫描"""
+        if self.state in ("cancelled", "failed"):
+            self.start()
+
+    def finish_partial(self):
+        """不再继续，用已解析的部分建库（在调用线程中执行；只包含部分文件，不写入快照）"""
+        if self.state not in ("cancelled", "failed"):
+            return self.result
+        cache = self._open_checkpoint()
+        if cache is not None:
+            try:
+                cache.clear_checkpoint(self.root_dir)
+            finally:
+                cache.close()
+        self.state = "analyzing"
+        self.interrupted = True
+        self.result = self.builder.finish()
+        self.state = "finished"
+        self.finished_at = time.time()
+        return self.result
+
+    def _run(self):
+        current_dir = None
+        cache = None
+        try:
+            cache = self._open_checkpoint()
+            if cache is not None and not self.completed_dirs:
+                self._restore_checkpoint(cache)
+            # 断点中的目录仍会被遍历（只是不产出文件），目录列表是完整的
+            batches = iter_scan_batches(self.root_dir, skip_dirs=set(self.completed_dirs),
+                                        dir_listings=self.dir_listings, **self.options)
+            try:
+                for batch in batches:
+                    completed = set()
+                    for row in batch:
+                        row_dir = os.path.dirname(row["file_path"])
+                        if row_dir != current_dir:
+                            if current_dir is not None:
+                                completed.add(current_dir)
+                            current_dir = row_dir
+                    self.builder.add(batch)
+                    self.completed_dirs |= completed
+                    if cache is not None and completed:
+                        # 缓存在产出每批之前已落盘，断点中的目录都能从缓存恢复
+                        cache.add_checkpoint(self.root_dir, self._checkpoint_key(), completed)
+                    self.stats = batch.stats
+                    if batch:
+                        self.preview = list(batch)
+                    if self._cancel.is_set():
+                        self.state = "cancelled"
+                        return
+            finally:
+                batches.close()
+
+            self.state = "analyzing"
+            directory_tree.seed(self.dir_listings)
+            self.result = self.builder.finish()
+            # 快照在标记完成之前写入，界面采用结果时不会与备份同时使用数据库连接
+            auto_snapshot(self.result, self.root_dir)
+            self.completed_dirs.clear()
+            if cache is not None:
+                cache.clear_checkpoint(self.root_dir)
+            self.finished_at = time.time()
+            self.state = "finished"
+        except Exception as e:
+            print(f"扫描失败: {self.root_dir} -> {e}")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            if cache is not None:
+                cache.close()
+
+
+def get_scan_job(root_dir: str):
+    """根目录对应的扫描任务（包括已完成的），没有时返回 None"""
+    with _jobs_lock:
+        return _jobs.get(root_dir)
+
+
+def latest_scan_job():
+    """最近开始的扫描任务（新打开的页面据此恢复路径和结果），没有时返回 None"""
+    with _jobs_lock:
+        return max(_jobs.values(), key=lambda job: job.started_at, default=None)
+
+
+def start_scan_job(root_dir: str, **options) -> ScanJob:
+    """
+    开始扫描根目录；该目录已有进行中的扫描时直接返回它
+
+    Args:
+        root_dir: 音乐库根目录
+        options: 传给 iter_scan_batches 的参数
+    """
+    with _jobs_lock:
+        job = _jobs.get(root_dir)
+        if job is not None and job.active:
+            return job
+        job = ScanJob(root_dir, options)
+        _jobs[root_dir] = job
+    job.start()
+    return job
@@ -1,8 +1,18 @@
+import fnmatch
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from mutagen import File
 import hashlib
 import re
 
+from config import (AUDIO_HASH, CONTENT_HASH, DELETION, HEADER_ONLY, SCAN_CACHE, SCAN_PROGRESS, SCAN_WALK,
+                    SCAN_WORKERS)
+from scan_cache import ScanCache
+
 
 SUPPORTED_EXT = {".mp3", ".flac", ".wav", ".m4a", ".ogg"}
 
@@ -48,34 +58,881 @@ def sanitize_filename(filename: str) -> str:
     return sanitized
 
 
-def scan_music(root_dir: str) -> list[dict]:
-    results = []
+class ScanResult(list):
+    """
+    scan_music 的返回值：行为与 list[dict] 完全相同，额外携带扫描统计 stats
+    """
+
+    def __init__(self, rows=(), stats=None):
+        super().__init__(rows)
+        self.stats = stats or {}
+
+
+# mutagen 文件类型 -> 编码名称（MP4 使用自带的 codec_description）
+_CODEC_NAMES = {
+    "EasyMP3": "mp3",
+    "MP3": "mp3",
+    "FLAC": "flac",
+    "OggFLAC": "flac",
+    "OggVorbis": "vorbis",
+    "OggOpus": "opus",
+    "WAVE": "pcm",
+    "AIFF": "pcm",
+}
+
+
+def _first_tag(audio, key):
+    return audio.get(key, [None])[0] if audio else None
+
+
+def _parse_number(value):
+    """解析 "3" 或 "3/12" 形式的音轨号/碟号"""
+    if not value:
+        return None
+    try:
+        return int(str(value).split("/")[0])
+    except ValueError:
+        return None
+
+
+class _ReadBudgetExceeded(Exception):
+    """仅读取文件头模式下，解析所需的数据超出了单文件读取上限"""
+
+
+class _CountingFileIO(io.FileIO):
+    """
+    统计实际从磁盘读取字节数的原始文件对象（外层再套 BufferedReader 使用）
+
+    设置 budget 后，累计读取超过上限时抛出 _ReadBudgetExceeded；
+    mutagen 可能把异常包装成自己的错误类型，因此同时记录 budget_exceeded 标记。
+    """
+
+    def __init__(self, file_path, budget: int = None):
+        super().__init__(file_path, "rb")
+        self.bytes_read = 0
+        self.budget = budget
+        self.budget_exceeded = False
+
+    def _remaining(self):
+        """本次还能读取的字节数，已用完时抛出 _ReadBudgetExceeded"""
+        if self.budget is None:
+            return None
+        remaining = self.budget - self.bytes_read
+        if remaining <= 0:
+            self.budget_exceeded = True
+            raise _ReadBudgetExceeded(f"超出单文件读取上限 {self.budget} 字节")
+        return remaining
+
+    def readinto(self, buffer):
+        remaining = self._remaining()
+        if remaining is not None and len(buffer) > remaining:
+            buffer = memoryview(buffer)[:remaining]
+        n = super().readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+    def read(self, size=-1):
+        remaining = self._remaining()
+        if remaining is not None and (size < 0 or size > remaining):
+            size = remaining
+        data = super().read(size)
+        self.bytes_read += len(data or b"")
+        return data
 
-    for path in Path(root_dir).rglob("*"):
-        if path.suffix.lower() not in SUPPORTED_EXT:
+    def readall(self):
+        if self.budget is None:
+            data = super().readall()
+            self.bytes_read += len(data)
+            return data
+        chunks = []
+        while True:
+            data = self.read()
+            if not data:
+                return b"".join(chunks)
+            chunks.append(data)
+
+
+def _compile_excludes(patterns):
+    """把多个排除通配符合并成一个正则（大小写规则跟随当前系统）"""
+    patterns = [os.path.normcase(p.strip()) for p in (patterns or ()) if p and p.strip()]
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+
+def walk_music_files(root_dir: str, extensions=None, exclude=None, max_depth: int = None,
+                     follow_symlinks: bool = True, skip_dirs=None, listings: dict = None):
+    """
+    基于 os.scandir 的目录遍历，只产出扩展名受支持的音乐文件
+
+    先用原始文件名判断扩展名，不为封面、歌词等无关条目创建任何对象；
+    遍历顺序与 Path.rglob("*") 一致（先列出目录中的文件，再依次深入子目录）。
+
+    Args:
+        root_dir: 根目录
+        extensions: 扩展名集合（含点，小写），None 表示 SUPPORTED_EXT
+        exclude: 排除通配符列表，同时匹配文件/目录名和相对根目录的路径（如 "Podcasts"、"*/Live/*"）
+        max_depth: 最大目录深度，0 表示只扫描根目录，None 表示不限
+        follow_symlinks: 是否进入符号链接目录（会检测并跳过链接环）
+        skip_dirs: 不产出其中文件的目录路径集合（仍会进入其子目录），用于从断点继续扫描
+        listings: 传入字典时记录每个列出的目录 {目录路径: (修改时间, 子目录名)}，
+            子目录名与 DirectoryTree 的列目录结果一致（完整、不含隐藏目录、已排序），用于填充侧栏目录树
+
+    Yields:
+        os.DirEntry
+    """
+    extensions = tuple(extensions or SUPPORTED_EXT)
+    excluded = _compile_excludes(exclude)
+    root_dir = str(root_dir)
+    root_real = os.path.realpath(root_dir)
+    followed = set()
+
+    def is_excluded(entry, rel_path):
+        return excluded is not None and (
+            excluded.match(os.path.normcase(entry.name)) is not None
+            or excluded.match(os.path.normcase(rel_path)) is not None
+        )
+
+    # 栈中保存 (目录路径, 相对路径, 深度, 真实路径)
+    stack = [(root_dir, "", 0, root_real)]
+    while stack:
+        dir_path, rel_dir, depth, real_dir = stack.pop()
+        try:
+            # 修改时间在列目录之前取得：列目录期间目录发生变化时，目录树会因修改时间不同而重新列出
+            mtime_ns = os.stat(dir_path).st_mtime_ns if listings is not None else None
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError as e:
+            print(f"无法读取目录: {dir_path} -> {e}")
             continue
+        if listings is not None:
+            listings[dir_path] = (mtime_ns, _listed_subdirs(entries))
+
+        skip_files = skip_dirs is not None and dir_path in skip_dirs
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            rel_path = os.path.join(rel_dir, name) if rel_dir else name
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    if is_excluded(entry, rel_path):
+                        continue
+                    if entry.is_symlink():
+                        target = os.path.realpath(entry.path)
+                        # 指向自身祖先目录（链接环）或已经进入过的目标都跳过
+                        if (target in followed or real_dir == target
+                                or real_dir.startswith(os.path.join(target, ""))):
+                            continue
+                        followed.add(target)
+                        subdirs.append((entry.path, rel_path, depth + 1, target))
+                    else:
+                        subdirs.append((entry.path, rel_path, depth + 1, os.path.join(real_dir, name)))
+                    continue
+            except OSError:
+                continue
+
+            if skip_files:
+                continue
+            if name.lower().endswith(extensions) and not is_excluded(entry, rel_path):
+                yield entry
+
+        stack.extend(reversed(subdirs))
 
+
+def _listed_subdirs(entries) -> list:
+    """与 DirectoryTree 相同的子目录列表（不受 exclude / max_depth 影响）"""
+    names = []
+    for entry in entries:
         try:
-            audio = File(path, easy=True)
-            info = File(path)
-
-            duration = round(info.info.length, 2) if info and info.info else None
-            bitrate = getattr(info.info, "bitrate", None)
-            sample_rate = getattr(info.info, "sample_rate", None)
-
-            results.append({
-                "file_path": str(path),
-                "file_name": path.name,
-                "format": path.suffix.lower().replace(".", ""),
-                "title": (audio.get("title", [None])[0] if audio else None),
-                "artist": (audio.get("artist", [None])[0] if audio else None),
-                "album": (audio.get("album", [None])[0] if audio else None),
-                "duration": duration,
-                "bitrate": bitrate,
-                "sample_rate": sample_rate,
-            })
+            if not entry.name.startswith(".") and entry.is_dir():
+                names.append(entry.name)
+        except OSError:
+            continue
+    return sorted(names)
+
+
+def _read_exact(f, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
 
+def _id3v2_size(header: bytes) -> int:
+    """ID3v2 标签头（10 字节）描述的整个标签大小，不是 ID3v2 时返回 0"""
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = 0
+    for b in header[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _skip_id3v2(f, start: int, end: int) -> int:
+    """跳过 start 处连续的 ID3v2 标签，返回音频数据起点"""
+    while start + 10 <= end:
+        tag_size = _id3v2_size(_read_exact(f, start, 10))
+        if tag_size == 0:
+            break
+        start += tag_size
+    return start
+
+
+def _strip_trailing_tags(f, start: int, end: int) -> int:
+    """去掉文件尾部的 ID3v1 / Lyrics3v2 / APEv2 标签，返回音频数据终点"""
+    while True:
+        if end - start >= 128 and _read_exact(f, end - 128, 3) == b"TAG":
+            end -= 128
+            continue
+        if end - start >= 15 and _read_exact(f, end - 9, 9) == b"LYRICS200":
+            size_field = _read_exact(f, end - 15, 6)
+            if size_field.isdigit():
+                end -= int(size_field) + 15
+                continue
+        if end - start >= 32:
+            footer = _read_exact(f, end - 32, 32)
+            if footer[:8] == b"APETAGEX":
+                tag_size = int.from_bytes(footer[12:16], "little")
+                has_header = int.from_bytes(footer[20:24], "little") & 0x80000000
+                end -= tag_size + (32 if has_header else 0)
+                continue
+        return max(end, start)
+
+
+# MPEG Layer III 码率（kbps）：MPEG-1 / MPEG-2 和 2.5，按帧头的码率编号索引
+_MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# 采样率：帧头的版本编号（3 = MPEG-1，2 = MPEG-2，0 = MPEG-2.5）-> 按采样率编号索引
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_info_frame_size(f, start: int, end: int) -> int:
+    """
+    start 处的第一帧是 Xing / Info / VBRI 信息帧时返回其长度，否则返回 0
+
+    信息帧（含 LAME 扩展）由编码器或重新封装的工具写入，记录帧数、码率表、编码器版本等，
+    不含音频；同一音频用不同工具改写标签后这一帧往往不同，因此不计入音频哈希
+    """
+    header = _read_exact(f, start, 4)
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return 0
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    mono = header[3] >> 6 == 3
+    if version == 3:
+        side_info = 17 if mono else 32
+        frame_size = 144000 * _MP3_BITRATES[3][bitrate_index] // _MP3_SAMPLE_RATES[3][rate_index]
+    else:
+        side_info = 9 if mono else 17
+        frame_size = 72000 * _MP3_BITRATES[2][bitrate_index] // _MP3_SAMPLE_RATES[version][rate_index]
+    frame_size += (header[2] >> 1) & 1  # 填充字节
+    if start + frame_size > end:
+        return 0
+    if _read_exact(f, start + 4 + side_info, 4) in (b"Xing", b"Info") or _read_exact(f, start + 36, 4) == b"VBRI":
+        return frame_size
+    return 0
+
+
+def _mp3_payload(f, size: int):
+    start = _skip_id3v2(f, 0, size)
+    end = _strip_trailing_tags(f, start, size)
+    start += _mp3_info_frame_size(f, start, end)
+    return [(start, end)]
+
+
+def _flac_payload(f, size: int):
+    start = _skip_id3v2(f, 0, size)
+    if _read_exact(f, start, 4) != b"fLaC":
+        return None
+    pos = start + 4
+    while pos + 4 <= size:
+        header = _read_exact(f, pos, 4)
+        pos += 4 + int.from_bytes(header[1:4], "big")
+        if header[0] & 0x80:  # 最后一个元数据块
+            break
+    return [(pos, _strip_trailing_tags(f, pos, size))]
+
+
+def _mp4_payload(f, size: int):
+    ranges = []
+    pos = 0
+    while pos + 8 <= size:
+        header = _read_exact(f, pos, 8)
+        atom_size = int.from_bytes(header[:4], "big")
+        atom_type = header[4:8]
+        header_size = 8
+        if atom_size == 1:
+            atom_size = int.from_bytes(_read_exact(f, pos + 8, 8), "big")
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = size - pos
+        if atom_size < header_size:
+            return None
+        if atom_type == b"mdat":
+            ranges.append((pos + header_size, min(pos + atom_size, size)))
+        pos += atom_size
+    return ranges or None
+
+
+# 格式 -> 音频数据区间解析函数
+_PAYLOAD_PARSERS = {
+    "mp3": _mp3_payload,
+    "flac": _flac_payload,
+    "m4a": _mp4_payload,
+}
+
+
+def _audio_payload_hash(f, fmt: str, size: int):
+    """
+    只对音频数据计算哈希，忽略 ID3 / APE / Vorbis Comment / MP4 元数据
+
+    仅改动标签的两个文件得到相同结果；按 1 MiB 分块读取，内存占用与文件大小无关。
+    不支持的格式或无法解析时返回 None。
+    """
+    parser = _PAYLOAD_PARSERS.get(fmt)
+    if parser is None:
+        return None
+    ranges = parser(f, size)
+    if not ranges:
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    for start, end in ranges:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(remaining, 1024 * 1024))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+    return digest.hexdigest()
+
+
+# 无法在读取上限内解析时，这些字段记为未知
+_UNKNOWN_FIELDS = ("title", "artist", "album", "duration", "bitrate", "sample_rate",
+                   "bit_depth", "codec", "channels", "track_number", "disc_number")
+
+
+def _read_metadata_once(file_path: str, audio_hash: bool, budget: int = None):
+    """
+    解析一次文件
+
+    Returns:
+        (row, bytes_read)；bytes_read 含计算音频数据哈希时的读取，行的 parse_bytes 只计解析元数据的读取
+
+    Raises:
+        _ReadBudgetExceeded: 设置了 budget 且解析所需数据超出上限，args[1] 为已读取的字节数
+    """
+    file_name = os.path.basename(file_path)
+    fmt = os.path.splitext(file_name)[1].lower().replace(".", "")
+    raw = _CountingFileIO(file_path, budget)
+    with io.BufferedReader(raw) as f:
+        file_size = os.fstat(f.fileno()).st_size
+        try:
+            audio = File(f, easy=True)
         except Exception as e:
-            print(f"读取失败: {path} -> {e}")
+            if raw.budget_exceeded:
+                raise _ReadBudgetExceeded(str(e), raw.bytes_read) from e
+            raise
+        if audio is None or audio.info is None:
+            raise ValueError("无法识别的音频格式")
+        # 复用同一个文件句柄计算音频数据哈希（显式要求的哈希不受读取上限限制）
+        parse_bytes = raw.bytes_read
+        raw.budget = None
+        payload_hash = _audio_payload_hash(f, fmt, file_size) if audio_hash else None
+
+    info = audio.info
+    codec = getattr(info, "codec_description", None) or _CODEC_NAMES.get(type(audio).__name__)
+
+    row = {
+        "file_path": file_path,
+        "file_name": file_name,
+        "format": fmt,
+        "title": _first_tag(audio, "title"),
+        "artist": _first_tag(audio, "artist"),
+        "album": _first_tag(audio, "album"),
+        "duration": round(info.length, 2),
+        "bitrate": getattr(info, "bitrate", None),
+        "sample_rate": getattr(info, "sample_rate", None),
+        "bit_depth": getattr(info, "bits_per_sample", None),
+        "codec": codec,
+        "channels": getattr(info, "channels", None),
+        "track_number": _parse_number(_first_tag(audio, "tracknumber")),
+        "disc_number": _parse_number(_first_tag(audio, "discnumber")),
+        "file_size": file_size,
+        "read_mode": "header" if budget else "full",
+        "parse_bytes": parse_bytes,
+    }
+    if audio_hash:
+        row["audio_hash"] = payload_hash
+    return row, raw.bytes_read
+
+
+def _read_metadata_counted(path, audio_hash: bool = False, max_read_bytes: int = None,
+                           fallback: bool = True):
+    """
+    读取单个文件的元数据
+
+    Args:
+        path: 文件路径
+        audio_hash: 是否同时计算忽略标签的音频数据哈希（需要完整读取文件）
+        max_read_bytes: 仅读取文件头模式的单文件读取上限，None 表示完整解析
+        fallback: 超出上限时是否回退为完整解析；为 False 时元数据字段记为未知（read_mode 为 "truncated"）
 
+    Returns:
+        (row, bytes_read)，bytes_read 为本次实际读取的字节数（含超出上限前已读取的部分和音频数据哈希的读取）；
+        行的 parse_bytes 只计解析元数据的读取（含超出上限前已读取的部分）
+    """
+    file_path = str(path)
+    if not max_read_bytes:
+        return _read_metadata_once(file_path, audio_hash)
+
+    try:
+        return _read_metadata_once(file_path, audio_hash, max_read_bytes)
+    except _ReadBudgetExceeded as e:
+        spent = e.args[1] if len(e.args) > 1 else max_read_bytes
+
+    if fallback:
+        row, bytes_read = _read_metadata_once(file_path, audio_hash)
+        row["read_mode"] = "fallback"
+        row["parse_bytes"] += spent
+        return row, bytes_read + spent
+
+    file_name = os.path.basename(file_path)
+    row = {
+        "file_path": file_path,
+        "file_name": file_name,
+        "format": os.path.splitext(file_name)[1].lower().replace(".", ""),
+        **{field: None for field in _UNKNOWN_FIELDS},
+        "file_size": os.path.getsize(file_path),
+        "read_mode": "truncated",
+        "parse_bytes": spent,
+    }
+    if audio_hash:
+        row["audio_hash"] = None
+    return row, spent
+
+
+def read_metadata(path) -> dict:
+    """
+    读取单个文件的元数据，返回 scan_music 的一行
+
+    只解析一次文件：easy 模式的 mutagen 对象同时提供标签和流信息（info），
+    不再分别以 easy / 非 easy 方式各打开一次。
+    """
+    return _read_metadata_counted(path)[0]
+
+
+def _parse_file(file_path: str, options: dict = None):
+    """
+    解析单个文件，不抛出异常
+
+    Args:
+        file_path: 文件路径
+        options: _read_metadata_counted 的关键字参数（audio_hash / max_read_bytes / fallback）
+
+    Returns:
+        (row, error, bytes_read, seconds)，失败时 row 为 None、error 为错误信息
+    """
+    start = time.perf_counter()
+    try:
+        row, bytes_read = _read_metadata_counted(file_path, **(options or {}))
+        return row, None, bytes_read, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), 0, time.perf_counter() - start
+
+
+def _read_metadata_batch(paths: list, options: dict = None) -> list:
+    """在工作进程/线程中解析一批文件，返回与 paths 一一对应的 _parse_file 结果"""
+    return [_parse_file(file_path, options) for file_path in paths]
+
+
+def _create_executor(workers: int, mode: str):
+    if workers <= 1:
+        return None
+    if mode == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _new_stats() -> dict:
+    return {
+        "files_seen": 0,      # 遍历到的音乐文件数
+        "files_parsed": 0,    # 成功解析的文件数
+        "files_failed": 0,    # 解析失败的文件数
+        "bytes_read": 0,      # 解析（含音频数据哈希）时实际读取的字节数
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "cache_removed": 0,
+        "header_fallbacks": 0,  # 仅读取文件头模式下超出上限、回退为完整解析的文件数
+        "header_truncated": 0,  # 仅读取文件头模式下超出上限、元数据记为未知的文件数
+        "walk_time": 0.0,     # 遍历目录和 stat 的耗时（秒）
+        "parse_time": 0.0,    # 解析元数据的耗时（秒，并行时为各工作进程耗时之和）
+        "elapsed": 0.0,       # 总耗时（秒）
+    }
+
+
+def _scan_rows(root_dir: str, cache, stats: dict, seen: set, workers: int, mode: str,
+               walk_options: dict, parse_options: dict):
+    """
+    按遍历顺序逐行产出扫描结果
+
+    缓存未命中的文件按批提交到进程池/线程池，已提交的任务放在有界窗口中按提交顺序取回，
+    因此并行模式下的输出顺序与串行模式完全一致。
+    """
+    executor = _create_executor(workers, mode)
+    batch_size = SCAN_WORKERS["batch_size"]
+    max_pending = max(workers, 1) * 4
+    window = deque()
+    misses = []
+    pending_tasks = 0
+
+    def submit_misses():
+        nonlocal misses, pending_tasks
+        if misses:
+            paths = [file_path for file_path, _ in misses]
+            window.append(("task", executor.submit(_read_metadata_batch, paths, parse_options), misses))
+            pending_tasks += 1
+            misses = []
+
+    def collect(file_path, st, result):
+        """记录一个解析结果，成功时返回行，失败时返回 None"""
+        row, error, bytes_read, seconds = result
+        stats["bytes_read"] += bytes_read
+        stats["parse_time"] += seconds
+        if row is None:
+            stats["files_failed"] += 1
+            print(f"读取失败: {file_path} -> {error}")
+            return None
+        stats["files_parsed"] += 1
+        if row["read_mode"] == "fallback":
+            stats["header_fallbacks"] += 1
+        elif row["read_mode"] == "truncated":
+            stats["header_truncated"] += 1
+        if cache is not None:
+            cache.put(file_path, st.st_size, st.st_mtime_ns, row)
+        return row
+
+    def drain(entry):
+        nonlocal pending_tasks
+        kind, payload, batch = entry
+        if kind == "row":
+            yield payload
+            return
+        pending_tasks -= 1
+        for (file_path, st), result in zip(batch, payload.result()):
+            row = collect(file_path, st, result)
+            if row is not None:
+                yield row
+
+    walker = walk_music_files(root_dir, **walk_options)
+    try:
+        while True:
+            walk_start = time.perf_counter()
+            entry = next(walker, None)
+            if entry is None:
+                stats["walk_time"] += time.perf_counter() - walk_start
+                break
+
+            stats["files_seen"] += 1
+            file_path = entry.path
+            st = None
+            try:
+                if cache is not None:
+                    st = entry.stat()
+                    seen.add(file_path)
+                    stats["walk_time"] += time.perf_counter() - walk_start
+                    row = cache.get(file_path, st.st_size, st.st_mtime_ns)
+                    if row is not None and not _cached_row_usable(row, parse_options):
+                        row = None
+                    if row is not None:
+                        stats["cache_hits"] += 1
+                        row["parse_bytes"] = 0  # 本次扫描没有读取该文件
+                        if executor is None:
+                            yield row
+                        else:
+                            submit_misses()
+                            window.append(("row", row, None))
+                        continue
+                else:
+                    stats["walk_time"] += time.perf_counter() - walk_start
+            except Exception as e:
+                print(f"读取失败: {file_path} -> {e}")
+                continue
+
+            stats["cache_misses"] += 1
+            if executor is None:
+                row = collect(file_path, st, _parse_file(file_path, parse_options))
+                if row is not None:
+                    yield row
+                continue
+
+            misses.append((file_path, st))
+            if len(misses) >= batch_size:
+                submit_misses()
+            while pending_tasks > max_pending:
+                yield from drain(window.popleft())
+
+        if executor is not None:
+            submit_misses()
+            while window:
+                yield from drain(window.popleft())
+    finally:
+        walker.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _cached_row_usable(row: dict, parse_options: dict) -> bool:
+    """判断缓存行能否满足本次扫描的解析要求"""
+    # 缓存行是在未开启音频哈希时写入的
+    if parse_options["audio_hash"] and "audio_hash" not in row:
+        return False
+    # 上次超出读取上限未解析完整，本次不再接受未知字段
+    if row.get("read_mode") == "truncated":
+        return bool(parse_options["max_read_bytes"]) and not parse_options["fallback"]
+    return True
+
+
+def _walk_options(exclude, max_depth) -> dict:
+    exclude = SCAN_WALK["exclude"] if exclude is None else exclude
+    return {
+        # 隔离模式的回收目录不参与扫描
+        "exclude": [*exclude, DELETION["trash_dir"]],
+        "max_depth": SCAN_WALK["max_depth"] if max_depth is None else max_depth,
+        "follow_symlinks": SCAN_WALK["follow_symlinks"],
+    }
+
+
+def iter_scan_batches(root_dir: str, batch_size: int = None, use_cache: bool = None,
+                      cache_path: str = None, workers: int = None, mode: str = None,
+                      exclude: list = None, max_depth: int = None, audio_hash: bool = None,
+                      header_only: bool = None, skip_dirs=None, dir_listings: dict = None):
+    """
+    流式扫描音乐目录，按固定大小分批产出结果
+
+    每批是一个 ScanResult，stats 为截至该批的累计统计。中途停止迭代时，
+    已解析的文件仍会写入缓存；只有完整遍历（且没有跳过任何目录）后才会清理缓存中已删除的文件。
+
+    Args:
+        root_dir: 音乐库根目录
+        batch_size: 每批的行数，None 表示使用 config.SCAN_PROGRESS
+        skip_dirs: 已扫描过的目录（断点），其中的文件不再产出，见 walk_music_files
+        dir_listings: 传入字典时记录遍历到的每个目录的子目录列表，见 walk_music_files 的 listings
+        其余参数同 scan_music
+
+    Yields:
+        ScanResult（最后一批可能不足 batch_size，也可能为空）
+    """
+    if batch_size is None:
+        batch_size = SCAN_PROGRESS["batch_size"]
+    if use_cache is None:
+        use_cache = SCAN_CACHE["enabled"]
+    if workers is None:
+        workers = SCAN_WORKERS["workers"]
+    if mode is None:
+        mode = SCAN_WORKERS["mode"]
+    if audio_hash is None:
+        audio_hash = AUDIO_HASH["enabled"]
+    if header_only is None:
+        header_only = HEADER_ONLY["enabled"]
+    parse_options = {
+        "audio_hash": audio_hash,
+        "max_read_bytes": HEADER_ONLY["max_read_kib"] * 1024 if header_only else None,
+        "fallback": HEADER_ONLY["fallback"],
+    }
+    cache = ScanCache(cache_path or SCAN_CACHE["path"]) if use_cache else None
+
+    stats = _new_stats()
+    seen = set()
+    batch = []
+    start = time.perf_counter()
+
+    try:
+        walk_options = dict(_walk_options(exclude, max_depth), skip_dirs=skip_dirs, listings=dir_listings)
+        for row in _scan_rows(root_dir, cache, stats, seen, workers, mode, walk_options, parse_options):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                if cache is not None:
+                    cache.flush()
+                stats["elapsed"] = time.perf_counter() - start
+                yield ScanResult(batch, dict(stats))
+                batch = []
+
+        if cache is not None and not skip_dirs:
+            stats["cache_removed"] = cache.prune(root_dir, seen)
+        stats["elapsed"] = time.perf_counter() - start
+        yield ScanResult(batch, dict(stats))
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def scan_music(root_dir: str, use_cache: bool = None, cache_path: str = None,
+               workers: int = None, mode: str = None,
+               exclude: list = None, max_depth: int = None, audio_hash: bool = None,
+               header_only: bool = None) -> ScanResult:
+    """
+    递归扫描音乐目录
+
+    Args:
+        root_dir: 音乐库根目录
+        use_cache: 是否使用元数据缓存，None 表示按 config.SCAN_CACHE 决定
+        cache_path: 缓存数据库路径，None 表示使用 config.SCAN_CACHE 中的默认路径
+        workers: 并行解析的进程/线程数，1 为串行，None 表示使用 config.SCAN_WORKERS
+        mode: "process" 或 "thread"，None 表示使用 config.SCAN_WORKERS
+        exclude: 排除通配符列表，None 表示使用 config.SCAN_WALK
+        max_depth: 最大目录深度，None 表示使用 config.SCAN_WALK
+        audio_hash: 是否计算忽略标签的音频数据哈希（audio_hash 列），None 表示使用 config.AUDIO_HASH
+        header_only: 仅读取文件头模式（限制单文件读取量，适合网络磁盘），None 表示使用 config.HEADER_ONLY
+
+    Returns:
+        ScanResult，stats 中包含 files_seen / files_parsed / files_failed / bytes_read /
+        cache_hits / cache_misses / cache_removed / header_fallbacks / header_truncated /
+        walk_time / parse_time / elapsed；每行的 parse_bytes 为本次扫描解析该文件时读取的字节数（缓存命中为 0）；
+        启用 config.CONTENT_HASH 时每行带 content_hash（字节完全相同的文件哈希相同），
+        stats 另含 compute_content_hashes 的统计
+    """
+    results = ScanResult()
+    for batch in iter_scan_batches(root_dir, use_cache=use_cache, cache_path=cache_path,
+                                   workers=workers, mode=mode, exclude=exclude, max_depth=max_depth,
+                                   audio_hash=audio_hash, header_only=header_only):
+        results.extend(batch)
+        results.stats = batch.stats
+
+    if CONTENT_HASH["enabled"]:
+        hashes, hash_stats = compute_content_hashes(
+            ((row["file_path"], row["file_size"]) for row in results),
+            use_cache=use_cache, cache_path=cache_path,
+        )
+        for row in results:
+            row["content_hash"] = hashes.get(row["file_path"])
+        results.stats.update(hash_stats)
     return results
+
+
+def _partial_hash(file_path: str, size: int, chunk: int):
+    """
+    对文件首尾各 chunk 字节计算哈希；文件不超过 2 * chunk 时读取整个文件
+
+    Returns:
+        (hash, bytes_read)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        if size <= 2 * chunk:
+            data = f.read()
+            digest.update(data)
+            return digest.hexdigest(), len(data)
+        head = f.read(chunk)
+        f.seek(size - chunk)
+        tail = f.read(chunk)
+    digest.update(head)
+    digest.update(tail)
+    return digest.hexdigest(), len(head) + len(tail)
+
+
+def _full_hash(file_path: str):
+    """流式计算整个文件的哈希，返回 (hash, bytes_read)"""
+    digest = hashlib.blake2b(digest_size=16)
+    bytes_read = 0
+    with open(file_path, "rb") as f:
+        while True:
+            data = f.read(1024 * 1024)
+            if not data:
+                break
+            digest.update(data)
+            bytes_read += len(data)
+    return digest.hexdigest(), bytes_read
+
+
+def compute_content_hashes(files, use_cache: bool = None, cache_path: str = None,
+                           partial_kib: int = None):
+    """
+    分阶段找出字节完全相同的文件
+
+    1. 按文件大小分组，大小唯一的文件不可能重复，不读取
+    2. 大小相同的文件只读取首尾各 partial_kib KiB 计算部分哈希
+    3. 部分哈希仍然相同的文件才完整读取计算全文哈希（小文件第 2 步已读完整，直接复用）
+
+    Args:
+        files: (file_path, file_size) 的可迭代对象
+        use_cache / cache_path: 同 scan_music，哈希按 (路径, 大小, 修改时间) 缓存
+        partial_kib: 首尾读取的 KiB 数，None 表示使用 config.CONTENT_HASH
+
+    Returns:
+        (hashes, stats)：hashes 为 {file_path: 全文哈希}，只包含经过第 3 步的文件；
+        stats 包含 hash_candidates / hash_partial / hash_full / hash_bytes
+    """
+    if use_cache is None:
+        use_cache = SCAN_CACHE["enabled"]
+    if partial_kib is None:
+        partial_kib = CONTENT_HASH["partial_kib"]
+    chunk = partial_kib * 1024
+    stats = {"hash_candidates": 0, "hash_partial": 0, "hash_full": 0, "hash_bytes": 0}
+    hashes = {}
+
+    by_size = {}
+    for file_path, size in files:
+        if size is None:
+            continue
+        by_size.setdefault(int(size), []).append(file_path)
+    candidates = [(size, paths) for size, paths in by_size.items() if len(paths) > 1]
+    if not candidates:
+        return hashes, stats
+
+    cache = ScanCache(cache_path or SCAN_CACHE["path"]) if use_cache else None
+    try:
+        for size, paths in candidates:
+            stats["hash_candidates"] += len(paths)
+
+            # 第 2 步：首尾部分哈希
+            by_partial = {}
+            for file_path in paths:
+                try:
+                    mtime_ns = os.stat(file_path).st_mtime_ns
+                    partial, full = (cache.get_hashes(file_path, size, mtime_ns, partial_kib) if cache
+                                     else (None, None))
+                    if partial is None:
+                        partial, bytes_read = _partial_hash(file_path, size, chunk)
+                        stats["hash_partial"] += 1
+                        stats["hash_bytes"] += bytes_read
+                        if cache is not None:
+                            # 全文哈希与首尾读取量无关，仍然保留
+                            cache.put_hashes(file_path, size, mtime_ns, partial_kib, partial, full)
+                except OSError as e:
+                    print(f"哈希失败: {file_path} -> {e}")
+                    continue
+                by_partial.setdefault(partial, []).append((file_path, mtime_ns, full))
+
+            # 第 3 步：部分哈希冲突的文件计算全文哈希
+            for partial, group in by_partial.items():
+                if len(group) < 2:
+                    continue
+                for file_path, mtime_ns, full in group:
+                    if full is None:
+                        if size <= 2 * chunk:
+                            full = partial  # 本次的部分哈希读取了整个文件
+                        else:
+                            try:
+                                full, bytes_read = _full_hash(file_path)
+                            except OSError as e:
+                                print(f"哈希失败: {file_path} -> {e}")
+                                continue
+                            stats["hash_full"] += 1
+                            stats["hash_bytes"] += bytes_read
+                        if cache is not None:
+                            cache.put_hashes(file_path, size, mtime_ns, partial_kib, partial, full)
+                    hashes[file_path] = full
+    finally:
+        if cache is not None:
+            cache.close()
+
+    return hashes, stats
@@ -0,0 +1,351 @@
+"""
+MusicAnalyzer 音乐库搜索
+每个音乐库版本建立一次倒排索引，之后每次输入都只做有序数组上的查找，不再逐行 str.contains：
+
+- 文本：标题、艺术家、专辑、文件名按字符 n-gram（默认二元组）建立 n-gram → 取值编号 的倒排表。
+  中日韩文本没有空格分词，按字符切分后“周杰伦”也能用“杰伦”搜到；
+  艺术家、专辑大量重复，索引建立在去重后的取值上，再按每行的取值编号展开为行
+- 范围：码率、采样率、时长各保存一份按值排序的行号，区间查询是两次二分查找
+- 格式：按格式编号筛选
+"""
+
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from config import SEARCH
+
+# 参与全文搜索的列
+TEXT_COLUMNS = ("title", "artist", "album", "file_name")
+
+# 支持区间筛选的数值列
+RANGE_COLUMNS = ("bitrate", "sample_rate", "duration")
+
+_MAX_NGRAM = 3
+
+
+def normalize_text(text) -> str:
+    """
+    搜索用的规范化：NFKC（全角字母数字转半角）后 casefold（不区分大小写）
+    """
+    return unicodedata.normalize("NFKC", str(text)).casefold()
+
+
+def _normalize_all(values) -> list:
+    """对一组取值做 normalize_text：拼接后整体规范化一次，再按分隔符拆开"""
+    values = [str(value) for value in values]
+    joined = "\0".join(values)
+    if joined.count("\0") == len(values) - 1:
+        parts = normalize_text(joined).split("\0")
+        if len(parts) == len(values):
+            return parts
+    return [normalize_text(value) for value in values]  # 取值本身含分隔符
+
+
+def _codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+
+
+class _TextColumn:
+    """
+    一列的倒排索引：n-gram → 包含它的取值编号（升序）
+
+    字符先映射为本列字母表中的编号，n 个字符的编号按 len(字母表) 进制组成 n-gram 编码，
+    再与取值编号合成一个 int64 一起排序去重，每个 n-gram 的取值编号是一段连续的升序切片
+    """
+
+    def __init__(self, codes: np.ndarray, uniques, n: int):
+        """
+        Args:
+            codes: 每行的取值编号（pd.factorize 的结果），缺失为 -1
+            uniques: 编号对应的取值
+            n: n-gram 长度
+        """
+        self.codes = codes
+        self.values = np.array(_normalize_all(uniques), dtype=object)
+        self.n = n
+
+        n_values = len(self.values)
+        lengths = np.fromiter(map(len, self.values), dtype=np.int64, count=n_values)
+        codepoints = _codepoints("".join(self.values))
+        counts = np.bincount(codepoints)
+        self.alphabet = np.flatnonzero(counts).astype(codepoints.dtype)
+        char_ids = np.zeros(len(counts), dtype=np.int32)
+        char_ids[self.alphabet] = np.arange(len(self.alphabet))
+        chars = char_ids[codepoints]
+        del codepoints, counts, char_ids
+        self.base = len(self.alphabet) + 1  # 编号 len(alphabet) 留给查询中字母表外的字符
+
+        # 每个起点的 n 个字符编码为一个整数，跨越两个取值的起点丢弃
+        owners = np.repeat(np.arange(n_values, dtype=np.int32), lengths)
+        m = max(len(chars) - n + 1, 0)
+        keys = np.zeros(m, dtype=np.int64)
+        for k in range(n):
+            keys *= self.base
+            keys += chars[k:k + m]
+        valid = owners[n - 1:] == owners[:m]
+        keys, owners = keys[valid], owners[:m][valid]
+        del valid
+
+        if self.base ** n * max(n_values, 1) < 2 ** 63:
+            pairs = keys * n_values + owners
+            del keys, owners
+            pairs.sort()
+            distinct = np.ones(len(pairs), dtype=bool)
+            distinct[1:] = pairs[1:] != pairs[:-1]
+            pairs = pairs[distinct]
+            keys, owners = pairs // n_values, (pairs % n_values).astype(np.int32)
+            del pairs
+        else:
+            # 字母表很大时两者合不进一个 int64，分别排序
+            order = np.lexsort((owners, keys))
+            keys, owners = keys[order], owners[order]
+            distinct = np.ones(len(keys), dtype=bool)
+            distinct[1:] = (keys[1:] != keys[:-1]) | (owners[1:] != owners[:-1])
+            keys, owners = keys[distinct], owners[distinct]
+        # keys 已排序，每个 n-gram 第一次出现的位置即其倒排表的起点
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        self.starts = np.flatnonzero(first)
+        self.grams = keys[self.starts]
+        self.ends = np.append(self.starts[1:], len(keys))
+        self.postings = owners
+
+        # 每个取值末尾不足一个 n-gram 的 n-1 个字符（不够长时左侧补 -1），用于比 n 短的查询词
+        ends = np.cumsum(lengths)
+        self.tails = np.full((n_values, n - 1), -1, dtype=np.int32)
+        for j in range(n - 1):
+            position = ends - (n - 1) + j
+            inside = position >= ends - lengths
+            self.tails[inside, j] = chars[position[inside]]
+
+    def _encode(self, term: str) -> np.ndarray:
+        """查询词的字符编号；不在字母表中的字符编号为 len(alphabet)，不会匹配任何取值"""
+        codepoints = _codepoints(term)
+        chars = np.searchsorted(self.alphabet, codepoints)
+        chars[self.alphabet[np.minimum(chars, len(self.alphabet) - 1)] != codepoints] = len(self.alphabet)
+        return chars.astype(np.int64)
+
+    def _slice(self, low, high) -> np.ndarray:
+        """n-gram 编码在 [low, high) 内的倒排表（拼接，可能有重复的取值编号）"""
+        start, end = np.searchsorted(self.grams, [low, high])
+        if start == end:
+            return self.postings[:0]
+        return self.postings[self.starts[start]:self.ends[end - 1]]
+
+    def match_values(self, term: str) -> np.ndarray:
+        """包含 term（已规范化）的取值编号（升序）"""
+        if not len(self.alphabet):
+            return np.empty(0, dtype=np.int32)
+        chars = self._encode(term)
+        if len(chars) < self.n:
+            # 词比 n-gram 短：以它开头的 n-gram 是编码连续的一段，取值末尾的出现再查 tails
+            prefix = 0
+            for char in chars:
+                prefix = prefix * self.base + int(char)
+            scale = self.base ** (self.n - len(chars))
+            found = np.zeros(len(self.values), dtype=bool)
+            found[self._slice(prefix * scale, (prefix + 1) * scale)] = True
+            for j in range(self.n - len(chars)):
+                found |= (self.tails[:, j:j + len(chars)] == chars).all(axis=1)
+            return np.flatnonzero(found)
+
+        keys = np.zeros(len(chars) - self.n + 1, dtype=np.int64)
+        for k in range(self.n):
+            keys = keys * self.base + chars[k:k + len(keys)]
+        postings = sorted((self._slice(key, key + 1) for key in np.unique(keys)), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        if len(chars) == self.n or len(candidates) == 0:
+            return candidates
+        # 各 n-gram 都出现不代表它们连续出现，候选取值再确认一次
+        return candidates[[term in value for value in self.values[candidates]]]
+
+    def row_mask(self, value_ids: np.ndarray) -> np.ndarray:
+        lookup = np.zeros(len(self.values) + 1, dtype=bool)
+        lookup[value_ids] = True
+        # 缺失值的编号 -1 正好取到末尾的 False
+        return lookup[self.codes]
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    """数值列转为 float64，缺失或无法解析为 NaN"""
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+class _Factorizer:
+    """
+    分批 factorize：取值编号按第一次出现的顺序分配，拼接后与对整列调用 pd.factorize 的结果相同
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.parts = []
+
+    def add(self, series: pd.Series):
+        codes, uniques = pd.factorize(series)
+        lookup = np.fromiter((self.ids.setdefault(value, len(self.ids)) for value in uniques),
+                             dtype=np.int32, count=len(uniques))
+        # 缺失值的编号 -1 正好取到末尾补上的 -1
+        self.parts.append(np.append(lookup, -1)[codes])
+
+    def result(self):
+        """(每行的取值编号, 取值列表)"""
+        codes = np.concatenate(self.parts) if self.parts else np.empty(0, dtype=np.int32)
+        return codes, list(self.ids)
+
+
+class _RangeColumn:
+    """按值排序的行号，缺失值不参与"""
+
+    def __init__(self, values: np.ndarray):
+        present = np.flatnonzero(~np.isnan(values))
+        self.order = present[np.argsort(values[present], kind="stable")]
+        self.sorted = values[self.order]
+
+    def bounds(self):
+        """(最小值, 最大值)，没有取值时为 None"""
+        if len(self.sorted) == 0:
+            return None
+        return self.sorted[0], self.sorted[-1]
+
+    def positions(self, low=None, high=None) -> np.ndarray:
+        """取值在 [low, high] 内的行号（None 表示不限）"""
+        start = 0 if low is None else np.searchsorted(self.sorted, low, side="left")
+        end = len(self.sorted) if high is None else np.searchsorted(self.sorted, high, side="right")
+        return self.order[start:end]
+
+
+class SearchIndex:
+    """
+    音乐库的全文和区间索引
+
+    建立后只读，可以在多次查询（以及 Streamlit 的多次重新运行）之间共享
+    """
+
+    def __init__(self, df: pd.DataFrame, row_ids=None, ngram: int = None):
+        """
+        Args:
+            df: 音乐库数据框，至少包含 TEXT_COLUMNS / RANGE_COLUMNS / format 中的部分列
+            row_ids: 每行对应的行号（search 的返回值），None 表示数据框中的位置
+            ngram: n-gram 长度（1~3），None 表示使用 config.SEARCH
+        """
+        start = time.perf_counter()
+        self.ngram = SEARCH["ngram"] if ngram is None else ngram
+        if not 1 <= self.ngram <= _MAX_NGRAM:
+            raise ValueError(f"ngram 必须在 1~{_MAX_NGRAM} 之间: {self.ngram}")
+        self.n_rows = len(df)
+        self.row_ids = np.arange(len(df)) if row_ids is None else np.asarray(row_ids)
+        self.text = {col: _TextColumn(*pd.factorize(df[col]), self.ngram) for col in TEXT_COLUMNS if col in df.columns}
+        self.ranges = {col: _RangeColumn(_numeric(df[col])) for col in RANGE_COLUMNS if col in df.columns}
+        if "format" in df.columns:
+            self.format_codes, formats = pd.factorize(df["format"], sort=True)
+            self.formats = [str(fmt) for fmt in formats]
+        else:
+            self.format_codes, self.formats = np.full(len(df), -1), []
+        self.build_time = time.perf_counter() - start
+
+    @classmethod
+    def from_chunks(cls, chunks, ngram: int = None) -> "SearchIndex":
+        """
+        分批建立索引（如从数据库逐批读取），不需要一次读入整个音乐库的文本列；
+        每批只保留取值编号，结果与对拼接后的数据框建立的索引相同
+
+        Args:
+            chunks: 数据框的迭代器，每批包含 row_id 列（search 的返回值）以及索引用到的列
+            ngram: 同 __init__
+        """
+        start = time.perf_counter()
+        row_ids, text, ranges, formats = [], {}, {}, None
+        for chunk in chunks:
+            row_ids.append(chunk["row_id"].to_numpy())
+            for col in TEXT_COLUMNS:
+                if col in chunk.columns:
+                    text.setdefault(col, _Factorizer()).add(chunk[col])
+            for col in RANGE_COLUMNS:
+                if col in chunk.columns:
+                    ranges.setdefault(col, []).append(_numeric(chunk[col]))
+            if "format" in chunk.columns:
+                if formats is None:
+                    formats = _Factorizer()
+                formats.add(chunk["format"])
+
+        index = cls(pd.DataFrame(), ngram=ngram)
+        index.row_ids = np.concatenate(row_ids) if row_ids else np.empty(0, dtype=np.int64)
+        index.n_rows = len(index.row_ids)
+        for col in [col for col in TEXT_COLUMNS if col in text]:
+            # 逐列建立，建好一列就释放该列的原始取值
+            index.text[col] = _TextColumn(*text.pop(col).result(), index.ngram)
+        index.ranges = {col: _RangeColumn(np.concatenate(parts)) for col, parts in ranges.items()}
+        if formats is not None:
+            codes, values = formats.result()
+            # 与 pd.factorize(sort=True) 一致：格式编号按取值排序
+            order = sorted(range(len(values)), key=values.__getitem__)
+            rank = np.empty(len(values) + 1, dtype=np.intp)
+            rank[order] = np.arange(len(values))
+            rank[-1] = -1
+            index.format_codes = rank[codes]
+            index.formats = [str(values[i]) for i in order]
+        else:
+            index.format_codes = np.full(index.n_rows, -1)
+        index.build_time = time.perf_counter() - start
+        return index
+
+    def __len__(self):
+        return self.n_rows
+
+    def bounds(self, column: str):
+        """数值列的 (最小值, 最大值)，没有该列或没有取值时为 None"""
+        return self.ranges[column].bounds() if column in self.ranges else None
+
+    def text_mask(self, query: str, columns=None) -> np.ndarray:
+        """
+        文本条件的行掩码：按空白分成多个词，每个词都要出现在某一列中（子串匹配，不区分大小写）
+
+        Args:
+            query: 搜索文本，为空时返回 None（不限）
+            columns: 搜索的列，None 表示全部 TEXT_COLUMNS
+        """
+        terms = normalize_text(query).split()
+        if not terms:
+            return None
+        columns = [self.text[col] for col in (columns or self.text) if col in self.text]
+        mask = None
+        for term in terms:
+            term_mask = np.zeros(self.n_rows, dtype=bool)
+            for column in columns:
+                term_mask |= column.row_mask(column.match_values(term))
+            mask = term_mask if mask is None else mask & term_mask
+        return mask
+
+    def search(self, query: str = "", formats=None, ranges: dict = None, columns=None) -> np.ndarray:
+        """
+        查询满足全部条件的行
+
+        Args:
+            query: 搜索文本（见 text_mask）
+            formats: 只保留这些格式，None 表示不限
+            ranges: {列名: (下限, 上限)}，上下限为 None 表示不限；有区间条件时该列缺失的行不匹配
+            columns: 文本搜索的列，None 表示全部
+
+        Returns:
+            匹配行的行号（row_ids 中的值，按原始顺序）
+        """
+        mask = self.text_mask(query, columns)
+        for column, (low, high) in (ranges or {}).items():
+            range_mask = np.zeros(self.n_rows, dtype=bool)
+            range_mask[self.ranges[column].positions(low, high)] = True
+            mask = range_mask if mask is None else mask & range_mask
+        if formats is not None:
+            lookup = np.zeros(len(self.formats) + 1, dtype=bool)
+            lookup[[self.formats.index(fmt) for fmt in formats if fmt in self.formats]] = True
+            format_mask = lookup[self.format_codes]
+            mask = format_mask if mask is None else mask & format_mask
+        if mask is None:
+            return self.row_ids
+        return self.row_ids[np.flatnonzero(mask)]
@@ -0,0 +1,143 @@
+"""测试和基准测试共用的模拟音乐库数据（与 scan_music / 下载清单的输出结构相同）"""
+
+import random
+
+import pandas as pd
+
+
+def synthetic_rows(n_rows: int, seed: int = 0) -> list:
+    """
+    生成与 scan_music 输出结构相同的模拟音乐库
+
+    约 1/4 的歌曲有多个版本（不同格式或重复副本），约 2% 的文件缺少标签
+    """
+    rng = random.Random(seed)
+    formats = ["mp3", "mp3", "mp3", "flac", "flac", "m4a", "wav", "ogg"]
+    bitrates = {"mp3": 320000, "flac": 900000, "m4a": 256000, "wav": 1411200, "ogg": 192000}
+    artists = [f"Artist {i}" for i in range(max(n_rows // 200, 1))]
+    rows = []
+    song = 0
+    while len(rows) < n_rows:
+        song += 1
+        artist = rng.choice(artists)
+        album = f"{artist} Album {rng.randint(1, 10)}"
+        title = f"Song {song}"
+        duration = round(rng.uniform(120, 400), 2)
+        copies = 1 if rng.random() < 0.75 else rng.randint(2, 4)
+        for copy in range(copies):
+            fmt = rng.choice(formats)
+            untagged = rng.random() < 0.02
+            file_name = f"{title} ({copy}).{fmt}"
+            rows.append({
+                "file_path": f"/music/{artist}/{album}/{file_name}",
+                "file_name": file_name,
+                "format": fmt,
+                "title": None if untagged else title,
+                "artist": None if untagged else artist,
+                "album": None if untagged else album,
+                "duration": duration + (0.01 * copy if fmt != "flac" else 0),
+                "bitrate": bitrates[fmt],
+                "sample_rate": rng.choice([44100, 48000, 96000]) if fmt == "flac" else 44100,
+                "bit_depth": 16 if fmt in ("flac", "wav") else None,
+                "codec": fmt,
+                "channels": 2,
+                "track_number": rng.randint(1, 15),
+                "disc_number": None,
+                "file_size": int(duration * bitrates[fmt] / 8),
+                "read_mode": "full",
+                "parse_bytes": 24576,
+            })
+            if len(rows) >= n_rows:
+                break
+    return rows
+
+
+_SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "tu", "ve", "no", "di", "shan", "yu", "el", "ar", "bo", "qi",
+              "mon", "ta", "ri", "zen", "fa", "lu", "or", "pe", "xi", "han", "ko", "li", "ma", "ne", "su",
+              "gra", "dor", "vin", "tho", "bel", "cas", "ium", "nor", "wen", "pla", "sky", "run", "fel", "ost",
+              "jun", "dre", "mar", "ly", "ing", "way", "ce", "ton", "ber", "ish", "ga", "ho", "que", "zi"]
+_HANZI = ("晴天雨夜星月光风花雪海山河心梦爱你我他她的了在是不有人时年回忆远方故乡青春岁"
+          "红蓝白黑金银城市街灯路口桥边窗外歌声笑泪别离相逢等待温柔自由孤单快乐永远明日昨")
+
+
+def fuzzy_rows(n_rows: int, seed: int = 0) -> list:
+    """
+    在 synthetic_rows 的基础上换成随机词组成的标题（约 1/5 为中文），
+    并给部分副本加上模糊差异：版本标记、拼写错误、多艺术家写法、时长跨越取整边界。
+    file_name 中的 "Song N" 保留为真实的歌曲编号，用于统计召回率
+    """
+    rng = random.Random(seed)
+    rows = synthetic_rows(n_rows, seed)
+    titles = {}
+    for row in rows:
+        if row["title"] is None:
+            continue
+        song = row["file_name"].split(" (")[0]
+        if song not in titles:
+            if rng.random() < 0.2:
+                titles[song] = "".join(rng.choice(_HANZI) for _ in range(rng.randint(2, 6)))
+            else:
+                titles[song] = " ".join("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+                                        for _ in range(rng.randint(1, 4)))
+        title = titles[song]
+        if not row["file_name"].endswith(").flac") and " (0)." not in row["file_name"]:
+            variant = rng.random()
+            if variant < 0.1:
+                title += rng.choice([" (Live)", " (Remastered)", " - 伴奏版"])
+            elif variant < 0.2 and len(title) > 4:
+                cut = rng.randrange(1, len(title) - 1)
+                title = title[:cut] + title[cut + 1:]
+            elif variant < 0.3:
+                row["artist"] = f"{row['artist']}; Guest {rng.randint(1, 50)}"
+            elif variant < 0.4:
+                row["duration"] = round(row["duration"] + rng.choice([-0.6, 0.6]), 2)
+        row["title"] = title
+    return rows
+
+
+def search_queries(df: pd.DataFrame, n_queries: int, seed: int = 0) -> list:
+    """随机查询：标题片段（含中文）、单字、艺术家 + 标题的组合词，约一半附带格式 / 区间条件"""
+    rng = random.Random(seed)
+    titles = df["title"].dropna().astype(str).tolist()
+    artists = df["artist"].dropna().astype(str).tolist()
+    queries = []
+    for _ in range(n_queries):
+        title = rng.choice(titles)
+        start = rng.randrange(len(title))
+        kind = rng.random()
+        if kind < 0.1:
+            text = title[start]
+        elif kind < 0.7:
+            text = title[start:start + rng.randint(2, 6)]
+        else:
+            text = f"{rng.choice(artists).split()[-1]} {title[start:start + 3]}"
+        formats = rng.choice([None, None, ["flac"], ["mp3", "m4a"]])
+        ranges = rng.choice([{}, {}, {"bitrate": (300000, None)}, {"duration": (180, 240)}])
+        queries.append((text, formats, ranges))
+    return queries
+
+
+def upgrade_lists(n_rows: int, seed: int = 0) -> dict:
+    """与 DownloadListGenerator 两份清单结构相同的模拟数据（共 n_rows 行，约 2/3 为仅 MP3）"""
+    rng = random.Random(seed)
+    n_mp3 = n_rows * 2 // 3
+    mp3 = pd.DataFrame({
+        "song_key": [f"song {i}|artist {i % 997}|{200 + i % 150}" for i in range(n_mp3)],
+        "title": [f"Song {i}" if i % 5 else "".join(rng.choice(_HANZI) for _ in range(4)) for i in range(n_mp3)],
+        "artist": [f"Artist {i % 997}" for i in range(n_mp3)],
+        "duration": [round(200 + i % 150 + rng.random(), 2) for i in range(n_mp3)],
+        "current_bitrate": [rng.choice([128000, 192000, 320000]) for _ in range(n_mp3)],
+        "file_name": [f"Song {i}.mp3" for i in range(n_mp3)],
+        "priority": "🔴 高优先级",
+    })
+    n_multi = n_rows - n_mp3
+    multi = pd.DataFrame({
+        "song_key": [f"tune {i}|band {i % 113}|{180 + i % 200}" for i in range(n_multi)],
+        "title": [f"Tune {i}" for i in range(n_multi)],
+        "artist": [f"Band {i % 113}" if i % 50 else None for i in range(n_multi)],
+        "formats": [rng.choice(["flac, mp3", "m4a, mp3", "flac, m4a, mp3"]) for _ in range(n_multi)],
+        "best_format": [rng.choice(["flac", "m4a"]) for _ in range(n_multi)],
+        "version_count": [rng.randint(2, 4) for _ in range(n_multi)],
+        "priority": "🟡 中优先级",
+    })
+    return {"仅MP3歌曲": mp3, "多版本歌曲": multi}
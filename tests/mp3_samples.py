@@ -0,0 +1,30 @@
+"""测试用的合成 MP3：只有帧头正确、音频数据为随机字节的 MPEG-1 Layer III 帧"""
+
+import random
+
+# MPEG-1 Layer III，128 kbps，44100 Hz，立体声，无填充：每帧 417 字节
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+FRAME_SIZE = 417
+
+
+def id3v2_tag(title: str) -> bytes:
+    text = b"\x03" + title.encode("utf-8")
+    frame = b"TIT2" + len(text).to_bytes(4, "big") + b"\x00\x00" + text
+    size = len(frame)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + syncsafe + frame
+
+
+def id3v1_tag(title: str) -> bytes:
+    return b"TAG" + title.encode("ascii").ljust(30, b"\x00") + b"\x00" * 94 + b"\xff"
+
+
+def info_frame(tag: bytes, encoder: bytes) -> bytes:
+    # 立体声 MPEG-1 的边信息为 32 字节，信息帧标记紧随其后
+    body = b"\x00" * 32 + tag + b"\x00\x00\x00\x0f" + encoder
+    return FRAME_HEADER + body.ljust(FRAME_SIZE - 4, b"\x00")
+
+
+def audio_frames(n: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    return b"".join(FRAME_HEADER + bytes(rng.getrandbits(8) for _ in range(FRAME_SIZE - 4)) for _ in range(n))
@@ -0,0 +1,112 @@
+"""
+旧实现（逐行 / 逐次的直接做法）：测试中作为参照结果，benchmark 中作为对照组
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from mutagen import File
+
+from analyzer import format_priorities
+from search_index import TEXT_COLUMNS
+
+
+def legacy_read_metadata(path: Path) -> dict:
+    """旧版读取方式：easy / 非 easy 各解析一次文件"""
+    audio = File(path, easy=True)
+    info = File(path)
+
+    duration = round(info.info.length, 2) if info and info.info else None
+    return {
+        "title": (audio.get("title", [None])[0] if audio else None),
+        "artist": (audio.get("artist", [None])[0] if audio else None),
+        "album": (audio.get("album", [None])[0] if audio else None),
+        "duration": duration,
+        "bitrate": getattr(info.info, "bitrate", None),
+        "sample_rate": getattr(info.info, "sample_rate", None),
+    }
+
+
+def legacy_page(dup_df: pd.DataFrame, page: int, per_page: int) -> list:
+    """旧实现：排序全部分组键，逐个分组过滤整个重复文件表并按优先级排序"""
+    songs = sorted(dup_df["song_key"].unique())[page * per_page:(page + 1) * per_page]
+    groups = []
+    for song_key in songs:
+        group = dup_df[dup_df["song_key"] == song_key].copy()
+        group["priority"] = format_priorities(group["format"])
+        groups.append(group.sort_values("priority", ascending=False, kind="stable"))
+    return groups
+
+
+def legacy_subdirectories(path):
+    """旧实现：每次重新运行都 iterdir 并逐个 is_dir"""
+    return sorted([d.name for d in Path(path).iterdir() if d.is_dir() and not d.name.startswith(".")])
+
+
+def scan_search(df: pd.DataFrame, text: str, formats, ranges, columns) -> np.ndarray:
+    """不建索引的查询：每个词对每一列做一次 str.contains"""
+    mask = np.ones(len(df), dtype=bool)
+    for term in text.split():
+        term_mask = np.zeros(len(df), dtype=bool)
+        for col in TEXT_COLUMNS:
+            term_mask |= columns[col].str.contains(term, regex=False, na=False).to_numpy(dtype=bool)
+        mask &= term_mask
+    for col, (low, high) in ranges.items():
+        values = pd.to_numeric(df[col], errors="coerce")
+        mask &= (values.ge(low) if low is not None else values.notna()).to_numpy(dtype=bool)
+        if high is not None:
+            mask &= values.le(high).to_numpy(dtype=bool)
+    if formats is not None:
+        mask &= df["format"].isin(formats).to_numpy(dtype=bool)
+    return np.flatnonzero(mask)
+
+
+def legacy_export(data_dict: dict, export_dir: Path):
+    """旧版导出：to_csv 整表写出；JSON 先 to_dict 全部记录再 json.dump；TXT 用 iterrows 逐字段写"""
+    for name, df in data_dict.items():
+        df.to_csv(export_dir / f"{name}.csv", index=False, encoding="utf-8-sig")
+    with open(export_dir / "download_list.json", "w", encoding="utf-8") as f:
+        json.dump({name: df.to_dict("records") for name, df in data_dict.items()}, f, ensure_ascii=False, indent=2)
+    with open(export_dir / "download_list.txt", "w", encoding="utf-8") as f:
+        f.write("🎵 音乐升级下载清单\n")
+        f.write("生成时间: -\n")
+        f.write("=" * 60 + "\n\n")
+        for name, df in data_dict.items():
+            f.write(f"\n{name.upper()}\n")
+            f.write("-" * 60 + "\n")
+            for idx, row in df.iterrows():
+                f.write(f"\n【{idx + 1}】 {row.get('song_key', row.get('title', ''))}\n")
+                for col in df.columns:
+                    if col != "song_key":
+                        val = row[col]
+                        if pd.notna(val):
+                            f.write(f"  {col}: {val}\n")
+            f.write(f"\n小计: {len(df)} 首歌曲\n")
+            f.write("=" * 60 + "\n")
+
+
+def legacy_mp3_upgrade_list(mp3_df: pd.DataFrame) -> pd.DataFrame:
+    """旧版：每首歌过滤一次整个数据框"""
+    result = []
+    for song_key in sorted(mp3_df["song_key"].unique()):
+        first = mp3_df[mp3_df["song_key"] == song_key].iloc[0]
+        result.append({"song_key": song_key, "title": first.get("title", ""), "artist": first.get("artist", ""),
+                       "duration": first.get("duration", ""), "current_bitrate": first.get("bitrate", ""),
+                       "file_name": first.get("file_name", ""), "priority": "🔴 高优先级"})
+    return pd.DataFrame(result)
+
+
+def legacy_multi_version_list(mv_df: pd.DataFrame) -> pd.DataFrame:
+    """旧版：每首歌过滤一次整个数据框，并对该组重新计算格式优先级"""
+    result = []
+    for song_key in sorted(mv_df["song_key"].unique()):
+        songs = mv_df[mv_df["song_key"] == song_key].copy()
+        songs["priority"] = format_priorities(songs["format"])
+        songs = songs.sort_values("priority", ascending=False, kind="stable")
+        best = songs.iloc[0]
+        result.append({"song_key": song_key, "title": best.get("title", ""), "artist": best.get("artist", ""),
+                       "formats": ", ".join(sorted(songs["format"].unique())), "best_format": best.get("format", ""),
+                       "version_count": len(songs), "priority": "🟡 中优先级"})
+    return pd.DataFrame(result)
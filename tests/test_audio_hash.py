@@ -0,0 +1,50 @@
+"""音频数据哈希：只改动标签（以及 Xing / LAME 信息帧）的 MP3 得到相同的 audio_hash"""
+
+from mp3_samples import audio_frames, id3v1_tag, id3v2_tag, info_frame
+from scanner import _audio_payload_hash
+
+
+def _hash(path, fmt="mp3"):
+    with open(path, "rb") as f:
+        return _audio_payload_hash(f, fmt, path.stat().st_size)
+
+
+def test_retagged_mp3_with_different_info_frame_has_same_hash(tmp_path):
+    audio = audio_frames(20)
+    original = tmp_path / "original.mp3"
+    original.write_bytes(id3v2_tag("Song") + info_frame(b"Xing", b"LAME3.99r") + audio + id3v1_tag("Song"))
+    retagged = tmp_path / "retagged.mp3"
+    retagged.write_bytes(id3v2_tag("Song (Remastered)") + info_frame(b"Info", b"Lavf58.76.100") + audio)
+
+    assert _hash(original) == _hash(retagged)
+
+
+def test_mp3_without_info_frame_matches_same_audio_with_one(tmp_path):
+    audio = audio_frames(20)
+    plain = tmp_path / "plain.mp3"
+    plain.write_bytes(id3v2_tag("Song") + audio)
+    with_info = tmp_path / "with_info.mp3"
+    with_info.write_bytes(info_frame(b"Xing", b"LAME3.100") + audio + id3v1_tag("Song"))
+
+    assert _hash(plain) == _hash(with_info)
+
+
+def test_different_audio_has_different_hash(tmp_path):
+    first = tmp_path / "first.mp3"
+    first.write_bytes(id3v2_tag("Song") + info_frame(b"Xing", b"LAME3.99r") + audio_frames(20, seed=1))
+    second = tmp_path / "second.mp3"
+    second.write_bytes(id3v2_tag("Song") + info_frame(b"Xing", b"LAME3.99r") + audio_frames(20, seed=2))
+
+    assert _hash(first) != _hash(second)
+
+
+def test_first_audio_frame_is_hashed_when_not_aninfo_frame(tmp_path):
+    audio = audio_frames(20)
+    changed = bytearray(audio)
+    changed[100] ^= 0xFF  # 第一帧中的音频数据
+    first = tmp_path / "first.mp3"
+    first.write_bytes(audio)
+    second = tmp_path / "second.mp3"
+    second.write_bytes(bytes(changed))
+
+    assert _hash(first) != _hash(second)
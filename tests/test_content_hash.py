@@ -0,0 +1,42 @@
+"""字节级重复检测：缓存的部分哈希只在首尾读取量相同时复用"""
+
+from scanner import compute_content_hashes
+
+
+def _write(path, head: bytes, middle: bytes, tail: bytes):
+    path.write_bytes(head + middle + tail)
+    return str(path), path.stat().st_size
+
+
+def test_partial_hash_from_smaller_chunk_is_not_used_as_full_hash(tmp_path):
+    head, tail = b"h" * 16 * 1024, b"t" * 16 * 1024
+    a = _write(tmp_path / "a.flac", head, b"a" * 64 * 1024, tail)
+    b = _write(tmp_path / "b.flac", head, b"b" * 64 * 1024, tail)
+    c = _write(tmp_path / "c.flac", b"c" * 16 * 1024, b"c" * 64 * 1024, tail)
+    cache_path = str(tmp_path / "scan_cache.db")
+
+    # 16 KiB 时 a、b 分别只与 c 比较：缓存了相同的首尾哈希，但没有全文哈希
+    for pair in ([a, c], [b, c]):
+        hashes, _ = compute_content_hashes(pair, use_cache=True, cache_path=cache_path, partial_kib=16)
+        assert hashes == {}
+
+    # 64 KiB 时文件不超过首尾读取量，部分哈希必须重新覆盖整个文件
+    hashes, stats = compute_content_hashes([a, b], use_cache=True, cache_path=cache_path, partial_kib=64)
+    assert stats["hash_partial"] == 2
+    assert hashes == {}
+
+
+def test_cached_hashes_reused_with_same_chunk(tmp_path):
+    a = _write(tmp_path / "a.flac", b"x" * 1024, b"same" * 1024, b"y" * 1024)
+    b = _write(tmp_path / "b.flac", b"x" * 1024, b"same" * 1024, b"y" * 1024)
+    cache_path = str(tmp_path / "scan_cache.db")
+
+    first, _ = compute_content_hashes([a, b], use_cache=True, cache_path=cache_path, partial_kib=64)
+    again, stats = compute_content_hashes([a, b], use_cache=True, cache_path=cache_path, partial_kib=64)
+    assert first == again and len(set(again.values())) == 1
+    assert stats["hash_partial"] == stats["hash_bytes"] == 0
+
+    # 首尾读取量变化后部分哈希重新计算，全文哈希不变
+    changed, stats = compute_content_hashes([a, b], use_cache=True, cache_path=cache_path, partial_kib=1)
+    assert changed == first
+    assert stats["hash_partial"] == 2 and stats["hash_full"] == 0
@@ -0,0 +1,110 @@
+"""批量删除：日志逐条写入、隔离后可按日志恢复原内容、部分失败按文件记录"""
+
+from pathlib import Path
+
+import pytest
+
+from deletion import DeletionJournal, _move, _run, delete_files, quarantine_path, read_journal, restore_files
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "music"
+    paths = []
+    for i in range(6):
+        path = root / f"Artist {i % 2}" / f"{i:02d}.mp3"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(bytes([i]) * (100 + i))
+        paths.append(path)
+    return root, paths
+
+
+def test_journal_written_while_running(tmp_path):
+    journal = DeletionJournal("delete", tmp_path / "logs", total=20)
+    seen = []
+
+    def count_records(_):
+        # 任务执行时日志中已有的文件记录数（不含第一行的操作信息）
+        seen.append(len(read_journal(journal.path)) - 1)
+        return None
+
+    try:
+        done, failed = _run(((f"f{i}", count_records, (i,)) for i in range(20)), journal, 1, "删除")
+    finally:
+        journal.close()
+    assert len(done) == 20 and failed == []
+    # 同时在途的任务不超过 workers * 4 个，之前的结果都已落盘
+    assert seen[-1] >= 20 - 1 * 4
+    assert len(read_journal(journal.path)) == 21
+
+
+def test_read_journal_skips_truncated_last_line(tmp_path):
+    journal = DeletionJournal("delete", tmp_path, total=2)
+    journal.write({"file_path": "a.mp3", "status": "ok", "target": None})
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"file_path": "b.mp3", "sta')  # 写到一半时崩溃
+    entries = read_journal(journal.path)
+    assert [entry.get("file_path") for entry in entries] == [None, "a.mp3"]
+    assert entries[0]["operation"] == "delete"
+
+
+def test_quarantine_path_layout(tmp_path):
+    root = tmp_path / "music"
+    inside = quarantine_path(str(root / "A" / "song.mp3"), str(root), "batch", ".trash")
+    assert inside == root / ".trash" / "batch" / "A" / "song.mp3"
+    # 根目录之外的文件放到所在目录的回收目录中
+    outside = quarantine_path(str(tmp_path / "linked" / "song.mp3"), str(root), "batch", ".trash")
+    assert outside == tmp_path / "linked" / ".trash" / "batch" / "song.mp3"
+
+
+def test_move_refuses_to_overwrite(tmp_path):
+    source = tmp_path / "a.mp3"
+    target = tmp_path / "trash" / "a.mp3"
+    source.write_bytes(b"source")
+    target.parent.mkdir()
+    target.write_bytes(b"target")
+    with pytest.raises(FileExistsError):
+        _move(str(source), target)
+    assert source.read_bytes() == b"source"
+    assert target.read_bytes() == b"target"
+
+
+def test_quarantine_then_restore_round_trip(library, tmp_path):
+    root, paths = library
+    original = {path: path.read_bytes() for path in paths}
+    done, failed, journal_path = delete_files(paths[:4], mode="quarantine", root_dir=str(root),
+                                              workers=2, log_dir=str(tmp_path / "logs"))
+    assert sorted(done) == sorted(str(p) for p in paths[:4]) and failed == []
+    batch = Path(journal_path).stem.split("_", 1)[1]
+    for path in paths[:4]:
+        assert not path.exists()
+        assert quarantine_path(str(path), str(root), batch).read_bytes() == original[path]
+
+    restored, failed, _ = restore_files(journal_path, workers=2, log_dir=str(tmp_path / "logs"))
+    assert sorted(restored) == sorted(done) and failed == []
+    assert {path: path.read_bytes() for path in paths} == original
+
+
+def test_partial_failures_recorded_per_file(library, tmp_path):
+    root, paths = library
+    paths[1].unlink()  # 已被别的程序删除
+    done, failed, journal_path = delete_files(paths, mode="delete", workers=2, log_dir=str(tmp_path / "logs"))
+    assert sorted(done) == sorted(str(p) for p in paths if p != paths[1])
+    assert [path for path, _ in failed] == [str(paths[1])]
+
+    records = {entry["file_path"]: entry for entry in read_journal(journal_path)[1:]}
+    assert len(records) == len(paths)
+    assert records[str(paths[1])]["status"] == "failed" and records[str(paths[1])]["error"]
+    assert all(records[str(p)]["status"] == "ok" for p in paths if p != paths[1])
+
+
+def test_restore_skips_occupied_original_path(library, tmp_path):
+    root, paths = library
+    _, _, journal_path = delete_files(paths[:2], mode="quarantine", root_dir=str(root),
+                                      log_dir=str(tmp_path / "logs"))
+    paths[0].write_bytes(b"new file")
+    restored, failed, _ = restore_files(journal_path, log_dir=str(tmp_path / "logs"))
+    assert restored == [str(paths[1])]
+    assert [path for path, _ in failed] == [str(paths[0])]
+    assert paths[0].read_bytes() == b"new file"
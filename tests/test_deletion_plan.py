@@ -0,0 +1,36 @@
+"""删除计划：每个重复分组恰好保留一个文件，且保留的是排序依据最大的文件"""
+
+import pandas as pd
+
+from analyzer import analyze, find_duplicates, format_priorities, plan_deletions
+from library_frame import compact_frame
+from library_samples import synthetic_rows
+
+
+def test_plan_keeps_the_best_file_of_every_duplicate_group():
+    df = compact_frame(analyze(pd.DataFrame(synthetic_rows(5000))))
+    plan = plan_deletions(df)
+    dup = find_duplicates(df)
+    kept = plan.to_keep
+
+    assert kept["song_key"].is_unique
+    assert kept["song_key"].nunique() == dup["song_key"].nunique()
+    assert len(plan.keep_positions) + len(plan.delete_positions) == len(dup)
+
+    # 保留的文件在 (优先级, 比特率, 采样率, 文件大小) 上不小于组内任何文件
+    ranked = dup.assign(priority=format_priorities(dup["format"]))[
+        ["song_key", "priority", "bitrate", "sample_rate", "file_size"]].astype({"song_key": object})
+    ranked["rank"] = list(zip(ranked["priority"], ranked["bitrate"].fillna(-1),
+                              ranked["sample_rate"].fillna(-1), ranked["file_size"].fillna(-1)))
+    best = ranked.groupby("song_key")["rank"].max()
+    winners = ranked.loc[kept.index].set_index("song_key")["rank"]
+    assert (winners == best.loc[winners.index]).all()
+
+
+def test_plan_summary_counts_match_the_rows():
+    df = compact_frame(analyze(pd.DataFrame(synthetic_rows(2000))))
+    plan = plan_deletions(df)
+    summary = plan.summary()
+    assert summary["keep"] == len(plan.to_keep)
+    assert summary["delete"] == len(plan.to_delete)
+    assert summary["bytes_freed"] == plan.to_delete["file_size"].sum()
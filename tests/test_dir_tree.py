@@ -0,0 +1,72 @@
+"""目录树缓存与每次重新列目录的结果相同；扫描遍历填充的节点完整，修改时间没变时不再列目录"""
+
+from pathlib import Path
+
+import pytest
+
+from dir_tree import DirectoryTree
+from reference_impl import legacy_subdirectories
+from scanner import walk_music_files
+
+
+@pytest.fixture
+def root(tmp_path):
+    for i in range(20):
+        (tmp_path / f"Artist {i:02d}" / "Album").mkdir(parents=True)
+        (tmp_path / f"Artist {i:02d}" / "cover.jpg").touch()
+    (tmp_path / "Podcasts").mkdir()
+    (tmp_path / ".hidden").mkdir()
+    return tmp_path
+
+
+def test_cached_and_revalidated_listings_match(root):
+    expected = legacy_subdirectories(root)
+    cached = DirectoryTree(ttl=3600)
+    assert cached.children(root) == cached.children(root) == expected
+    assert cached.listings == 1
+    expired = DirectoryTree(ttl=0)
+    assert expired.children(root) == expired.children(root) == expected
+    assert expired.listings == 1  # 修改时间未变，不再列目录
+
+
+def _walk_listings(root, **options) -> dict:
+    listings = {}
+    for _ in walk_music_files(root, listings=listings, **options):
+        pass
+    return listings
+
+
+def test_seeded_listings_skip_listing_on_first_access(root):
+    tree = DirectoryTree(ttl=3600)
+    tree.seed(_walk_listings(root))
+    assert tree.children(root) == legacy_subdirectories(root)
+    assert tree.children(root / "Artist 00") == ["Album"]
+    assert tree.children(root / "Podcasts") == []
+    assert tree.listings == 0
+
+
+def test_seeded_listings_are_complete_despite_scan_filters(root):
+    # exclude / max_depth 只影响扫描哪些文件，不影响目录树显示的子目录
+    listings = _walk_listings(root, exclude=["Podcasts"], max_depth=0)
+    tree = DirectoryTree(ttl=3600)
+    tree.seed(listings)
+    assert tree.children(root) == legacy_subdirectories(root)
+    assert tree.listings == 0
+    assert tree.children(root / "Artist 00") == ["Album"]  # 超出 max_depth，没有记录
+    assert tree.listings == 1
+
+
+def test_seeded_node_relisted_when_directory_changed(root):
+    listings = _walk_listings(root)
+    (root / "New Artist").mkdir()
+    tree = DirectoryTree(ttl=3600)
+    tree.seed(listings)
+    assert "New Artist" in tree.children(root)
+    assert tree.listings == 1
+
+
+def test_new_subdirectory_shows_after_ttl(root):
+    tree = DirectoryTree(ttl=0)
+    tree.children(root)
+    (root / "New Artist").mkdir()
+    assert "New Artist" in tree.children(Path(root))
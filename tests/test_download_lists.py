@@ -0,0 +1,27 @@
+"""一次分组聚合生成的下载清单与逐首过滤的旧版相同"""
+
+import pandas as pd
+import pytest
+
+from analyzer import LibraryAnalysis, analyze
+from export_download_list import mp3_upgrade_list, multi_version_list
+from library_frame import compact_frame
+from library_samples import synthetic_rows
+from reference_impl import legacy_mp3_upgrade_list, legacy_multi_version_list
+
+
+@pytest.fixture(scope="module")
+def analysis():
+    return LibraryAnalysis(compact_frame(analyze(pd.DataFrame(synthetic_rows(3000)))))
+
+
+def test_mp3_upgrade_list_matches_legacy(analysis):
+    mp3_df = analysis.mp3_only()
+    assert len(mp3_df) > 0
+    pd.testing.assert_frame_equal(mp3_upgrade_list(mp3_df), legacy_mp3_upgrade_list(mp3_df), check_dtype=False)
+
+
+def test_multi_version_list_matches_legacy(analysis):
+    mv_df = analysis.multi_version()
+    assert len(mv_df) > 0
+    pd.testing.assert_frame_equal(multi_version_list(mv_df), legacy_multi_version_list(mv_df), check_dtype=False)
@@ -0,0 +1,70 @@
+"""分块流式导出与旧版整表导出的内容相同（含 gzip），写出器接口为抽象基类"""
+
+import gzip
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from exporters import ExportWriter, export_lists
+from library_samples import upgrade_lists
+from reference_impl import legacy_export
+
+
+def _read(path: Path) -> str:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8-sig") as f:
+        return f.read()
+
+
+def _without_time(text: str) -> list:
+    return [line for line in text.splitlines() if not line.startswith("生成时间")]
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    data = upgrade_lists(3000)
+    legacy_dir = tmp_path_factory.mktemp("legacy")
+    legacy_export(data, legacy_dir)
+    return data, legacy_dir
+
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("chunk_rows", [7, 5000])
+def test_streamed_export_matches_legacy(exported, tmp_path, compress, chunk_rows):
+    data, legacy_dir = exported
+    paths = export_lists(data, ["csv", "ndjson", "txt"], tmp_path, compress=compress, chunk_rows=chunk_rows)
+    assert all(path.suffix == ".gz" for path in paths) == compress
+
+    for name in data:
+        csv = next(p for p in paths if p.name.startswith(f"{name}_"))
+        assert _read(csv) == _read(legacy_dir / f"{name}.csv"), name
+
+    txt = next(p for p in paths if ".txt" in p.name)
+    assert _without_time(_read(txt)) == _without_time(_read(legacy_dir / "download_list.txt"))
+
+    ndjson = next(p for p in paths if ".ndjson" in p.name)
+    with open(legacy_dir / "download_list.json", encoding="utf-8") as f:
+        expected = [dict(record, list=name) for name, records in json.load(f).items() for record in records]
+    assert [json.loads(line) for line in _read(ndjson).splitlines()] == expected
+
+
+def test_float32_columns_written_identically(tmp_path):
+    # compact_frame 把时长压缩为 float32
+    data = {"仅MP3歌曲": pd.DataFrame({"title": ["晴天", "Yesterday"],
+                                      "duration": np.array([199.33, np.nan], dtype="float32")})}
+    paths = export_lists(data, ["csv", "ndjson", "txt"], tmp_path, compress=False)
+    csv, ndjson, txt = (_read(next(p for p in paths if suffix in p.name)) for suffix in (".csv", ".ndjson", ".txt"))
+    assert csv.splitlines()[1] == "晴天,199.33"
+    assert "  duration: 199.33\n" in txt
+    assert [json.loads(line)["duration"] for line in ndjson.splitlines()] == [199.33, None]
+
+
+def test_writer_without_write_cannot_be_created(tmp_path):
+    class Incomplete(ExportWriter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(tmp_path, "0")
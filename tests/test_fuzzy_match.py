@@ -0,0 +1,85 @@
+"""模糊重复匹配：标题变体、艺术家写法、取整边界的时长能归为一组，时长窗口外或得分不足的不归组"""
+
+import pandas as pd
+import pytest
+
+from analyzer import find_fuzzy_duplicates, normalize_artists, normalize_title
+from config import FUZZY_MATCH
+
+# (文件名, 标题, 艺术家, 时长)；同一组的文件名前缀相同
+ROWS = [
+    ("live_a", "Song", "Adele", 200.0),
+    ("live_b", "Song (Live)", "Adele", 200.8),
+    ("remaster_a", "Blinding Lights", "The Weeknd", 201.0),
+    ("remaster_b", "Blinding Lights (Remastered 2020)", "The Weeknd", 201.3),
+    ("feat_a", "Stay feat. Justin Bieber", "The Kid LAROI", 141.0),
+    ("feat_b", "Stay", "The Kid LAROI & Justin Bieber", 141.2),
+    ("punct_a", "Hello, World!", "Bump of Chicken", 260.0),
+    ("punct_b", "hello world", "BUMP OF CHICKEN", 260.1),
+    ("round_a", "晴天", "周杰伦", 199.4),
+    ("round_b", "晴天", "Jay Chou; 周杰伦", 199.6),
+    # 标题相同但时长相差超过 duration_window：不同的录音
+    ("window_a", "Yesterday", "The Beatles", 125.0),
+    ("window_b", "Yesterday", "The Beatles", 130.0),
+    # 标题只有一个词不同、艺术家也不同：得分低于 threshold
+    ("score_a", "Love Story", "Taylor Swift", 235.0),
+    ("score_b", "Love Song", "Sara Bareilles", 235.5),
+]
+MATCHED = ["live", "remaster", "feat", "punct", "round"]
+UNMATCHED = ["window", "score"]
+
+
+@pytest.fixture(scope="module")
+def library():
+    return pd.DataFrame([{"file_path": f"/music/{name}.flac", "title": title, "artist": artist,
+                          "duration": duration} for name, title, artist, duration in ROWS])
+
+
+def _clusters(result: pd.DataFrame) -> dict:
+    """文件名 -> 组编号"""
+    names = result["file_path"].str.extract(r"/music/(.+)\.flac", expand=False)
+    return dict(zip(names, result["fuzzy_cluster"]))
+
+
+def test_variants_are_matched(library):
+    clusters = _clusters(find_fuzzy_duplicates(library))
+    for prefix in MATCHED:
+        assert f"{prefix}_a" in clusters and clusters[f"{prefix}_a"] == clusters[f"{prefix}_b"], prefix
+    # 各组互不合并
+    assert len({clusters[f"{prefix}_a"] for prefix in MATCHED}) == len(MATCHED)
+
+
+def test_near_misses_are_not_matched(library):
+    clusters = _clusters(find_fuzzy_duplicates(library))
+    for prefix in UNMATCHED:
+        assert f"{prefix}_a" not in clusters and f"{prefix}_b" not in clusters, prefix
+
+
+def test_duration_window_and_threshold_are_respected(library):
+    window = library[library["file_path"].str.contains("window_")]
+    assert find_fuzzy_duplicates(window).empty
+    assert len(find_fuzzy_duplicates(window, duration_window=10.0)) == 2
+    live = library[library["file_path"].str.contains("live_")]
+    assert find_fuzzy_duplicates(live, threshold=0.99).empty
+
+
+def test_scores_and_confidence(library):
+    result = find_fuzzy_duplicates(library)
+    assert result["fuzzy_score"].between(FUZZY_MATCH["threshold"], 1.0).all()
+    confidence = result.groupby("fuzzy_cluster")["fuzzy_score"].min()
+    assert (result["fuzzy_confidence"] == result["fuzzy_cluster"].map(confidence)).all()
+
+
+def test_banding_is_deterministic(library):
+    # MinHash 的哈希函数由固定种子生成，n-gram 用 CRC32 映射，分桶结果与行顺序、运行次数无关
+    first = _clusters(find_fuzzy_duplicates(library))
+    shuffled = _clusters(find_fuzzy_duplicates(library.sample(frac=1, random_state=7)))
+    groups = lambda clusters: sorted(sorted(n for n, c in clusters.items() if c == cluster)
+                                     for cluster in set(clusters.values()))
+    assert groups(first) == groups(shuffled)
+
+
+def test_normalization():
+    assert normalize_title("Blinding Lights (Remastered 2020)") == ("blinding lights", ("remastered 2020",))
+    assert normalize_title("Stay feat. Justin Bieber")[0] == "stay"
+    assert normalize_artists("Jay Chou; 周杰伦") == {"jay chou", "周杰伦"}
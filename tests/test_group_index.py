@@ -0,0 +1,27 @@
+"""重复歌曲视图按分组索引切出的每一页与逐组过滤的旧实现相同"""
+
+import pandas as pd
+import pytest
+
+from analyzer import GroupIndex, LibraryAnalysis, analyze
+from library_frame import compact_frame
+from library_samples import synthetic_rows
+from reference_impl import legacy_page
+
+
+@pytest.fixture(scope="module")
+def duplicates():
+    return LibraryAnalysis(compact_frame(analyze(pd.DataFrame(synthetic_rows(3000))))).duplicates()
+
+
+@pytest.mark.parametrize("per_page", [1, 5, 20])
+def test_pages_match_per_group_filtering(duplicates, per_page):
+    index = GroupIndex(duplicates, "song_key", by_priority=True)
+    assert index.pages(per_page) > 1
+    for page in range(index.pages(per_page)):
+        legacy = legacy_page(duplicates, page, per_page)
+        keys, offsets, positions = index.page(page, per_page)
+        page_df = duplicates.iloc[positions]
+        indexed = [page_df.iloc[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        assert list(keys) == [group["song_key"].iloc[0] for group in legacy]
+        assert [g.index.tolist() for g in indexed] == [g.index.tolist() for g in legacy]
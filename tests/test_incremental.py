@@ -0,0 +1,103 @@
+"""
+增量分析与完整重算的等价性
+
+参考结果由独立维护的 {file_path: 行} 字典完整重算得到，不读取 IncrementalAnalysis.frame；
+连续应用多次变化后才读取 frame，覆盖尚未合并的变化被之后的删除 / 修改覆盖的情况
+"""
+
+import random
+
+import pandas as pd
+import pytest
+
+from analyzer import IncrementalAnalysis, LibraryAnalysis, ScanDelta, analyze
+from library_samples import synthetic_rows
+
+
+def _paths(df: pd.DataFrame) -> set:
+    return set(df["file_path"].astype(str))
+
+
+def _random_delta(rng: random.Random, library: dict, pool: list) -> ScanDelta:
+    """随机生成扫描变化：新增（含已有歌曲的其他格式 / 副本）、删除、修改标签或格式，并同步更新 library"""
+    paths = sorted(library)
+    removed = rng.sample(paths, min(len(paths), rng.randint(0, 20)))
+    rest = [path for path in paths if path not in set(removed)]
+    modified = []
+    for path in rng.sample(rest, min(len(rest), rng.randint(0, 20))):
+        row = dict(library[path])
+        change = rng.random()
+        if change < 0.3:
+            row["format"] = rng.choice(["mp3", "flac", "wav", "m4a"])
+        elif change < 0.5:
+            row["title"] = rng.choice([None, "", row["title"], "Song 1"])
+        elif change < 0.7:
+            row["duration"] = rng.choice([0.0, row["duration"] + 0.6, 199.5])
+        else:
+            row["bitrate"] = rng.choice([None, 128000, row["bitrate"]])
+        modified.append(row)
+    added = []
+    for _ in range(rng.randint(0, 20)):
+        row = dict(rng.choice(pool))
+        row["file_path"] = f"/music/new/{rng.random():.12f}/{row['file_name']}"
+        added.append(row)
+
+    for path in removed:
+        del library[path]
+    for row in modified + added:
+        library[row["file_path"]] = row
+    return ScanDelta(added=pd.DataFrame(added), modified=pd.DataFrame(modified), removed=removed)
+
+
+def _assert_matches_full_recompute(inc: IncrementalAnalysis, library: dict):
+    full = LibraryAnalysis(analyze(pd.DataFrame(list(library.values()))))
+    plan = full.deletion_plan()
+    assert inc.paths(inc.duplicate_keys) == _paths(full.duplicates())
+    assert inc.paths(inc.mp3_only_keys) == _paths(full.mp3_only())
+    assert inc.paths(inc.multi_version_keys) == _paths(full.multi_version())
+    assert inc.keep_paths == _paths(plan.to_keep)
+    assert inc.delete_paths == _paths(plan.to_delete)
+    assert inc.summary() == full.summary()
+
+
+def _assert_frame_matches(inc: IncrementalAnalysis, library: dict):
+    frame = inc.frame
+    assert frame["file_path"].is_unique
+    assert len(frame) == len(library) == inc.summary()["files"]
+    actual = frame.set_index("file_path")
+    expected = pd.DataFrame(list(library.values())).set_index("file_path").loc[actual.index]
+    for col in ("format", "title", "duration", "bitrate"):
+        same = (actual[col].astype(object) == expected[col].astype(object)) | (
+            actual[col].isna() & expected[col].isna())
+        assert same.all(), col
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_deltas_match_full_recompute(seed):
+    rng = random.Random(seed)
+    pool = synthetic_rows(400, seed=seed)
+    library = {row["file_path"]: row for row in pool[:300]}
+    inc = IncrementalAnalysis(analyze(pd.DataFrame(list(library.values()))))
+    for step in range(6):
+        inc.apply(_random_delta(rng, library, pool))
+        _assert_matches_full_recompute(inc, library)
+        # 每隔几次变化才合并一次完整数据框
+        if step % 3 == 2:
+            _assert_frame_matches(inc, library)
+    _assert_frame_matches(inc, library)
+
+
+def test_frame_after_several_deltas_keeps_only_the_last_write():
+    rows = [dict(file_path=f"/m/{i}.mp3", file_name=f"{i}.mp3", format="mp3", title=f"S{i}", artist="A",
+                 duration=100.0 + i, bitrate=128000) for i in range(4)]
+    inc = IncrementalAnalysis(analyze(pd.DataFrame(rows)))
+    new = dict(rows[0], file_path="/m/new.flac", file_name="new.flac", format="flac")
+    inc.apply(ScanDelta(added=pd.DataFrame([new])))
+    inc.apply(ScanDelta(modified=pd.DataFrame([dict(rows[1], bitrate=320000)])))
+    inc.apply(ScanDelta(modified=pd.DataFrame([dict(rows[1], bitrate=256000)])))
+    inc.apply(ScanDelta(removed=["/m/new.flac"]))
+
+    frame = inc.frame
+    assert inc.summary()["files"] == len(frame) == 4
+    assert sorted(frame["file_path"]) == [f"/m/{i}.mp3" for i in range(4)]
+    assert frame.loc[frame["file_path"] == "/m/1.mp3", "bitrate"].tolist() == [256000]
@@ -0,0 +1,34 @@
+"""共享分组索引的报表与各自 groupby 的旧实现结果相同"""
+
+import pandas as pd
+import pytest
+
+from analyzer import LibraryAnalysis, analyze
+from library_frame import compact_frame
+from library_samples import synthetic_rows
+
+
+@pytest.fixture(scope="module")
+def library():
+    df = compact_frame(analyze(pd.DataFrame(synthetic_rows(5000))))
+    return df, LibraryAnalysis(df)
+
+
+def test_reports_match_independent_groupby(library):
+    df, analysis = library
+    keyed = df.dropna(subset=["song_key"])
+    legacy = {
+        "duplicates": df[df.duplicated("song_key", keep=False) & df["song_key"].notna()],
+        "mp3_only": keyed.groupby("song_key", observed=True).filter(lambda g: set(g["format"]) == {"mp3"}),
+        "multi_version": keyed.groupby("song_key", observed=True).filter(lambda g: g["format"].nunique() > 1),
+    }
+    assert analysis.duplicates().index.equals(legacy["duplicates"].index)
+    assert analysis.mp3_only().index.equals(legacy["mp3_only"].index)
+    assert analysis.multi_version().index.equals(legacy["multi_version"].index)
+
+
+def test_summary_counts(library):
+    df, analysis = library
+    summary = analysis.summary()
+    assert summary["files"] == len(df)
+    assert analysis.n_groups == df["song_key"].nunique()
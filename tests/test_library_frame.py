@@ -0,0 +1,28 @@
+"""压缩后的数据框：列类型变窄，分析结果与原始数据框相同"""
+
+import pandas as pd
+
+from analyzer import analyze, find_duplicates, find_mp3_only, mark_files_to_delete
+from library_frame import compact_frame, memory_report
+from library_samples import synthetic_rows
+
+
+def _frames(n_rows=5000):
+    raw = analyze(pd.DataFrame(synthetic_rows(n_rows)))
+    return raw, compact_frame(raw)
+
+
+def test_compact_frame_keeps_analysis_results():
+    raw, compact = _frames()
+    for fn in (find_duplicates, find_mp3_only):
+        assert fn(raw).index.equals(fn(compact).index)
+    assert mark_files_to_delete(raw)["should_delete"].equals(mark_files_to_delete(compact)["should_delete"])
+
+
+def test_compact_frame_keeps_values_and_shrinks_memory():
+    raw, compact = _frames()
+    assert list(compact.columns) == list(raw.columns)
+    assert compact["format"].dtype == "category"
+    assert str(compact["bitrate"].dtype) == "UInt32"
+    assert compact["song_key"].astype(object).equals(raw["song_key"].astype(object))
+    assert memory_report(raw, compact)["ratio"] < 0.8
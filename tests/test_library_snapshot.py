@@ -0,0 +1,71 @@
+"""快照写入后读出的分析结果、下载清单与原结果相同（两种后端，内存后端含只读部分列）"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from config import ANALYSIS_BACKEND, CONTENT_HASH
+from export_download_list import LIST_COLUMNS, mp3_upgrade_list, multi_version_list
+from library_samples import synthetic_rows
+from library_snapshot import load_snapshot, save_snapshot
+from library_store import create_library_builder
+
+
+def _build(backend: str, rows: list, root_dir: str):
+    builder = create_library_builder(root_dir, backend)
+    for i in range(0, len(rows), 500):
+        builder.add(rows[i:i + 500])
+    return builder.finish()
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONTENT_HASH, "enabled", False)  # 模拟数据的文件不存在
+    monkeypatch.setitem(ANALYSIS_BACKEND, "dir", str(tmp_path))
+    return str(tmp_path)
+
+
+def _assert_same_lists(expected, actual):
+    assert actual.summary() == expected.summary()
+    assert mp3_upgrade_list(actual.mp3_only()).equals(mp3_upgrade_list(expected.mp3_only()))
+    assert multi_version_list(actual.multi_version()).equals(multi_version_list(expected.multi_version()))
+
+
+@pytest.mark.parametrize("columns", [None, LIST_COLUMNS])
+def test_memory_snapshot_roundtrip(snapshot_dir, columns):
+    analysis = _build("memory", synthetic_rows(3000), snapshot_dir)
+    assert analysis.df["song_key"].isna().any()
+    save_snapshot(analysis, snapshot_dir, directory=snapshot_dir)
+
+    loaded, meta = load_snapshot(snapshot_dir, directory=snapshot_dir, columns=columns)
+    assert meta["rows"] == 3000
+    _assert_same_lists(analysis, loaded)
+    # 快照中保存的分组与重新 factorize 相同
+    assert np.array_equal(loaded.group_codes, analysis.group_codes)
+    assert list(loaded.keys) == list(analysis.keys)
+    if columns is None:
+        assert loaded.df.reset_index(drop=True).equals(analysis.df.reset_index(drop=True))
+    else:
+        assert set(loaded.df.columns) == set(LIST_COLUMNS)
+
+
+def test_sqlite_snapshot_roundtrip(snapshot_dir):
+    analysis = _build("sqlite", synthetic_rows(3000), snapshot_dir)
+    save_snapshot(analysis, snapshot_dir, directory=snapshot_dir)
+    loaded, _ = load_snapshot(snapshot_dir, directory=snapshot_dir, columns=LIST_COLUMNS)
+    try:
+        _assert_same_lists(analysis, loaded)
+    finally:
+        loaded.close()
+        analysis.close()
+
+
+def test_old_format_is_rejected(snapshot_dir):
+    analysis = _build("memory", synthetic_rows(100), snapshot_dir)
+    meta = save_snapshot(analysis, snapshot_dir, name="old", directory=snapshot_dir)
+    meta_path = next(p for p in Path(snapshot_dir).glob("snapshot_*_old.json"))
+    meta_path.write_text(json.dumps(dict(meta, format=1)), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_snapshot(snapshot_dir, "old", directory=snapshot_dir)
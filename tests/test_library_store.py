@@ -0,0 +1,98 @@
+"""SQLite 后端分批建库后的报表与内存后端相同"""
+
+import pytest
+
+from config import ANALYSIS_BACKEND, CONTENT_HASH
+from library_samples import synthetic_rows
+from library_store import create_library_builder
+
+
+def _paths(df) -> set:
+    return set(df["file_path"].astype(str))
+
+
+def _build(backend: str, rows: list, root_dir: str, batch_size: int = 500):
+    builder = create_library_builder(root_dir, backend)
+    for i in range(0, len(rows), batch_size):
+        builder.add(rows[i:i + batch_size])
+    return builder.finish()
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    tmp = str(tmp_path_factory.mktemp("libraries"))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setitem(CONTENT_HASH, "enabled", False)  # 模拟数据的文件不存在
+        mp.setitem(ANALYSIS_BACKEND, "dir", tmp)
+        rows = synthetic_rows(5000)
+        memory = _build("memory", rows, tmp)
+        sqlite = _build("sqlite", rows, tmp)
+        yield memory, sqlite
+        sqlite.close()
+
+
+@pytest.mark.parametrize("report", [
+    lambda a: _paths(a.duplicates()),
+    lambda a: _paths(a.mp3_only()),
+    lambda a: _paths(a.multi_version()),
+    lambda a: _paths(a.deletion_plan().to_keep),
+    lambda a: _paths(a.deletion_plan().to_delete),
+    lambda a: a.deletion_plan().summary(),
+    lambda a: a.summary(),
+], ids=["duplicates", "mp3_only", "multi_version", "keep", "delete", "plan_summary", "summary"])
+def test_sqlite_reports_match_memory(backends, report):
+    memory, sqlite = backends
+    assert report(sqlite) == report(memory)
+
+
+@pytest.mark.parametrize("query, formats, ranges", [
+    ("song 1", None, None),
+    ("artist 3 album", ["flac", "mp3"], None),
+    ("", ["wav"], {"bitrate": (320000, None), "duration": (120.005, 180.005)}),
+    ("no such song", None, None),
+])
+def test_sqlite_search_matches_memory(backends, query, formats, ranges):
+    memory, sqlite = backends
+    # 分块小于行数，覆盖跨块的取值编号合并
+    index = sqlite.search_index(chunk_rows=700)
+    found = index.search(query, formats=formats, ranges=ranges)
+    expected = memory.search_index().search(query, formats=formats, ranges=ranges)
+    assert len(found) == len(expected)
+    assert _paths(sqlite.take(found)) == _paths(memory.take(expected))
+
+
+def _library_files(directory) -> set:
+    return {path.name for path in directory.glob("library_*.db")}
+
+
+def test_old_library_kept_while_open(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONTENT_HASH, "enabled", False)
+    monkeypatch.setitem(ANALYSIS_BACKEND, "dir", str(tmp_path))
+    rows = synthetic_rows(500)
+    first = _build("sqlite", rows, str(tmp_path))
+    expected = first.summary()
+    second = _build("sqlite", rows[:300], str(tmp_path))
+
+    # 第一次建库的对象仍在使用：文件保留，查询仍然可用
+    assert _library_files(tmp_path) == {first.db_path.name, second.db_path.name}
+    first._summary = None
+    assert first.summary() == expected
+
+    # 最后一个对象关闭时删除已被取代的文件
+    first.close()
+    assert _library_files(tmp_path) == {second.db_path.name}
+    assert not list(tmp_path.glob(first.db_path.name + "*"))
+    second.close()
+    assert _library_files(tmp_path) == {second.db_path.name}
+
+
+def test_unreferenced_old_library_removed_on_next_build(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONTENT_HASH, "enabled", False)
+    monkeypatch.setitem(ANALYSIS_BACKEND, "dir", str(tmp_path))
+    rows = synthetic_rows(200)
+    first = _build("sqlite", rows, str(tmp_path))
+    old_name = first.db_path.name
+    first.close()
+    second = _build("sqlite", rows, str(tmp_path))
+    assert _library_files(tmp_path) == {second.db_path.name} != {old_name}
+    second.close()
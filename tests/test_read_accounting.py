@@ -0,0 +1,28 @@
+"""单文件读取量统计：行的 parse_bytes 只计解析元数据的读取"""
+
+from mp3_samples import audio_frames, id3v2_tag, info_frame
+from scanner import _read_metadata_counted
+
+
+def _sample(tmp_path):
+    path = tmp_path / "song.mp3"
+    path.write_bytes(id3v2_tag("Song") + info_frame(b"Xing", b"LAME3.100") + audio_frames(300))
+    return path
+
+
+def test_parse_bytes_excludes_audio_hash_reads(tmp_path):
+    path = _sample(tmp_path)
+    plain, plain_read = _read_metadata_counted(path)
+    hashed, hashed_read = _read_metadata_counted(path, audio_hash=True)
+
+    assert hashed["parse_bytes"] == plain["parse_bytes"] == plain_read
+    assert hashed_read > plain_read  # 返回值仍包含音频数据哈希的读取
+    assert hashed["audio_hash"] is not None
+
+
+def test_header_only_parse_bytes_stays_within_budget_when_hashing(tmp_path):
+    path = _sample(tmp_path)
+    row, _ = _read_metadata_counted(path, audio_hash=True, max_read_bytes=64 * 1024)
+
+    assert row["read_mode"] == "header"
+    assert row["parse_bytes"] <= 64 * 1024 < path.stat().st_size
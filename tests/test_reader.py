@@ -0,0 +1,23 @@
+"""单次解析的 read_metadata 与旧版（easy / 非 easy 各解析一次）读到的字段相同"""
+
+import pytest
+
+from mp3_samples import audio_frames, id3v1_tag, id3v2_tag, info_frame
+from reference_impl import legacy_read_metadata
+from scanner import read_metadata
+
+
+@pytest.mark.parametrize("content", [
+    id3v2_tag("Song") + info_frame(b"Xing", b"LAME3.100") + audio_frames(50),
+    id3v2_tag("歌曲") + audio_frames(50) + id3v1_tag("Song"),
+    info_frame(b"Info", b"Lavf58") + audio_frames(50),  # 没有标签
+])
+def test_single_parse_matches_legacy_double_parse(tmp_path, content):
+    path = tmp_path / "song.mp3"
+    path.write_bytes(content)
+    old, new = legacy_read_metadata(path), read_metadata(path)
+
+    # 旧版在文件没有任何标签时 mutagen 对象为假值，duration 会被误记为 None
+    mismatch = {k for k in old if old[k] != new[k] and not (k == "duration" and old[k] is None)}
+    assert not mismatch
+    assert new["duration"] > 0
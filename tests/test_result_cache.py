@@ -0,0 +1,45 @@
+"""派生结果缓存在分析对象原地删除文件后不再返回删除前的结果"""
+
+import pytest
+
+from config import ANALYSIS_BACKEND, CONTENT_HASH
+from library_samples import synthetic_rows
+from library_store import create_library_builder
+from result_cache import ResultCache, cached_results
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONTENT_HASH, "enabled", False)  # 模拟数据的文件不存在
+    monkeypatch.setitem(ANALYSIS_BACKEND, "dir", str(tmp_path))
+    builder = create_library_builder(str(tmp_path), "sqlite")
+    builder.add(synthetic_rows(2000))
+    library = builder.finish()
+    yield library
+    library.close()
+
+
+def test_cache_drops_results_after_in_place_removal(library):
+    results = ResultCache(library, enabled=True)
+    before = results.summary()
+    assert len(results.duplicates()) > 0
+    assert results.summary() is before
+
+    removed = library.deletion_plan().to_delete["file_path"].tolist()
+    assert library.remove_files(removed) is library
+    # 同一个缓存对象（例如本次运行中已经取出的 results）也不会再返回旧结果
+    after = results.summary()
+    assert after["files"] == before["files"] - len(removed)
+    assert results.duplicates().empty  # 每组只剩保留的文件
+    assert results.version == library.version
+
+
+def test_cached_results_rebuilt_for_new_version(library):
+    class State:
+        pass
+
+    state = State()
+    first = cached_results(state, library)
+    assert cached_results(state, library) is first
+    library.remove_files(library.deletion_plan().to_delete["file_path"].tolist()[:1])
+    assert cached_results(state, library) is not first
@@ -0,0 +1,91 @@
+"""后台扫描的断点写入扫描缓存，程序重启后新建的任务从断点继续"""
+
+import itertools
+import os
+
+import pytest
+
+from config import SCAN_CACHE, SNAPSHOT
+from mp3_samples import audio_frames, id3v2_tag
+from scan_cache import ScanCache
+from scan_jobs import ScanJob
+
+
+class _CancelAfter:
+    """处理完 n 批后请求停止"""
+
+    def __init__(self, n: int):
+        self._calls = itertools.count(1)
+        self.n = n
+
+    def is_set(self):
+        return next(self._calls) >= self.n
+
+    def clear(self):
+        pass
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setitem(SNAPSHOT, "enabled", False)
+    monkeypatch.setitem(SCAN_CACHE, "path", str(tmp_path / "scan_cache.db"))  # 建库时的内容哈希也使用缓存
+    root = tmp_path / "music"
+    for i, album in enumerate(["a", "b", "c", "d"]):
+        (root / album).mkdir(parents=True)
+        for j in range(2):
+            song = f"{album}{j}"
+            (root / album / f"{song}.mp3").write_bytes(id3v2_tag(song) + audio_frames(20, seed=i * 2 + j))
+    options = {"workers": 1, "batch_size": 1}
+    return str(root), options
+
+
+def _checkpoint(root, options, key):
+    cache = ScanCache(SCAN_CACHE["path"])
+    try:
+        return cache.get_checkpoint(root, key)
+    finally:
+        cache.close()
+
+
+def test_checkpoint_survives_restart(library):
+    root, options = library
+    first = ScanJob(root, options)
+    first._cancel = _CancelAfter(5)
+    first._run()
+    assert first.state == "cancelled"
+    saved = _checkpoint(root, options, first._checkpoint_key())
+    assert saved == first.completed_dirs and len(saved) == 2
+
+    # 重启后的新任务：已完成目录的行从缓存恢复，不再遍历读取
+    second = ScanJob(root, options)
+    second._run()
+    assert second.state == "finished"
+    assert second.restored_rows == 4
+    assert second.stats["files_seen"] == 4
+    assert second.result.summary()["files"] == 8
+    assert sorted(second.result.df["title"]) == sorted(f"{a}{j}" for a in "abcd" for j in range(2))
+    assert _checkpoint(root, options, second._checkpoint_key()) == set()
+    # 断点中的目录也被遍历，填充侧栏目录树的列表是完整的
+    assert set(second.dir_listings) == {root, *(os.path.join(root, a) for a in "abcd")}
+    assert second.dir_listings[root][1] == ["a", "b", "c", "d"]
+
+
+def test_checkpoint_ignored_when_scan_options_change(library):
+    root, options = library
+    first = ScanJob(root, options)
+    first._cancel = _CancelAfter(5)
+    first._run()
+
+    second = ScanJob(root, dict(options, exclude=["d"]))
+    second._run()
+    assert second.restored_rows == 0
+    assert second.result.summary()["files"] == 6
+
+
+def test_finish_partial_clears_checkpoint(library):
+    root, options = library
+    job = ScanJob(root, options)
+    job._cancel = _CancelAfter(5)
+    job._run()
+    job.finish_partial()
+    assert _checkpoint(root, options, job._checkpoint_key()) == set()
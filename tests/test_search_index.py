@@ -0,0 +1,44 @@
+"""倒排索引查询与逐列 str.contains 全表扫描的结果相同"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from library_frame import compact_frame
+from library_samples import fuzzy_rows, search_queries
+from reference_impl import scan_search
+from search_index import TEXT_COLUMNS, SearchIndex, normalize_text
+
+
+@pytest.fixture(scope="module")
+def library():
+    df = compact_frame(pd.DataFrame(fuzzy_rows(4000)))
+    columns = {col: df[col].astype(object).map(normalize_text, na_action="ignore") for col in TEXT_COLUMNS}
+    return df, SearchIndex(df), columns
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_matches_full_scan(library, seed):
+    df, index, columns = library
+    for text, formats, ranges in search_queries(df, 100, seed=seed):
+        expected = scan_search(df, normalize_text(text), formats, ranges, columns)
+        found = index.search(text, formats=formats, ranges=ranges)
+        assert np.array_equal(found, expected), (text, formats, ranges)
+
+
+def test_open_range_and_empty_query(library):
+    df, index, columns = library
+    expected = scan_search(df, "", None, {"bitrate": (300000, None)}, columns)
+    assert len(expected) > 0
+    assert np.array_equal(index.search("", ranges={"bitrate": (300000, None)}), expected)
+
+
+def test_chunked_build_matches_whole_frame(library):
+    df, index, _ = library
+    frame = df.assign(row_id=np.arange(len(df)))
+    chunked = SearchIndex.from_chunks(frame.iloc[i:i + 333] for i in range(0, len(frame), 333))
+    assert chunked.formats == index.formats
+    assert np.array_equal(chunked.format_codes, index.format_codes)
+    for text, formats, ranges in search_queries(df, 100):
+        assert np.array_equal(chunked.search(text, formats=formats, ranges=ranges),
+                              index.search(text, formats=formats, ranges=ranges)), (text, formats, ranges)
@@ -3,32 +3,52 @@ MusicAnalyzer 页面视图
 处理重复歌曲和 MP3 页面的显示逻辑
 """
 
+import time
+
 import streamlit as st
 import pandas as pd
-from analyzer import get_format_priority, get_duplicates_to_delete
-from components import render_copy_button, render_copy_icon_button
-from config import PAGINATION
+from analyzer import GroupIndex, get_identical_to_delete
+from components import render_copy_block, render_copy_button, render_copy_icon_button
+from config import PAGINATION, SEARCH
+from result_cache import ResultCache
+
 
+def song_lines(df: pd.DataFrame) -> str:
+    """复制用的“标题 - 艺术家”文本，每行一首；没有标题时用文件名"""
+    titles = df["title"].astype(object).where(df["title"].notna(), df["file_name"])
+    artists = df["artist"].astype(object).where(df["artist"].notna(), "")
+    return "\n".join(f"{title} - {artist}" if artist else str(title) for title, artist in zip(titles, artists))
 
-def show_duplicates_view(dup_df: pd.DataFrame, df: pd.DataFrame, delete_files_fn):
+
+def show_duplicates_view(results: ResultCache, delete_files_fn):
     """
     显示重复歌曲视图
     
     Args:
-        dup_df: 重复歌曲数据框
-        df: 完整数据框
+        results: 当前音乐库的分析结果缓存
         delete_files_fn: 删除文件函数
     """
-    st.warning(f"⚠️ 找到 {len(dup_df)} 个重复文件（{dup_df['song_key'].nunique()} 首歌曲有重复）")
+    dup_df = results.duplicates()
+    # 分组索引每个音乐库版本只建立一次，翻页只做切片
+    index = results.derive("duplicate_index", lambda: GroupIndex(dup_df, "song_key", by_priority=True))
+    st.warning(f"⚠️ 找到 {len(dup_df)} 个重复文件（{len(index)} 首歌曲有重复）")
     
     if len(dup_df) == 0:
         st.success("✅ 没有重复歌曲，库很干净！")
         return
     
+    # 显示设置
+    page_sizes = PAGINATION["duplicates_page_sizes"]
+    setting_col = st.columns([2, 1], gap="small")
+    with setting_col[0]:
+        single_table = st.toggle("📋 单表显示", key="dup_single_table",
+                                 help="当前页的所有歌曲合并为一张表，每页歌曲较多时渲染更快")
+    with setting_col[1]:
+        items_per_page = st.selectbox("每页歌曲数", page_sizes, key="dup_page_size",
+                                      index=page_sizes.index(PAGINATION["duplicates_per_page"]))
+    
     # 分页设置
-    items_per_page = PAGINATION["duplicates_per_page"]
-    unique_songs = sorted(dup_df["song_key"].unique())
-    total_pages = (len(unique_songs) + items_per_page - 1) // items_per_page
+    total_pages = index.pages(items_per_page)
     st.session_state.dup_page = min(st.session_state.dup_page, total_pages - 1)
     
     # 分页导航
@@ -45,37 +65,27 @@ def show_duplicates_view(dup_df: pd.DataFrame, df: pd.DataFrame, delete_files_fn
             st.rerun()
     st.divider()
 
-    # 获取当前页的数据
-    start_idx = st.session_state.dup_page * items_per_page
-    end_idx = min(start_idx + items_per_page, len(unique_songs))
-    page_songs = unique_songs[start_idx:end_idx]
-    
-    # 按 song_key 分组显示（在 form 外面）
-    for song_key in page_songs:
-        group = dup_df[dup_df["song_key"] == song_key].copy()
-        group["priority"] = group["format"].apply(get_format_priority)
-        group = group.sort_values("priority", ascending=False)
-        
-        # 提取标题和艺术家
-        title = group.iloc[0]["title"] if "title" in group.columns else song_key
-        artist = group.iloc[0]["artist"] if "artist" in group.columns else ""
-        st.markdown(f"####  {song_key}")
-        
-        # 先获取当前分组的数据行数，计算适配的高度
-        row_count = len(group[["file_name", "format", "bitrate", "sample_rate", "duration"]])
-        # 每行约35px高度，表头约38px，最小高度设为80px避免过矮
-        table_height = max(row_count * 35 + 38, 80)
-
-        # 渲染自适应高度的表格
-        st.dataframe(
-            group[["file_name", "format", "bitrate", "sample_rate", "duration"]],
-            use_container_width=True,
-            height=table_height  # 用计算出的高度替代固定值200
-        )
+    # 获取当前页的数据（组内已按格式优先级从高到低排列）
+    page_songs, offsets, positions = index.page(st.session_state.dup_page, items_per_page)
+    page_df = dup_df.iloc[positions]
+    columns = ["file_name", "format", "bitrate", "sample_rate", "duration"]
+    
+    if single_table:
+        st.dataframe(page_df[["song_key"] + columns], use_container_width=True, hide_index=True,
+                     height=min(len(page_df) * 35 + 38, 800))
+    else:
+        # 按 song_key 分组显示（在 form 外面）
+        for song_key, start, end in zip(page_songs, offsets[:-1], offsets[1:]):
+            group = page_df.iloc[start:end]
+            st.markdown(f"####  {song_key}")
+            
+            # 每行约35px高度，表头约38px，最小高度设为80px避免过矮
+            table_height = max(len(group) * 35 + 38, 80)
+            st.dataframe(group[columns], use_container_width=True, height=table_height)
     
     with st.form("form_duplicates"):
         if st.form_submit_button("🗑️ 删除", use_container_width=True, type="secondary"):
-            files_to_delete = get_duplicates_to_delete(df)
+            files_to_delete = results.deletion_plan().to_delete
             if len(files_to_delete) > 0:
                 deleted, failed = delete_files_fn(files_to_delete)
                 st.success(f"✅ 已删除 {len(deleted)} 个文件")
@@ -83,7 +93,66 @@ def show_duplicates_view(dup_df: pd.DataFrame, df: pd.DataFrame, delete_files_fn
                     st.error(f"❌ 删除失败 {len(failed)} 个文件:")
                     for path, error in failed:
                         st.error(f"  {path}: {error}")
-                st.info("请重新扫描以更新数据")
+                st.info("已从分析结果中移除，切换页面后列表即更新")
+
+
+def show_identical_view(results: ResultCache, delete_files_fn, by: str = "content_hash"):
+    """
+    显示内容相同的文件视图
+    
+    Args:
+        results: 当前音乐库的分析结果缓存
+        delete_files_fn: 删除文件函数
+        by: "content_hash"（字节完全相同）或 "audio_hash"（音频数据相同，忽略标签）
+    """
+    identical_df = results.identical(by)
+    label = "字节完全相同" if by == "content_hash" else "音频数据相同（仅标签不同）"
+    if len(identical_df) == 0:
+        st.success(f"✅ 没有{label}的文件！")
+        return
+    
+    index = results.derive("identical_index", lambda by: GroupIndex(identical_df, by), by)
+    st.warning(f"⚠️ 找到 {len(identical_df)} 个{label}的文件（{len(index)} 组）")
+    
+    # 分页设置
+    items_per_page = PAGINATION["identical_per_page"]
+    total_pages = index.pages(items_per_page)
+    st.session_state.identical_page = min(st.session_state.identical_page, total_pages - 1)
+    
+    # 分页导航
+    pagination_col = st.columns([1, 1.5, 1], gap="small")
+    with pagination_col[0]:
+        if st.button("⬅️", use_container_width=True, key="identical_prev"):
+            st.session_state.identical_page = max(0, st.session_state.identical_page - 1)
+            st.rerun()
+    with pagination_col[1]:
+        st.markdown(f"<div style='text-align:center; padding: 8px;'><b>第 {st.session_state.identical_page + 1}/{total_pages} 页</b></div>", unsafe_allow_html=True)
+    with pagination_col[2]:
+        if st.button("➡️", use_container_width=True, key="identical_next"):
+            st.session_state.identical_page = min(total_pages - 1, st.session_state.identical_page + 1)
+            st.rerun()
+    st.divider()
+    
+    # 当前页的所有分组合并为一张表显示（组内保持扫描顺序）
+    _, _, positions = index.page(st.session_state.identical_page, items_per_page)
+    page_df = identical_df.iloc[positions]
+    st.dataframe(
+        page_df[[by, "file_path", "format", "title", "artist", "file_size"]],
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption("每组保留第一个文件，删除其余副本")
+    
+    with st.form("form_identical"):
+        if st.form_submit_button("🗑️ 删除", use_container_width=True, type="secondary"):
+            files_to_delete = get_identical_to_delete(identical_df, by)
+            deleted, failed = delete_files_fn(files_to_delete)
+            st.success(f"✅ 已删除 {len(deleted)} 个文件")
+            if failed:
+                st.error(f"❌ 删除失败 {len(failed)} 个文件:")
+                for path, error in failed:
+                    st.error(f"  {path}: {error}")
+            st.info("已从分析结果中移除，切换页面后列表即更新")
 
 
 def show_mp3_view(mp3_df: pd.DataFrame, delete_files_fn):
@@ -101,50 +170,48 @@ def show_mp3_view(mp3_df: pd.DataFrame, delete_files_fn):
     
     st.warning(f"⚠️ 找到 {mp3_df['song_key'].nunique()} 首歌曲仅有 MP3 版本（建议升级）")
     
-    # 分页设置
+    # 分页设置（表格本身是虚拟滚动的，一页可以放下数千行）
     items_per_page = PAGINATION["mp3_per_page"]
     total_pages = (len(mp3_df) + items_per_page - 1) // items_per_page
     st.session_state.mp3_page = min(st.session_state.mp3_page, total_pages - 1)
     
     # 分页导航
-    pagination_col = st.columns([1, 1.5, 1], gap="small")
-    with pagination_col[0]:
-        if st.button("⬅️", use_container_width=True, key="mp3_prev"):
-            st.session_state.mp3_page = max(0, st.session_state.mp3_page - 1)
-            st.rerun()
-    with pagination_col[1]:
-        st.markdown(f"<div style='text-align:center; padding: 8px;'><b>第 {st.session_state.mp3_page + 1}/{total_pages} 页</b></div>", unsafe_allow_html=True)
-    with pagination_col[2]:
-        if st.button("➡️", use_container_width=True, key="mp3_next"):
-            st.session_state.mp3_page = min(total_pages - 1, st.session_state.mp3_page + 1)
-            st.rerun()
-    
-    st.divider()
+    if total_pages > 1:
+        pagination_col = st.columns([1, 1.5, 1], gap="small")
+        with pagination_col[0]:
+            if st.button("⬅️", use_container_width=True, key="mp3_prev"):
+                st.session_state.mp3_page = max(0, st.session_state.mp3_page - 1)
+                st.rerun()
+        with pagination_col[1]:
+            st.markdown(f"<div style='text-align:center; padding: 8px;'><b>第 {st.session_state.mp3_page + 1}/{total_pages} 页</b></div>", unsafe_allow_html=True)
+        with pagination_col[2]:
+            if st.button("➡️", use_container_width=True, key="mp3_next"):
+                st.session_state.mp3_page = min(total_pages - 1, st.session_state.mp3_page + 1)
+                st.rerun()
     
     # 获取当前页的数据
     start_idx = st.session_state.mp3_page * items_per_page
     end_idx = min(start_idx + items_per_page, len(mp3_df))
     page_df = mp3_df.iloc[start_idx:end_idx]
     
-    # 显示表格和复制按钮（在 form 外面）
-    st.markdown("**歌曲列表**")
-    
-    copy_col1, copy_col2 = st.columns([4, 1])
-    with copy_col1:
-        pass
-    with copy_col2:
-        st.caption("**复制**")
-    
-    for idx, (_, row) in enumerate(page_df.iterrows()):
-        cols = st.columns([3, 1, 1, 1])
-        with cols[0]:
-            st.caption(f"{row['title']} - {row['artist']}")
-        with cols[1]:
-            st.caption(f"{row['bitrate']}")
-        with cols[2]:
-            st.caption(f"{row['duration']:.0f}s")
-        with cols[3]:
-            st.caption(f"{row['file_name']}")
+    # 一个表格显示整页：排序、搜索在浏览器端完成，勾选行后可批量复制
+    st.caption("点击列标题排序，右上角 🔍 搜索；勾选行后可一键复制歌曲名")
+    event = st.dataframe(
+        page_df[["title", "artist", "album", "bitrate", "duration", "file_name"]],
+        use_container_width=True,
+        hide_index=True,
+        key=f"mp3_table_{st.session_state.mp3_page}",  # 翻页后清空勾选（行号只对当前页有效）
+        on_select="rerun",
+        selection_mode="multi-row",
+        column_config={
+            "bitrate": st.column_config.NumberColumn("bitrate", format="%d"),
+            "duration": st.column_config.NumberColumn("duration", format="%.0fs"),
+        },
+    )
+    
+    selected = page_df.iloc[event.selection.rows] if event.selection.rows else None
+    if selected is not None:
+        render_copy_block(song_lines(selected), f"📋 已选 {len(selected)} 首（点击右上角复制）")
     
     st.divider()
     
@@ -156,32 +223,100 @@ def show_mp3_view(mp3_df: pd.DataFrame, delete_files_fn):
                 st.error(f"❌ 删除失败 {len(failed)} 个文件:")
                 for path, error in failed:
                     st.error(f"  {path}: {error}")
-            st.info("请重新扫描以更新数据")
+            st.info("已从分析结果中移除，切换页面后列表即更新")
+
+
+# 区间筛选的滑块：(标签, 显示单位 / 存储单位)
+SEARCH_RANGES = {
+    "bitrate": ("码率 (kbps)", 1000),
+    "sample_rate": ("采样率 (Hz)", 1),
+    "duration": ("时长 (秒)", 1),
+}
+
+
+def show_search_view(results: ResultCache):
+    """
+    显示音乐库搜索视图（全文搜索 + 格式 / 区间筛选）
+    
+    Args:
+        results: 当前音乐库的分析结果缓存
+    """
+    # 索引每个音乐库版本只建立一次，之后每次输入只做索引查找
+    index = results.search_index()
+    
+    query = st.text_input("🔎 搜索", key="search_query", placeholder="标题 / 艺术家 / 专辑 / 文件名，多个词用空格分隔")
+    
+    ranges = {}
+    with st.expander("筛选", expanded=False):
+        formats = st.multiselect("格式", index.formats, key=f"search_formats_{results.version}")
+        for column, (label, unit) in SEARCH_RANGES.items():
+            bounds = index.bounds(column)
+            if bounds is None:
+                continue
+            low, high = int(bounds[0] // unit), int(-(-bounds[1] // unit))
+            if low == high:
+                continue
+            # 滑块的键包含音乐库版本，重新扫描后取值范围随之更新
+            selected = st.slider(label, low, high, (low, high), key=f"search_{column}_{results.version}")
+            # 滑块在两端时不限（包括该列缺失的行）
+            if selected != (low, high):
+                ranges[column] = (selected[0] * unit if selected[0] > low else None,
+                                  selected[1] * unit if selected[1] < high else None)
+    
+    start = time.perf_counter()
+    row_ids = index.search(query, formats=formats or None, ranges=ranges)
+    elapsed = time.perf_counter() - start
+    
+    if len(row_ids) == 0:
+        st.info(f"没有匹配的文件（{elapsed * 1000:.1f} ms）")
+        return
+    
+    max_results = SEARCH["max_results"]
+    shown = results.take(row_ids[:max_results])
+    caption = f"匹配 {len(row_ids)} / {len(index)} 个文件（{elapsed * 1000:.1f} ms）"
+    if len(row_ids) > max_results:
+        caption += f"，显示前 {max_results} 个"
+    st.caption(caption + "；勾选行后可一键复制歌曲名")
+    
+    event = st.dataframe(
+        shown[["title", "artist", "album", "format", "bitrate", "sample_rate", "duration", "file_path"]],
+        use_container_width=True,
+        hide_index=True,
+        key="search_table",
+        on_select="rerun",
+        selection_mode="multi-row",
+        column_config={
+            "bitrate": st.column_config.NumberColumn("bitrate", format="%d"),
+            "duration": st.column_config.NumberColumn("duration", format="%.0fs"),
+        },
+    )
+    
+    if event.selection.rows:
+        selected = shown.iloc[event.selection.rows]
+        render_copy_block(song_lines(selected), f"📋 已选 {len(selected)} 首（点击右上角复制）")
 
 
-def show_dashboard(df: pd.DataFrame, find_mp3_only_fn):
+def show_dashboard(results: ResultCache):
     """
     显示主仪表板
     
     Args:
-        df: 完整数据框
-        find_mp3_only_fn: 查找 MP3 函数
+        results: 当前音乐库的分析结果缓存
     """
-    if df is None:
+    if results is None:
         st.info("👈 请在左侧选择分析功能查看详细结果")
         st.stop()
     
     st.subheader("🎯 清理建议", divider="blue")
     
+    summary = results.summary()
     col1, col2, col3 = st.columns(3, gap="large")
     with col1:
-        st.metric("📦 文件总数", len(df))
+        st.metric("📦 文件总数", summary["files"])
     with col2:
-        st.metric("🎵 唯一歌曲", df["song_key"].nunique())
+        st.metric("🎵 唯一歌曲", summary["songs"])
     with col3:
-        mp3_df = find_mp3_only_fn(df)
-        mp3_count = mp3_df["song_key"].nunique() if len(mp3_df) > 0 else 0
-        st.metric("🎧 仅 MP3 歌曲", mp3_count)
+        st.metric("🎧 仅 MP3 歌曲", summary["mp3_only_songs"])
     
     st.divider()
     st.info("👈 请在左侧选择分析功能查看详细结果")